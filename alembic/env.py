@@ -16,6 +16,7 @@ import app.models.tag  # noqa
 import app.models.daily_recipe  # noqa
 import app.models.device_token  # noqa
 import app.models.review  # noqa
+import app.models.sync_tombstone  # noqa
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,31 @@
+"""collection_recipes: added_at + index for newest-first listing
+
+Revision ID: 20261019_collection_added_at
+Revises: 20261019_collection_stats
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_collection_added_at'
+down_revision = '20261019_collection_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'collection_recipes',
+        sa.Column('added_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_collection_recipes_collection_added "
+        "ON collection_recipes (collection_id, added_at DESC, recipe_id DESC)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_collection_recipes_collection_added")
+    op.drop_column('collection_recipes', 'added_at')
@@ -0,0 +1,22 @@
+"""collection_recipes: index on recipe_id
+
+Revision ID: 20261019_collection_recipe_idx
+Revises: 20261019_collection_added_at
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '20261019_collection_recipe_idx'
+down_revision = '20261019_collection_added_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS ix_collection_recipes_recipe_id ON collection_recipes (recipe_id)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_collection_recipes_recipe_id")
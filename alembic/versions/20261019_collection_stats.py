@@ -0,0 +1,39 @@
+"""collections: recipe_count and cover_image_url
+
+Revision ID: 20261019_collection_stats
+Revises: 20260503_collections
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_collection_stats'
+down_revision = '20260503_collections'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('collections', sa.Column('recipe_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('collections', sa.Column('cover_image_url', sa.String(), nullable=True))
+    # Заполняем для существующих коллекций
+    op.execute("""
+        UPDATE collections c SET
+            recipe_count = (SELECT count(*) FROM collection_recipes cr WHERE cr.collection_id = c.id),
+            cover_image_url = (
+                SELECT r.image_url FROM collection_recipes cr
+                JOIN recipes r ON r.id = cr.recipe_id
+                WHERE cr.collection_id = c.id AND r.image_url IS NOT NULL
+                -- Как в _cover_subquery: added_at появится следующей миграцией одинаковым для старых связей,
+                -- поэтому решает тот же тай-брейк recipe_id DESC
+                ORDER BY cr.recipe_id DESC
+                LIMIT 1
+            )
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('collections', 'cover_image_url')
+    op.drop_column('collections', 'recipe_count')
@@ -0,0 +1,26 @@
+"""media: indexes on image url columns for media GC lookups
+
+Revision ID: 20261019_media_url_indexes
+Revises: 20261019_review_histogram
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '20261019_media_url_indexes'
+down_revision = '20261019_review_histogram'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS ix_users_avatar_url ON users (avatar_url)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_recipes_image_url ON recipes (image_url)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_collections_picture_url ON collections (picture_url)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_collections_picture_url")
+    op.execute("DROP INDEX IF EXISTS ix_recipes_image_url")
+    op.execute("DROP INDEX IF EXISTS ix_users_avatar_url")
@@ -0,0 +1,29 @@
+"""recipes: source_key / content_hash / deleted_at for incremental reimport
+
+Revision ID: 20261019_recipe_source_sync
+Revises: 20261019_recipe_tags
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_recipe_source_sync'
+down_revision = '20261019_recipe_tags'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("recipes", sa.Column("source_key", sa.String(length=255), nullable=True))
+    op.add_column("recipes", sa.Column("content_hash", sa.String(length=64), nullable=True))
+    op.add_column("recipes", sa.Column("deleted_at", sa.DateTime(), nullable=True))
+    op.create_unique_constraint("uq_recipes_source_key", "recipes", ["source_key"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_recipes_source_key", "recipes", type_="unique")
+    op.drop_column("recipes", "deleted_at")
+    op.drop_column("recipes", "content_hash")
+    op.drop_column("recipes", "source_key")
@@ -0,0 +1,46 @@
+"""recipe_tags: integer tag keys and recipe<->tag join table (backfilled from recipes.tags)
+
+Revision ID: 20261019_recipe_tags
+Revises: 20261019_media_url_indexes
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20261019_recipe_tags'
+down_revision = '20261019_media_url_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("tags", sa.Column("num_id", sa.Integer(), sa.Identity(), nullable=False))
+    op.create_unique_constraint("uq_tags_num_id", "tags", ["num_id"])
+
+    op.create_table(
+        "recipe_tags",
+        sa.Column("recipe_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("recipes.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("tag_id", sa.Integer(), sa.ForeignKey("tags.num_id", ondelete="CASCADE"), primary_key=True),
+    )
+    op.create_index("ix_recipe_tags_tag_recipe", "recipe_tags", ["tag_id", "recipe_id"])
+
+    # Бэкфилл из JSONB: теги сопоставляются без учёта регистра, неизвестные пропускаются
+    op.execute("""
+        INSERT INTO recipe_tags (recipe_id, tag_id)
+        SELECT DISTINCT r.id, t.num_id
+        FROM recipes r
+        CROSS JOIN LATERAL jsonb_array_elements_text(r.tags) AS x(name)
+        JOIN tags t ON lower(t.name) = lower(x.name)
+        WHERE jsonb_typeof(r.tags) = 'array'
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_recipe_tags_tag_recipe", table_name="recipe_tags")
+    op.drop_table("recipe_tags")
+    op.drop_constraint("uq_tags_num_id", "tags", type_="unique")
+    op.drop_column("tags", "num_id")
@@ -0,0 +1,41 @@
+"""reviews: (recipe_id, created_at) index and rating histogram table
+
+Revision ID: 20261019_review_histogram
+Revises: 20261019_collection_recipe_idx
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20261019_review_histogram'
+down_revision = '20261019_collection_recipe_idx'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_reviews_recipe_created "
+        "ON reviews (recipe_id, created_at DESC, id DESC)"
+    )
+    op.create_table(
+        'recipe_rating_buckets',
+        sa.Column('recipe_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('mark', sa.Float(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['recipe_id'], ['recipes.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('recipe_id', 'mark'),
+    )
+    # Заполняем гистограмму по уже существующим отзывам
+    op.execute("""
+        INSERT INTO recipe_rating_buckets (recipe_id, mark, count)
+        SELECT recipe_id, mark, count(*) FROM reviews GROUP BY recipe_id, mark
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('recipe_rating_buckets')
+    op.execute("DROP INDEX IF EXISTS ix_reviews_recipe_created")
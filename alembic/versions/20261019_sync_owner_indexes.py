@@ -0,0 +1,68 @@
+"""per-owner keyset indexes for /sync, owner_id on collection_recipes
+
+Revision ID: 20261019_sync_owner_indexes
+Revises: 20261019_sync_tracking
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20261019_sync_owner_indexes'
+down_revision = '20261019_sync_tracking'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Владелец связи коллекция-рецепт — чтобы лента /sync фильтровалась по индексу без join с collections
+    op.add_column("collection_recipes", sa.Column("owner_id", postgresql.UUID(as_uuid=True), nullable=True))
+    op.execute("""
+        UPDATE collection_recipes cr SET owner_id = c.owner_id
+        FROM collections c WHERE c.id = cr.collection_id
+    """)
+    op.alter_column("collection_recipes", "owner_id", nullable=False)
+    # Приложение owner_id не передаёт: берём из коллекции (NOT NULL проверяется после BEFORE-триггеров)
+    op.execute("""
+        CREATE FUNCTION collection_recipes_set_owner() RETURNS trigger AS $$
+        BEGIN
+            SELECT c.owner_id INTO NEW.owner_id FROM collections c WHERE c.id = NEW.collection_id;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute(
+        "CREATE TRIGGER collection_recipes_set_owner BEFORE INSERT OR UPDATE OF collection_id ON collection_recipes "
+        "FOR EACH ROW EXECUTE FUNCTION collection_recipes_set_owner()"
+    )
+
+    # Ленты /sync всегда с фильтром по владельцу: глобальные (updated_at, id) заставляли
+    # листать изменения всех пользователей ради своих 500 строк
+    op.drop_index("ix_collections_updated_id", table_name="collections")
+    op.create_index("ix_collections_owner_updated_id", "collections", ["owner_id", "updated_at", "id"])
+    op.drop_index("ix_collection_recipes_updated", table_name="collection_recipes")
+    op.create_index(
+        "ix_collection_recipes_owner_updated", "collection_recipes",
+        ["owner_id", "updated_at", "collection_id", "recipe_id"],
+    )
+    op.drop_index("ix_reviews_updated_id", table_name="reviews")
+    op.create_index("ix_reviews_user_updated_id", "reviews", ["user_id", "updated_at", "id"])
+    # (deleted_at, id) остаётся для чистки просроченных надгробий
+    op.create_index("ix_sync_tombstones_owner_deleted_id", "sync_tombstones", ["owner_id", "deleted_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_sync_tombstones_owner_deleted_id", table_name="sync_tombstones")
+    op.drop_index("ix_reviews_user_updated_id", table_name="reviews")
+    op.create_index("ix_reviews_updated_id", "reviews", ["updated_at", "id"])
+    op.drop_index("ix_collection_recipes_owner_updated", table_name="collection_recipes")
+    op.create_index(
+        "ix_collection_recipes_updated", "collection_recipes", ["updated_at", "collection_id", "recipe_id"]
+    )
+    op.drop_index("ix_collections_owner_updated_id", table_name="collections")
+    op.create_index("ix_collections_updated_id", "collections", ["updated_at", "id"])
+    op.execute("DROP TRIGGER IF EXISTS collection_recipes_set_owner ON collection_recipes")
+    op.execute("DROP FUNCTION IF EXISTS collection_recipes_set_owner()")
+    op.drop_column("collection_recipes", "owner_id")
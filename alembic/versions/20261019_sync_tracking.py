@@ -0,0 +1,102 @@
+"""updated_at + tombstones for delta sync (/sync)
+
+Revision ID: 20261019_sync_tracking
+Revises: 20261019_recipe_source_sync
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20261019_sync_tracking'
+down_revision = '20261019_recipe_source_sync'
+branch_labels = None
+depends_on = None
+
+# Таблица -> колонки keyset-индекса по updated_at
+TRACKED = {
+    "recipes": ("id",),
+    "tags": ("id",),
+    "collections": ("id",),
+    "collection_recipes": ("collection_id", "recipe_id"),
+    "reviews": ("id",),
+}
+INDEXES = {
+    "recipes": "ix_recipes_updated_id",
+    "tags": "ix_tags_updated_id",
+    "collections": "ix_collections_updated_id",
+    "collection_recipes": "ix_collection_recipes_updated",
+    "reviews": "ix_reviews_updated_id",
+}
+
+
+def upgrade() -> None:
+    for table, key in TRACKED.items():
+        op.add_column(table, sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.text("now()")))
+        # Бэкфилл: время создания, чтобы первая синхронизация шла в порядке появления
+        backfill = "added_at" if table == "collection_recipes" else "created_at"
+        op.execute(f"UPDATE {table} SET updated_at = coalesce({backfill}, updated_at)")
+        op.create_index(INDEXES[table], table, ["updated_at", *key])
+
+    op.create_table(
+        "sync_tombstones",
+        sa.Column("id", sa.BigInteger(), sa.Identity(), primary_key=True),
+        sa.Column("entity", sa.String(length=32), nullable=False),
+        sa.Column("entity_id", sa.String(length=80), nullable=False),
+        sa.Column("owner_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("deleted_at", sa.DateTime(), nullable=False, server_default=sa.text("timezone('utc', clock_timestamp())")),
+    )
+    op.create_index("ix_sync_tombstones_deleted_id", "sync_tombstones", ["deleted_at", "id"])
+
+    # clock_timestamp(), а не now(): время записи строки, а не начала транзакции — ближе к моменту коммита
+    op.execute("""
+        CREATE FUNCTION sync_touch_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at := timezone('utc', clock_timestamp());
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE FUNCTION sync_record_tombstone() RETURNS trigger AS $$
+        BEGIN
+            IF TG_TABLE_NAME = 'collection_recipes' THEN
+                -- При каскадном удалении коллекции владельца уже не найти: клиенту хватит надгробия коллекции
+                INSERT INTO sync_tombstones (entity, entity_id, owner_id)
+                SELECT TG_TABLE_NAME, OLD.collection_id || ':' || OLD.recipe_id, c.owner_id
+                FROM collections c WHERE c.id = OLD.collection_id;
+            ELSIF TG_TABLE_NAME = 'collections' THEN
+                INSERT INTO sync_tombstones (entity, entity_id, owner_id) VALUES (TG_TABLE_NAME, OLD.id, OLD.owner_id);
+            ELSIF TG_TABLE_NAME = 'reviews' THEN
+                INSERT INTO sync_tombstones (entity, entity_id, owner_id) VALUES (TG_TABLE_NAME, OLD.id, OLD.user_id);
+            ELSE
+                INSERT INTO sync_tombstones (entity, entity_id) VALUES (TG_TABLE_NAME, OLD.id);
+            END IF;
+            RETURN OLD;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    for table in TRACKED:
+        op.execute(
+            f"CREATE TRIGGER {table}_sync_touch BEFORE INSERT OR UPDATE ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION sync_touch_updated_at()"
+        )
+        op.execute(
+            f"CREATE TRIGGER {table}_sync_tombstone AFTER DELETE ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION sync_record_tombstone()"
+        )
+
+
+def downgrade() -> None:
+    for table in TRACKED:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_sync_tombstone ON {table}")
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_sync_touch ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS sync_record_tombstone()")
+    op.execute("DROP FUNCTION IF EXISTS sync_touch_updated_at()")
+    op.drop_index("ix_sync_tombstones_deleted_id", table_name="sync_tombstones")
+    op.drop_table("sync_tombstones")
+    for table in TRACKED:
+        op.drop_index(INDEXES[table], table_name=table)
+        op.drop_column(table, "updated_at")
@@ -1,26 +1,56 @@
 from __future__ import annotations
 
 import uuid
-from pathlib import Path
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select, tuple_
 
 from app.core.database import get_session
-from app.core.config import settings
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
 from app.core.security import get_current_user
 from app.models.collection import Collection, collection_recipes
 from app.models.recipe import Recipe
 from app.models.user import User
-from app.schemas.collection import CollectionCreate, CollectionRead
-from app.schemas.recipe import RecipeRead
+from app.schemas.collection import (
+    CollectionCreate,
+    CollectionRead,
+    CollectionRecipesBulk,
+    CollectionRecipesBulkResult,
+    CollectionRecipesTransfer,
+    CollectionRecipesTransferResult,
+    RecipeSavedState,
+)
+from app.schemas.recipe import RecipeIdBatch, RecipeRead
 from app.schemas.collection import CollectionBrief
+from app.services.collections import add_recipes, copy_recipes, membership_cache, remove_recipes, saved_state
+from app.services.uploads import save_image_upload
 
 router = APIRouter()
 
 
+async def _collection_recipe_ids(session: AsyncSession, collection_id: uuid.UUID) -> List[uuid.UUID]:
+    """ID рецептов прямо из таблицы связей, от последних добавленных к первым."""
+    res = await session.execute(
+        select(collection_recipes.c.recipe_id)
+        .join(Recipe, Recipe.id == collection_recipes.c.recipe_id)
+        .where(collection_recipes.c.collection_id == collection_id, Recipe.deleted_at.is_(None))
+        .order_by(collection_recipes.c.added_at.desc(), collection_recipes.c.recipe_id.desc())
+    )
+    return list(res.scalars().all())
+
+
+async def _ensure_owned(session: AsyncSession, collection_id: uuid.UUID, user: User) -> None:
+    """404/403 для коллекции, если она не существует или чужая."""
+    res = await session.execute(select(Collection.owner_id).where(Collection.id == collection_id))
+    owner_id = res.scalar()
+    if owner_id is None:
+        raise HTTPException(status_code=404, detail="Collection not found")
+    if owner_id != user.id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
 @router.post("/", response_model=CollectionRead, status_code=status.HTTP_201_CREATED)
 async def create_collection(
     data: CollectionCreate,
@@ -48,25 +78,31 @@ async def get_my_collections(
 ):
     res = await session.execute(select(Collection).where(Collection.owner_id == current_user.id))
     collections = res.scalars().all()
-    result: List[CollectionBrief] = []
-    for col in collections:
-        # Получаем картинку последнего рецепта в коллекции
-        picture_url = col.picture_url  # Начинаем с собственной картинки коллекции
-        
-        if not picture_url and col.recipes:
-            # Если у коллекции нет собственной картинки, берём картинку последнего рецепта
-            last_recipe = col.recipes[-1]  # Последний рецепт
-            picture_url = last_recipe.image_url
-        
-        result.append(
-            CollectionBrief(
-                id=col.id,
-                name=col.name,
-                picture_url=picture_url,
-                created_at=col.created_at,
-            )
+    return [
+        CollectionBrief(
+            id=col.id,
+            name=col.name,
+            # Собственная картинка коллекции, иначе — картинка последнего добавленного рецепта
+            picture_url=col.picture_url or col.cover_image_url,
+            created_at=col.created_at,
+            recipe_count=col.recipe_count,
         )
-    return result 
+        for col in collections
+    ]
+
+
+@router.post("/saved-state", response_model=List[RecipeSavedState])
+async def get_saved_state(
+    data: RecipeIdBatch,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Для пачки рецептов — в каких коллекциях текущего пользователя они лежат."""
+    state = await saved_state(session, current_user.id, data.recipe_ids)
+    return [
+        RecipeSavedState(recipe_id=recipe_id, collection_ids=sorted(collection_ids, key=str))
+        for recipe_id, collection_ids in state.items()
+    ]
 
 
 @router.get("/{collection_id}", response_model=CollectionRead)
@@ -75,20 +111,14 @@ async def get_collection(collection_id: uuid.UUID, session: AsyncSession = Depen
     col: Collection | None = res.scalar()
     if col is None:
         raise HTTPException(status_code=404, detail="Collection not found")
-    recipe_ids = [r.id for r in col.recipes]
-    
-    # Получаем картинку последнего рецепта в коллекции
-    picture_url = col.picture_url  # Начинаем с собственной картинки коллекции
-    if not picture_url and col.recipes:
-        # Если у коллекции нет собственной картинки, берём картинку последнего рецепта
-        last_recipe = col.recipes[-1]  # Последний рецепт
-        picture_url = last_recipe.image_url
-    
+    recipe_ids = await _collection_recipe_ids(session, col.id)
+
     return CollectionRead(
         id=col.id,
         name=col.name,
-        picture_url=picture_url,
+        picture_url=col.picture_url or col.cover_image_url,
         created_at=col.created_at,
+        recipe_count=col.recipe_count,
         recipe_ids=recipe_ids,
     )
 
@@ -96,12 +126,87 @@ async def get_collection(collection_id: uuid.UUID, session: AsyncSession = Depen
 @router.get("/{collection_id}/recipes", response_model=List[RecipeRead])
 async def get_collection_recipes(
     collection_id: uuid.UUID,
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Значение X-Next-Cursor из предыдущей страницы"),
     session: AsyncSession = Depends(get_session),
 ):
-    res = await session.execute(
-        select(Recipe).join(collection_recipes).where(collection_recipes.c.collection_id == collection_id)
+    """Рецепты коллекции от последних добавленных к первым, постранично."""
+    stmt = (
+        select(Recipe, collection_recipes.c.added_at)
+        .join(collection_recipes, collection_recipes.c.recipe_id == Recipe.id)
+        .where(collection_recipes.c.collection_id == collection_id, Recipe.deleted_at.is_(None))
+    )
+    if cursor:
+        added_at, recipe_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            tuple_(collection_recipes.c.added_at, collection_recipes.c.recipe_id) < tuple_(added_at, recipe_id)
+        )
+    stmt = stmt.order_by(collection_recipes.c.added_at.desc(), collection_recipes.c.recipe_id.desc()).limit(limit + 1)
+
+    rows = (await session.execute(stmt)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_recipe, last_added_at = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last_added_at, last_recipe.id)
+    return [recipe for recipe, _ in rows]
+
+
+# ---- Bulk operations (объявлены до /{recipe_id}, чтобы не перехватывались им) ----
+
+
+@router.post("/{collection_id}/recipes/bulk-add", response_model=CollectionRecipesBulkResult)
+async def bulk_add_recipes(
+    collection_id: uuid.UUID,
+    data: CollectionRecipesBulk,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    added = await add_recipes(session, collection_id, current_user.id, data.recipe_ids)
+    if not added:
+        await _ensure_owned(session, collection_id, current_user)
+    await session.commit()
+    membership_cache.invalidate(current_user.id)
+    return CollectionRecipesBulkResult(affected=added)
+
+
+@router.post("/{collection_id}/recipes/bulk-remove", response_model=CollectionRecipesBulkResult)
+async def bulk_remove_recipes(
+    collection_id: uuid.UUID,
+    data: CollectionRecipesBulk,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    removed = await remove_recipes(session, collection_id, current_user.id, data.recipe_ids)
+    if not removed:
+        await _ensure_owned(session, collection_id, current_user)
+    await session.commit()
+    membership_cache.invalidate(current_user.id)
+    return CollectionRecipesBulkResult(affected=removed)
+
+
+@router.post("/{collection_id}/recipes/transfer", response_model=CollectionRecipesTransferResult)
+async def transfer_recipes(
+    collection_id: uuid.UUID,
+    data: CollectionRecipesTransfer,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Копирует (move=false) или переносит (move=true) рецепты в другую свою коллекцию."""
+    if data.target_collection_id == collection_id:
+        raise HTTPException(status_code=400, detail="Source and target collections must differ")
+    copied = await copy_recipes(
+        session, collection_id, data.target_collection_id, current_user.id, data.recipe_ids
     )
-    return res.scalars().all()
+    if not copied:
+        await _ensure_owned(session, collection_id, current_user)
+        await _ensure_owned(session, data.target_collection_id, current_user)
+    removed = 0
+    if data.move:
+        removed = await remove_recipes(session, collection_id, current_user.id, data.recipe_ids)
+    await session.commit()
+    membership_cache.invalidate(current_user.id)
+    return CollectionRecipesTransferResult(affected=removed if data.move else copied, copied=copied, removed=removed)
 
 
 @router.post("/{collection_id}/recipes/{recipe_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -111,22 +216,16 @@ async def add_recipe_to_collection(
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
-    # Проверяем коллекцию и права
-    res = await session.execute(select(Collection).where(Collection.id == collection_id))
-    collection: Collection | None = res.scalar()
-    if collection is None:
-        raise HTTPException(status_code=404, detail="Collection not found")
-    if collection.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Forbidden")
-    # Проверяем рецепт
-    res = await session.execute(select(Recipe).where(Recipe.id == recipe_id))
-    recipe: Recipe | None = res.scalar()
-    if recipe is None:
-        raise HTTPException(status_code=404, detail="Recipe not found")
-    # Добавляем связь, если ещё нет
-    if recipe not in collection.recipes:
-        collection.recipes.append(recipe)
-        await session.commit()
+    # Вставка с проверкой владельца в одном запросе; разбираемся в причине, только если ничего не вставилось
+    if not await add_recipes(session, collection_id, current_user.id, [recipe_id]):
+        await _ensure_owned(session, collection_id, current_user)
+        res = await session.execute(select(Recipe.id).where(Recipe.id == recipe_id, Recipe.deleted_at.is_(None)))
+        if res.scalar() is None:
+            raise HTTPException(status_code=404, detail="Recipe not found")
+        # Рецепт уже в коллекции
+        return None
+    await session.commit()
+    membership_cache.invalidate(current_user.id)
     return None
 
 
@@ -137,17 +236,11 @@ async def remove_recipe_from_collection(
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
-    res = await session.execute(select(Collection).where(Collection.id == collection_id))
-    collection: Collection | None = res.scalar()
-    if collection is None:
-        raise HTTPException(status_code=404, detail="Collection not found")
-    if collection.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Forbidden")
-    res = await session.execute(select(Recipe).where(Recipe.id == recipe_id))
-    recipe: Recipe | None = res.scalar()
-    if recipe and recipe in collection.recipes:
-        collection.recipes.remove(recipe)
-        await session.commit()
+    if not await remove_recipes(session, collection_id, current_user.id, [recipe_id]):
+        await _ensure_owned(session, collection_id, current_user)
+        return None
+    await session.commit()
+    membership_cache.invalidate(current_user.id)
     return None
 
 
@@ -168,32 +261,11 @@ async def upload_collection_image(
     if collection.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    # validate MIME type
-    if file.content_type not in {"image/png", "image/jpeg", "image/webp"}:
-        raise HTTPException(status_code=400, detail="Unsupported file type")
-    data = await file.read()
-    if len(data) > 5 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File too large")
-
-    # remove old image if exists and hosted locally
-    if collection.picture_url and collection.picture_url.startswith(settings.MEDIA_URL):
-        old_path = Path(settings.MEDIA_DIR) / collection.picture_url.replace(f"{settings.MEDIA_URL}/", "")
-        if old_path.exists():
-            try:
-                old_path.unlink()
-            except OSError:
-                pass
-
-    # save new image
-    ext = {"image/png": ".png", "image/jpeg": ".jpg", "image/webp": ".webp"}[file.content_type]
-    filename = f"{uuid.uuid4()}{ext}"
-    collections_dir = Path(settings.MEDIA_DIR) / "collections"
-    collections_dir.mkdir(parents=True, exist_ok=True)
-    file_path = collections_dir / filename
-    with open(file_path, "wb") as buffer:
-        buffer.write(data)
-
-    collection.picture_url = f"{settings.MEDIA_URL}/collections/{filename}"
+    # validate type (по сигнатуре) и размер, сохраняем потоково
+    picture_url = await save_image_upload(file, "collections")
+
+    # Старый файл не трогаем: он может быть общим (дедупликация), его уберёт media GC
+    collection.picture_url = picture_url
     await session.commit()
     await session.refresh(collection)
 
@@ -202,5 +274,6 @@ async def upload_collection_image(
         name=collection.name,
         picture_url=collection.picture_url,
         created_at=collection.created_at,
-        recipe_ids=[r.id for r in collection.recipes],
+        recipe_count=collection.recipe_count,
+        recipe_ids=await _collection_recipe_ids(session, collection.id),
     )
@@ -1,39 +1,227 @@
 from __future__ import annotations
 
+import asyncio
+import secrets
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Dict, Optional
+from urllib.parse import urlparse
+
 import httpx
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import Response
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from app.core.config import settings
+from app.services.image_cache import ALLOWED_HOSTS, USER_AGENT, CacheEntry, UpstreamError, host_slot, http_client, image_cache
+from app.services.image_variants import FORMATS, ImageTooLarge, resolve_media_path, snap_size, variant_cache, variant_source_id
+from app.services.image_warmer import image_warmer
 
 router = APIRouter()
 
-# Разрешённые хосты — только те, откуда у нас реально берутся картинки
-ALLOWED_HOSTS = {
-    "img.spoonacular.com",
-    "spoonacular.com",
-    "images.spoonacular.com",
-}
+# Заголовки апстрима, которые отдаём клиенту как есть
+FORWARDED_HEADERS = ("content-length", "etag", "cache-control", "last-modified")
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+class _SourceGone(Exception):
+    """Исходник варианта пропал с диска (вытеснен из кэша или удалён)."""
+
+
+async def _iter_file(fh: BinaryIO) -> AsyncIterator[bytes]:
+    try:
+        while True:
+            chunk = await asyncio.to_thread(fh.read, FILE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await asyncio.to_thread(fh.close)
+
+
+def _file_response(fh: BinaryIO, size: int, media_type: str, headers: Dict[str, str]) -> StreamingResponse:
+    """Ответ из уже открытого файла кэша: вытеснение после open() его не оборвёт."""
+    return StreamingResponse(
+        _iter_file(fh),
+        media_type=media_type,
+        headers={**headers, "Content-Length": str(size)},
+        # Клиент отвалился до начала стрима — генератор не стартует, закрываем здесь
+        background=BackgroundTask(fh.close),
+    )
+
+
+async def _relay(resp: httpx.Response, max_bytes: int) -> AsyncIterator[bytes]:
+    """Отдаёт тело апстрима по кускам; соединение закрывается и при обрыве клиента."""
+    received = 0
+    try:
+        async for chunk in resp.aiter_bytes():
+            received += len(chunk)
+            if received > max_bytes:
+                # Заголовки уже ушли — остаётся только оборвать ответ
+                raise RuntimeError(f"Upstream body exceeds {max_bytes} bytes")
+            yield chunk
+    finally:
+        await resp.aclose()
+
+
+async def _stream_uncached(url: str) -> StreamingResponse:
+    """Прямой стрим из апстрима — когда дисковый кэш выключен."""
+    request = http_client.build_request("GET", url, headers={"User-Agent": USER_AGENT})
+    try:
+        # Слот хоста держим только до получения заголовков, а не на всё время стрима клиенту
+        async with host_slot(url):
+            resp = await http_client.send(request, stream=True)
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=502, detail=f"Upstream request failed: {exc}")
+
+    if resp.status_code != 200:
+        await resp.aclose()
+        raise HTTPException(status_code=resp.status_code, detail="Upstream returned non-200")
+
+    max_bytes = settings.IMAGE_PROXY_MAX_BYTES
+    declared = resp.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > max_bytes:
+        await resp.aclose()
+        raise HTTPException(status_code=502, detail="Upstream image too large")
 
-_client = httpx.AsyncClient(timeout=15.0, follow_redirects=True)
+    headers = {name: resp.headers[name] for name in FORWARDED_HEADERS if name in resp.headers}
+    if "content-encoding" in resp.headers:
+        # aiter_bytes() распаковывает тело, исходная длина уже не совпадёт
+        headers.pop("content-length", None)
+
+    content_type = resp.headers.get("content-type", "image/jpeg")
+    return StreamingResponse(
+        _relay(resp, max_bytes),
+        media_type=content_type,
+        headers=headers,
+        # Если клиент отвалился до начала стрима, генератор не стартует — закрываем здесь
+        background=BackgroundTask(resp.aclose),
+    )
+
+
+async def _cached_original(url: str) -> CacheEntry:
+    try:
+        return await image_cache.get(url)
+    except UpstreamError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail)
+
+
+async def _variant_response(
+    source_id: str,
+    source_path: Path,
+    w: Optional[int],
+    h: Optional[int],
+    fmt: Optional[str],
+    max_age: int,
+) -> StreamingResponse:
+    # Вторая попытка — если готовый вариант вытеснили между get() и open()
+    for _ in range(2):
+        try:
+            entry = await variant_cache.get(source_id, source_path, snap_size(w), snap_size(h), fmt or "webp")
+        except FileNotFoundError:
+            raise _SourceGone(source_id)
+        except ImageTooLarge:
+            raise HTTPException(status_code=422, detail="Image too large to resize")
+        except (OSError, ValueError):
+            raise HTTPException(status_code=422, detail="Cannot decode image")
+        except BrokenProcessPool:
+            raise HTTPException(status_code=503, detail="Image encoder unavailable, retry later")
+        opened = await variant_cache.store.open(entry)
+        if opened is not None:
+            fh, size = opened
+            return _file_response(fh, size, entry.content_type, {"Cache-Control": f"public, max-age={max_age}"})
+    raise HTTPException(status_code=503, detail="Image cache busy, retry later")
+
+
+async def _proxied_variant(url: str, w: Optional[int], h: Optional[int], fmt: Optional[str]) -> StreamingResponse:
+    """Вариант картинки апстрима; если оригинал вытеснили до ресайза — скачиваем заново."""
+    for _ in range(2):
+        entry = await _cached_original(url)
+        try:
+            return await _variant_response(
+                variant_source_id(entry), image_cache.store.path_for(entry.key), w, h, fmt,
+                settings.IMAGE_CACHE_TTL_SECONDS,
+            )
+        except _SourceGone:
+            image_cache.store.forget(entry)
+    raise HTTPException(status_code=503, detail="Image cache busy, retry later")
 
 
 @router.get("/image-proxy")
-async def image_proxy(url: str = Query(..., description="Абсолютный URL изображения")):
+async def image_proxy(
+    request: Request,
+    url: str = Query(..., description="Абсолютный URL изображения"),
+    w: Optional[int] = Query(None, ge=1, description="Вписать в ширину (округляется до разрешённого размера)"),
+    h: Optional[int] = Query(None, ge=1, description="Вписать в высоту (округляется до разрешённого размера)"),
+    fmt: Optional[str] = Query(None, enum=list(FORMATS)),
+):
     """
     Проксирует изображение по указанному URL через сервер.
     Используется для обхода проблем с доступностью внешних CDN на устройствах клиентов.
+    Картинки кэшируются на диске; повторные запросы отдаются файлом без похода в апстрим.
+    С w/h/fmt отдаётся уменьшенная копия (по умолчанию WebP).
     """
-    from urllib.parse import urlparse
     parsed = urlparse(url)
     if parsed.hostname not in ALLOWED_HOSTS:
         raise HTTPException(status_code=400, detail=f"Host '{parsed.hostname}' not allowed")
 
-    try:
-        resp = await _client.get(url, headers={"User-Agent": "FeedAndEat/1.0"})
-    except httpx.RequestError as exc:
-        raise HTTPException(status_code=502, detail=f"Upstream request failed: {exc}")
+    if not image_cache.enabled:
+        return await _stream_uncached(url)
 
-    if resp.status_code != 200:
-        raise HTTPException(status_code=resp.status_code, detail="Upstream returned non-200")
+    if w or h or fmt:
+        return await _proxied_variant(url, w, h, fmt)
 
-    content_type = resp.headers.get("content-type", "image/jpeg")
-    return Response(content=resp.content, media_type=content_type)
+    # Файл мог вытеснить этот или другой воркер — тогда это промах и повторное скачивание
+    for _ in range(2):
+        entry = await _cached_original(url)
+        opened = await image_cache.store.open(entry)
+        if opened is not None:
+            break
+    else:
+        raise HTTPException(status_code=503, detail="Image cache busy, retry later")
+    fh, size = opened
+
+    headers = {"Cache-Control": f"public, max-age={settings.IMAGE_CACHE_TTL_SECONDS}"}
+    if entry.etag:
+        headers["ETag"] = entry.etag
+        if request.headers.get("if-none-match") == entry.etag:
+            await asyncio.to_thread(fh.close)
+            return Response(status_code=304, headers=headers)
+    if entry.last_modified:
+        headers["Last-Modified"] = entry.last_modified
+    return _file_response(fh, size, entry.content_type, headers)
+
+
+@router.get("/image-resize")
+async def image_resize(
+    src: str = Query(..., description="Путь в /media (например, /media/recipes/x.jpg) или URL для /image-proxy"),
+    w: Optional[int] = Query(None, ge=1),
+    h: Optional[int] = Query(None, ge=1),
+    fmt: Optional[str] = Query(None, enum=list(FORMATS)),
+):
+    """Уменьшенная копия загруженной или проксируемой картинки."""
+    if not (w or h or fmt):
+        raise HTTPException(status_code=400, detail="Specify w, h or fmt")
+
+    source_path = await asyncio.to_thread(resolve_media_path, src)
+    if source_path is not None:
+        # Имена загруженных файлов уникальны — вариант не меняется
+        try:
+            return await _variant_response(src, source_path, w, h, fmt, IMMUTABLE_MAX_AGE)
+        except _SourceGone:
+            raise HTTPException(status_code=404, detail="Image not found")
+
+    if urlparse(src).hostname in ALLOWED_HOSTS and image_cache.enabled:
+        return await _proxied_variant(src, w, h, fmt)
+    raise HTTPException(status_code=404, detail="Image not found")
+
+
+@router.get("/image-proxy/stats", include_in_schema=False)
+async def image_proxy_stats(x_stats_token: Optional[str] = Header(None)):
+    """Счётчики дисковых кэшей этого воркера: попадания, промахи, hit rate, занятый объём."""
+    expected = settings.IMAGE_STATS_TOKEN
+    if not expected or not x_stats_token or not secrets.compare_digest(x_stats_token, expected):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return {**image_cache.metrics(), "variants": variant_cache.metrics(), "warmer": image_warmer.last_run}
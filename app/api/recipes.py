@@ -2,20 +2,25 @@ from __future__ import annotations
 
 import os
 import uuid
-from pathlib import Path
+from datetime import datetime
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc, and_, text, or_
+from sqlalchemy import select, func, desc, and_, text
 
 from app.core.database import get_session
-from app.core.config import settings
 from app.models.recipe import Recipe
 from app.schemas.recipe import RecipeCreate, RecipeRead
 from app.models.user import User
 from app.core.security import get_current_user
-from app.models.daily_recipe import DailyRecipe
+from app.services.collections import collections_with_recipe, membership_cache, refresh_collection_stats
+from app.services.daily_scheduler import daily_cache, load_daily_recipe, today_slot
+from app.services.recipe_export import iter_recipes_ndjson
+from app.services.recipe_tags import sync_recipe_tags, tag_filter
+from app.services.tag_catalog import tag_catalog
+from app.services.uploads import save_image_upload
 
 router = APIRouter()
 
@@ -30,8 +35,12 @@ async def create_recipe(
     recipe_data["user_id"] = current_user.id
     recipe = Recipe(**recipe_data)
     session.add(recipe)
+    await session.flush()
+    await sync_recipe_tags(session, recipe.id, recipe.tags)
     await session.commit()
     await session.refresh(recipe)
+    if recipe.tags:
+        tag_catalog.mark_dirty()
     return recipe
 
 
@@ -43,32 +52,20 @@ async def upload_recipe_image(
         session: AsyncSession = Depends(get_session),
 ):
     # Проверяем, что рецепт существует и принадлежит текущему пользователю
-    res = await session.execute(select(Recipe).where(Recipe.id == recipe_id))
+    res = await session.execute(select(Recipe).where(Recipe.id == recipe_id, Recipe.deleted_at.is_(None)))
     recipe: Optional[Recipe] = res.scalar()
     if recipe is None:
         raise HTTPException(status_code=404, detail="Recipe not found")
     if recipe.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not allowed")
 
-    # MIME и размер (<=5MB)
-    if file.content_type not in {"image/png", "image/jpeg", "image/webp"}:
-        raise HTTPException(status_code=400, detail="Unsupported file type")
-    contents = await file.read()
-    if len(contents) > 5 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File too large")
-
-    # сохраняем
-    ext = {"image/png": ".png", "image/jpeg": ".jpg", "image/webp": ".webp"}[file.content_type]
-    filename = f"{uuid.uuid4()}{ext}"
-    recipes_dir = Path(settings.MEDIA_DIR) / "recipes"
-    recipes_dir.mkdir(parents=True, exist_ok=True)
-    file_path = recipes_dir / filename
-    with open(file_path, "wb") as buffer:
-        buffer.write(contents)
-
-    recipe.image_url = f"{settings.MEDIA_URL}/recipes/{filename}"
+    # Тип по сигнатуре, размер <= UPLOAD_MAX_BYTES, запись вне event loop
+    recipe.image_url = await save_image_upload(file, "recipes")
+    # Картинка могла быть обложкой коллекций
+    await refresh_collection_stats(session, await collections_with_recipe(session, recipe.id))
     await session.commit()
     await session.refresh(recipe)
+    daily_cache.invalidate([recipe.id])
     return recipe
 
 
@@ -94,12 +91,13 @@ async def search_recipes(
 ):
     stmt = select(Recipe)
 
+    stmt = stmt.where(Recipe.deleted_at.is_(None))
     if q:
         stmt = stmt.where(Recipe.name.ilike(f"%{q}%"))
 
     if tags:
-        tag_filters = [Recipe.tags.contains([tag]) for tag in tags]
-        stmt = stmt.where(or_(*tag_filters))
+        # Известные теги — по целочисленному индексу recipe_tags, остальные — как раньше по JSONB
+        stmt = stmt.where(await tag_filter(session, tags))
 
     def between(json_key: str, min_val: Optional[float], max_val: Optional[float]):
         nonlocal stmt
@@ -132,7 +130,7 @@ async def search_recipes(
 @router.get("/top", response_model=List[RecipeRead])
 async def top_recipes(limit: int = Query(10, le=100), session: AsyncSession = Depends(get_session)):
     res = await session.execute(
-        select(Recipe).order_by(desc(Recipe.rating)).limit(limit)
+        select(Recipe).where(Recipe.deleted_at.is_(None)).order_by(desc(Recipe.rating)).limit(limit)
     )
     return res.scalars().all()
 
@@ -140,7 +138,7 @@ async def top_recipes(limit: int = Query(10, le=100), session: AsyncSession = De
 @router.get("/latest", response_model=List[RecipeRead])
 async def latest_recipes(limit: int = Query(10, le=100), session: AsyncSession = Depends(get_session)):
     res = await session.execute(
-        select(Recipe).order_by(desc(Recipe.created_at)).limit(limit)
+        select(Recipe).where(Recipe.deleted_at.is_(None)).order_by(desc(Recipe.created_at)).limit(limit)
     )
     return res.scalars().all()
 
@@ -155,7 +153,8 @@ async def low_calorie_recipes(
     stmt = (
         select(Recipe)
         .where(
-            (Recipe.nutrients["Calories"].as_float() <= max_calories)  # type: ignore
+            (Recipe.nutrients["Calories"].as_float() <= max_calories),  # type: ignore
+            Recipe.deleted_at.is_(None),
         )
         .order_by(desc(Recipe.cooked))
         .limit(limit)
@@ -166,20 +165,14 @@ async def low_calorie_recipes(
 
 @router.get("/daily", response_model=RecipeRead)
 async def get_daily_recipe(session: AsyncSession = Depends(get_session)):
-    from datetime import datetime
-    day = datetime.utcnow().timetuple().tm_yday
-    res = await session.execute(select(DailyRecipe).where(DailyRecipe.day_of_year == day))
-    dr = res.scalar()
-    
-    if dr is not None:
-        # Есть рецепт дня - возвращаем его
-        res = await session.execute(select(Recipe).where(Recipe.id == dr.recipe_id))
-        recipe = res.scalar()
-        if recipe is not None:
-            return recipe
+    day = today_slot()
+    # Рецепт дня из памяти процесса либо одним запросом по PK (кэш прогревается в полночь)
+    recipe = daily_cache.get(day) or await load_daily_recipe(session, day)
+    if recipe is not None:
+        return recipe
     
     # Нет рецепта дня - возвращаем случайный рецепт
-    res = await session.execute(select(Recipe).order_by(func.random()).limit(1))
+    res = await session.execute(select(Recipe).where(Recipe.deleted_at.is_(None)).order_by(func.random()).limit(1))
     recipe = res.scalar()
     if recipe is None:
         raise HTTPException(status_code=404, detail="No recipes found")
@@ -187,9 +180,28 @@ async def get_daily_recipe(session: AsyncSession = Depends(get_session)):
     return recipe
 
 
+# ---- Выгрузка ----
+
+@router.get("/export")
+async def export_recipes(
+        created_after: Optional[datetime] = Query(None),
+        created_before: Optional[datetime] = Query(None),
+        tags: Optional[List[str]] = Query(None, description="Список тегов (OR)"),
+        current_user: User = Depends(get_current_user),
+):
+    """Весь каталог в NDJSON (RecipeRead на строку) одним проходом серверного курсора.
+
+    Генератор открывает свою сессию: сессия зависимости закрылась бы раньше, чем ответ дочитан.
+    """
+    return StreamingResponse(
+        iter_recipes_ndjson(created_after, created_before, tags),
+        media_type="application/x-ndjson",
+    )
+
+
 @router.get("/{recipe_id}", response_model=RecipeRead)
 async def get_recipe(recipe_id: uuid.UUID, session: AsyncSession = Depends(get_session)):
-    res = await session.execute(select(Recipe).where(Recipe.id == recipe_id))
+    res = await session.execute(select(Recipe).where(Recipe.id == recipe_id, Recipe.deleted_at.is_(None)))
     recipe: Optional[Recipe] = res.scalar()
     if recipe is None:
         raise HTTPException(status_code=404, detail="Recipe not found")
@@ -203,7 +215,7 @@ async def update_recipe(
         current_user: User = Depends(get_current_user),
         session: AsyncSession = Depends(get_session),
 ):
-    res = await session.execute(select(Recipe).where(Recipe.id == recipe_id))
+    res = await session.execute(select(Recipe).where(Recipe.id == recipe_id, Recipe.deleted_at.is_(None)))
     recipe: Optional[Recipe] = res.scalar()
     if recipe is None:
         raise HTTPException(status_code=404, detail="Recipe not found")
@@ -211,11 +223,20 @@ async def update_recipe(
         raise HTTPException(status_code=403, detail="Not allowed")
     
     recipe_data = data.model_dump()
+    image_changed = recipe_data.get("image_url") != recipe.image_url
+    tags_changed = recipe_data.get("tags") != recipe.tags
     for key, value in recipe_data.items():
         setattr(recipe, key, value)
-    
+
+    if image_changed:
+        await refresh_collection_stats(session, await collections_with_recipe(session, recipe.id))
+    if tags_changed:
+        await sync_recipe_tags(session, recipe.id, recipe.tags)
     await session.commit()
     await session.refresh(recipe)
+    daily_cache.invalidate([recipe.id])
+    if tags_changed:
+        tag_catalog.mark_dirty()
     return recipe
 
 
@@ -225,15 +246,26 @@ async def delete_recipe(
         current_user: User = Depends(get_current_user),
         session: AsyncSession = Depends(get_session),
 ):
-    res = await session.execute(select(Recipe).where(Recipe.id == recipe_id))
+    res = await session.execute(select(Recipe).where(Recipe.id == recipe_id, Recipe.deleted_at.is_(None)))
     recipe: Optional[Recipe] = res.scalar()
     if recipe is None:
         raise HTTPException(status_code=404, detail="Recipe not found")
     if recipe.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not allowed")
     
+    collection_ids = await collections_with_recipe(session, recipe.id)
+    had_tags = bool(recipe.tags)
     await session.delete(recipe)
+    await session.flush()
+    # Связи удалены каскадом — обновляем счётчики и обложки затронутых коллекций
+    await refresh_collection_stats(session, collection_ids)
     await session.commit()
+    if collection_ids:
+        membership_cache.clear()
+    # Слот в daily_recipe удалён каскадом, дозаполнится планировщиком в полночь
+    daily_cache.invalidate([recipe_id])
+    if had_tags:
+        tag_catalog.mark_dirty()
     return {"detail": "Recipe deleted"}
 
 
@@ -243,7 +275,7 @@ async def increment_cooked_counter(
         current_user: User = Depends(get_current_user),
         session: AsyncSession = Depends(get_session),
 ):
-    res = await session.execute(select(Recipe).where(Recipe.id == recipe_id))
+    res = await session.execute(select(Recipe).where(Recipe.id == recipe_id, Recipe.deleted_at.is_(None)))
     recipe: Optional[Recipe] = res.scalar()
     if recipe is None:
         raise HTTPException(status_code=404, detail="Recipe not found")
@@ -1,44 +1,94 @@
 from __future__ import annotations
 
 import uuid
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import any_, bindparam, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
 
 from app.core.database import get_session
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
 from app.core.security import get_current_user
 from app.models.recipe import Recipe
 from app.models.review import Review
 from app.models.user import User
-from app.schemas.review import ReviewCreate, ReviewRead
+from app.schemas.recipe import RecipeIdBatch
+from app.schemas.review import ReviewCreate, ReviewRead, ReviewSummary
+from app.services.rating_queue import rating_queue
+from app.services.reviews import bump_rating_bucket, rating_histogram
 
 router = APIRouter()
 
 
-async def _recalc_rating(recipe_id: uuid.UUID, session: AsyncSession) -> None:
-    """Пересчитывает рейтинг рецепта как среднее всех отзывов."""
-    result = await session.execute(
-        select(func.avg(Review.mark)).where(Review.recipe_id == recipe_id)
-    )
-    avg_mark: Optional[float] = result.scalar()
-
-    res = await session.execute(select(Recipe).where(Recipe.id == recipe_id))
-    recipe: Optional[Recipe] = res.scalar()
-    if recipe is not None:
-        recipe.rating = round(avg_mark, 2) if avg_mark is not None else 0.0
-        await session.commit()
+async def _reviews_page(
+    session: AsyncSession,
+    recipe_id: uuid.UUID,
+    limit: int,
+    cursor: Optional[str],
+) -> Tuple[List[Review], Optional[str]]:
+    """Страница отзывов от новых к старым по индексу (recipe_id, created_at DESC, id DESC)."""
+    stmt = select(Review).where(Review.recipe_id == recipe_id)
+    if cursor:
+        created_at, review_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(Review.created_at, Review.id) < tuple_(created_at, review_id))
+    stmt = stmt.order_by(Review.created_at.desc(), Review.id.desc()).limit(limit + 1)
+    reviews = list((await session.execute(stmt)).scalars().all())
+    next_cursor = None
+    if len(reviews) > limit:
+        reviews = reviews[:limit]
+        next_cursor = encode_cursor(reviews[-1].created_at, reviews[-1].id)
+    return reviews, next_cursor
 
 
 @router.get("/{recipe_id}/reviews", response_model=List[ReviewRead])
 async def get_recipe_reviews(
     recipe_id: uuid.UUID,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Значение X-Next-Cursor из предыдущей страницы"),
+    session: AsyncSession = Depends(get_session),
+):
+    """Отзывы на рецепт от новых к старым, постранично."""
+    reviews, next_cursor = await _reviews_page(session, recipe_id, limit, cursor)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return reviews
+
+
+@router.get("/{recipe_id}/reviews/summary", response_model=ReviewSummary)
+async def get_reviews_summary(
+    recipe_id: uuid.UUID,
+    limit: int = Query(20, ge=1, le=100),
     session: AsyncSession = Depends(get_session),
 ):
-    """Получить все отзывы на рецепт."""
+    """Гистограмма оценок (шаг 0.5) и первая страница отзывов одним запросом."""
+    histogram = await rating_histogram(session, recipe_id)
+    total = sum(histogram.values())
+    rating = round(sum(mark * count for mark, count in histogram.items()) / total, 2) if total else 0.0
+    reviews, next_cursor = await _reviews_page(session, recipe_id, limit, None)
+    return ReviewSummary(
+        recipe_id=recipe_id,
+        rating=rating,
+        total=total,
+        histogram={f"{mark:.1f}": count for mark, count in histogram.items()},
+        reviews=reviews,
+        next_cursor=next_cursor,
+    )
+
+
+@router.post("/reviews/my", response_model=List[ReviewRead])
+async def get_my_reviews_batch(
+    data: RecipeIdBatch,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Свои отзывы сразу для списка рецептов (только те, где отзыв есть)."""
+    # user_id = :u AND recipe_id = ANY(:ids) — один запрос по uq_review_recipe_user, один параметр-массив
+    ids = bindparam("recipe_ids", list(data.recipe_ids), type_=ARRAY(PG_UUID(as_uuid=True)))
     res = await session.execute(
-        select(Review).where(Review.recipe_id == recipe_id)
+        select(Review).where(Review.user_id == current_user.id, Review.recipe_id == any_(ids))
     )
     return res.scalars().all()
 
@@ -72,7 +122,7 @@ async def add_review(
 ):
     """Добавить отзыв на рецепт. Один пользователь — один отзыв."""
     # Проверяем, что рецепт существует
-    res = await session.execute(select(Recipe).where(Recipe.id == recipe_id))
+    res = await session.execute(select(Recipe).where(Recipe.id == recipe_id, Recipe.deleted_at.is_(None)))
     recipe: Optional[Recipe] = res.scalar()
     if recipe is None:
         raise HTTPException(status_code=404, detail="Recipe not found")
@@ -96,11 +146,12 @@ async def add_review(
         mark=data.mark,
     )
     session.add(review)
+    await bump_rating_bucket(session, recipe_id, data.mark, 1)
     await session.commit()
     await session.refresh(review)
 
-    # Пересчитываем рейтинг рецепта
-    await _recalc_rating(recipe_id, session)
+    # Рейтинг рецепта пересчитается в фоне
+    rating_queue.schedule(recipe_id)
 
     return review
 
@@ -113,11 +164,13 @@ async def update_my_review(
     session: AsyncSession = Depends(get_session),
 ):
     """Обновить свой отзыв на рецепт."""
+    # FOR UPDATE: параллельный PUT/DELETE ждёт нас и видит уже новую оценку — иначе старая корзина
+    # гистограммы уменьшится дважды
     res = await session.execute(
         select(Review).where(
             Review.recipe_id == recipe_id,
             Review.user_id == current_user.id
-        )
+        ).with_for_update()
     )
     review: Optional[Review] = res.scalar()
 
@@ -127,12 +180,15 @@ async def update_my_review(
             detail="Review not found. Use POST to create a new review."
         )
 
+    if review.mark != data.mark:
+        await bump_rating_bucket(session, recipe_id, review.mark, -1)
+        await bump_rating_bucket(session, recipe_id, data.mark, 1)
     review.mark = data.mark
     await session.commit()
     await session.refresh(review)
 
-    # Пересчитываем рейтинг рецепта
-    await _recalc_rating(recipe_id, session)
+    # Рейтинг рецепта пересчитается в фоне
+    rating_queue.schedule(recipe_id)
 
     return review
 
@@ -144,11 +200,12 @@ async def delete_my_review(
     session: AsyncSession = Depends(get_session),
 ):
     """Удалить свой отзыв на рецепт."""
+    # FOR UPDATE: повторный DELETE дождётся нашего коммита, не найдёт строку и получит 404
     res = await session.execute(
         select(Review).where(
             Review.recipe_id == recipe_id,
             Review.user_id == current_user.id
-        )
+        ).with_for_update()
     )
     review: Optional[Review] = res.scalar()
 
@@ -156,9 +213,10 @@ async def delete_my_review(
         raise HTTPException(status_code=404, detail="Review not found")
 
     await session.delete(review)
+    await bump_rating_bucket(session, recipe_id, review.mark, -1)
     await session.commit()
 
-    # Пересчитываем рейтинг рецепта
-    await _recalc_rating(recipe_id, session)
+    # Рейтинг рецепта пересчитается в фоне
+    rating_queue.schedule(recipe_id)
 
     return None
@@ -0,0 +1,28 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_session
+from app.core.security import get_current_user
+from app.models.user import User
+from app.schemas.sync import SyncResponse
+from app.services.sync import SyncBoundUnavailable, collect_changes
+
+router = APIRouter()
+
+
+@router.get("/", response_model=SyncResponse)
+async def sync(
+    since: Optional[str] = Query(None, description="token из прошлого ответа; без него — полная выгрузка"),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Рецепты, теги, свои коллекции и отзывы, изменённые после since, плюс удаления.
+
+    Пока has_more — повторять запрос с новым token. full_resync_required — выбросить локальные данные.
+    """
+    try:
+        return await collect_changes(session, current_user.id, since)
+    except SyncBoundUnavailable:
+        raise HTTPException(status_code=503, detail="Sync temporarily unavailable, retry later", headers={"Retry-After": "5"})
@@ -1,17 +1,25 @@
 from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
 from app.core.database import get_session
-from app.models.tag import Tag
 from app.schemas.tag import TagRead
+from app.services.tag_catalog import SORTS, tag_catalog
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[TagRead])
-async def list_tags(session: AsyncSession = Depends(get_session)):
-    res = await session.execute(select(Tag).order_by(Tag.name))
-    return res.scalars().all() 
\ No newline at end of file
+async def list_tags(
+    request: Request,
+    min_count: int = Query(0, ge=0, description="Только теги, которые есть хотя бы у стольких рецептов"),
+    sort: str = Query("name", enum=list(SORTS)),
+    session: AsyncSession = Depends(get_session),
+):
+    # Каталог из памяти; тело ответа уже сериализовано в снимке
+    snapshot = await tag_catalog.get(session)
+    headers = {"ETag": snapshot.etag(min_count, sort), "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.render(min_count, sort), media_type="application/json", headers=headers)
@@ -2,18 +2,16 @@ from typing import Optional, List
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Query
-import uuid, shutil, os
-from pathlib import Path
 
 from sqlalchemy import select, update, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_session
-from app.core.config import settings
 from app.models.user import User
 from app.schemas.user import ProfileUpdate, UserRead
 from app.schemas.recipe import RecipeRead
 from app.core.security import get_current_user
+from app.services.uploads import save_image_upload
 
 router = APIRouter()
 
@@ -75,17 +73,8 @@ async def upload_my_avatar(
 ):
     user = current_user
 
-    # сохраняем файл на диск
-    ext = os.path.splitext(file.filename)[1] or ".png"
-    filename = f"{uuid.uuid4()}{ext}"
-    avatars_dir = Path(settings.MEDIA_DIR) / "avatars"
-    avatars_dir.mkdir(parents=True, exist_ok=True)
-    file_path = avatars_dir / filename
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # формируем URL для доступа
-    avatar_url = f"{settings.MEDIA_URL}/avatars/{filename}"
+    # сохраняем файл на диск (тип по сигнатуре, размер <= UPLOAD_MAX_BYTES)
+    avatar_url = await save_image_upload(file, "avatars")
 
     # обновляем запись пользователя
     await session.execute(update(User).where(User.id == user.id).values(avatar_url=avatar_url))
@@ -105,7 +94,7 @@ async def get_my_recipes(
     from app.models.recipe import Recipe
     res = await session.execute(
         select(Recipe)
-        .where(Recipe.user_id == current_user.id)
+        .where(Recipe.user_id == current_user.id, Recipe.deleted_at.is_(None))
         .order_by(desc(Recipe.created_at))
         .offset(offset)
         .limit(limit)
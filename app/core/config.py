@@ -1,4 +1,6 @@
 # Pydantic v2: BaseSettings вынесен в отдельный пакет
+from typing import Dict, List, Optional
+
 from pydantic_settings import BaseSettings
 # Настройки читаются из переменных окружения или из файла .env автоматически.
 
@@ -17,6 +19,102 @@ class Settings(BaseSettings):
 
     MEDIA_DIR: str = "media"
     MEDIA_URL: str = "/media"
+    UPLOAD_MAX_BYTES: int = 5 * 1024 * 1024
+
+    # Раздача /media: файлы не меняются, кэшируются клиентом надолго; маленькие держим в памяти
+    MEDIA_CACHE_MAX_AGE: int = 365 * 24 * 3600
+    MEDIA_HOT_CACHE_BYTES: int = 64 * 1024 * 1024
+    MEDIA_HOT_FILE_MAX_BYTES: int = 512 * 1024
+
+    # Удаление загрузок без ссылок в БД (интервал 0 — не запускать в приложении)
+    MEDIA_GC_INTERVAL_SECONDS: int = 6 * 3600
+    MEDIA_GC_GRACE_SECONDS: int = 24 * 3600
+    MEDIA_GC_BATCH_SIZE: int = 500
+
+    # Rate limiting: путь -> "<запросов>/<секунд>" (на IP и на пользователя)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMITS: Dict[str, str] = {
+        "/auth/login": "10/60",
+        "/auth/token": "10/60",
+        "/auth/register": "5/60",
+        "/image-proxy": "120/60",
+        "/image-resize": "60/60",
+    }
+    RATE_LIMIT_SWEEP_SECONDS: int = 60
+    RATE_LIMIT_MAX_KEYS: int = 100_000
+    # Общий бэкенд для нескольких воркеров (нужен пакет redis), иначе — память процесса
+    RATE_LIMIT_REDIS_URL: Optional[str] = None
+    # Брать IP клиента из X-Forwarded-For (только за доверенным reverse proxy)
+    RATE_LIMIT_TRUST_FORWARDED: bool = False
+
+    # Кэш "в каких коллекциях рецепт" на пользователя (0 — выключен)
+    SAVED_STATE_CACHE_USERS: int = 5000
+    SAVED_STATE_CACHE_TTL_SECONDS: int = 60
+
+    # Рейтинг рецепта пересчитывается в фоне не чаще раза за окно
+    RATING_RECALC_WINDOW_SECONDS: float = 2.0
+
+    # Максимальный размер тела, которое /image-proxy готов отдать
+    IMAGE_PROXY_MAX_BYTES: int = 10 * 1024 * 1024
+
+    # Пул соединений /image-proxy к апстриму
+    IMAGE_PROXY_TIMEOUT_SECONDS: float = 15.0
+    IMAGE_PROXY_MAX_CONNECTIONS: int = 100
+    IMAGE_PROXY_MAX_KEEPALIVE: int = 20
+    IMAGE_PROXY_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    IMAGE_PROXY_PER_HOST_LIMIT: int = 16
+
+    # Дисковый кэш /image-proxy (по умолчанию MEDIA_DIR/cache/proxy; 0 байт — выключен).
+    # Бюджет на воркер: у каждого процесса свой LRU-индекс, N воркеров займут до N × MAX_BYTES
+    IMAGE_CACHE_DIR: Optional[str] = None
+    IMAGE_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    IMAGE_CACHE_TTL_SECONDS: int = 24 * 3600
+    IMAGE_CACHE_NEGATIVE_TTL_SECONDS: int = 60
+    # Токен для /image-proxy/stats (заголовок X-Stats-Token); не задан — эндпоинт отдаёт 404
+    IMAGE_STATS_TOKEN: Optional[str] = None
+
+    # Уменьшенные копии картинок (w/h округляются вверх до одного из размеров)
+    IMAGE_VARIANT_SIZES: List[int] = [120, 240, 480, 960]
+    IMAGE_VARIANT_QUALITY: int = 80
+    IMAGE_VARIANT_MAX_BYTES: int = 1024 * 1024 * 1024
+    IMAGE_RESIZE_WORKERS: int = 2
+
+    # Прогрев кэша /image-proxy картинками рецепта дня и подборок top/latest (интервал 0 — выключен)
+    IMAGE_WARM_INTERVAL_SECONDS: int = 15 * 60
+    IMAGE_WARM_LIST_LIMIT: int = 100
+    IMAGE_WARM_CONCURRENCY: int = 8
+    IMAGE_WARM_MAX_BYTES: int = 128 * 1024 * 1024
+    IMAGE_WARM_VARIANT_WIDTHS: List[int] = [240, 480]
+
+    # Каталог /tags: перестраивается после записи рецептов (не чаще MIN_REFRESH) и раз в TTL
+    TAG_CATALOG_TTL_SECONDS: int = 600
+    TAG_CATALOG_MIN_REFRESH_SECONDS: int = 10
+
+    # Рецепт дня: расписание на год, без повторов ближе окна; сезонные теги по номеру месяца
+    DAILY_SCHEDULER_ENABLED: bool = True
+    DAILY_CANDIDATE_POOL: int = 2000
+    DAILY_REPEAT_WINDOW_DAYS: int = 180
+    DAILY_SEASONAL_TAGS: Dict[int, List[str]] = {}
+    DAILY_CACHE_TTL_SECONDS: int = 300
+
+    # Push-рассылка: "fake" или "package.module:Class" (реализация PushProvider)
+    PUSH_PROVIDER: str = "fake"
+    PUSH_CONCURRENCY: int = 32
+    PUSH_SCAN_BATCH: int = 5000
+    PUSH_MAX_RETRIES: int = 3
+    PUSH_BACKOFF_BASE_SECONDS: float = 0.5
+    PUSH_BACKOFF_MAX_SECONDS: float = 30.0
+
+    # Выгрузка /recipes/export: строк на выборку серверного курсора и на кусок ответа
+    RECIPE_EXPORT_CHUNK_ROWS: int = 1000
+
+    # Дельта-синхронизация /sync: строк каждой сущности на страницу, задержка "устаканивания"
+    # (изменения моложе неё ещё не отдаём — их транзакции могут быть не закоммичены) и срок жизни надгробий
+    SYNC_PAGE_SIZE: int = 500
+    SYNC_SETTLE_SECONDS: float = 5.0
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 30
+    # Период чистки просроченных надгробий (0 — только через utils/purge_tombstones.py)
+    SYNC_TOMBSTONE_PURGE_INTERVAL_SECONDS: int = 21600
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,247 @@
+"""Раздача загруженных файлов из MEDIA_DIR вместо StaticFiles.
+
+Имена загрузок уникальны (sha256 содержимого), поэтому файлы по одному URL не меняются:
+отдаём Cache-Control immutable на год, ETag/Last-Modified с ответом 304, одиночный Range (206/416).
+Небольшие часто запрашиваемые файлы держим в памяти (LRU с бюджетом в байтах), чтобы не ходить на диск.
+"""
+from __future__ import annotations
+
+import asyncio
+import mimetypes
+import os
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.types import Receive, Scope, Send
+
+from .config import settings
+
+CHUNK_SIZE = 64 * 1024
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+@dataclass
+class _File:
+    path: Path
+    size: int
+    etag: str
+    last_modified: str
+    mtime: float
+    content_type: str
+    body: Optional[bytes] = None
+
+
+class HotFileCache:
+    """LRU тел файлов в памяти с ограничением по суммарному размеру."""
+
+    def __init__(self, max_bytes: int, max_file_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.total_bytes = 0
+        self._files: "OrderedDict[str, _File]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def get(self, key: str) -> Optional[_File]:
+        entry = self._files.get(key)
+        if entry is not None:
+            self._files.move_to_end(key)
+        return entry
+
+    def accepts(self, size: int) -> bool:
+        return 0 < size <= self.max_file_bytes and size <= self.max_bytes
+
+    def put(self, key: str, entry: _File) -> None:
+        previous = self._files.pop(key, None)
+        if previous is not None:
+            self.total_bytes -= previous.size
+        self._files[key] = entry
+        self.total_bytes += entry.size
+        while self.total_bytes > self.max_bytes:
+            _, evicted = self._files.popitem(last=False)
+            self.total_bytes -= evicted.size
+
+
+def _parse_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    """'bytes=a-b' -> (start, end) включительно; None — диапазон невыполним. Несколько диапазонов не поддерживаем."""
+    match = _RANGE_RE.match(value.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last or int(last) == 0:
+            return None
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+class MediaFiles:
+    """ASGI-приложение для app.mount(settings.MEDIA_URL, ...)."""
+
+    def __init__(
+        self,
+        directory: str,
+        max_age: Optional[int] = None,
+        hot_cache_bytes: Optional[int] = None,
+        hot_file_max_bytes: Optional[int] = None,
+        denied_prefixes: Tuple[str, ...] = ("cache",),
+    ) -> None:
+        self.root = Path(directory).resolve()
+        max_age = settings.MEDIA_CACHE_MAX_AGE if max_age is None else max_age
+        self.cache_control = f"public, max-age={max_age}, immutable"
+        self.hot = HotFileCache(
+            settings.MEDIA_HOT_CACHE_BYTES if hot_cache_bytes is None else hot_cache_bytes,
+            settings.MEDIA_HOT_FILE_MAX_BYTES if hot_file_max_bytes is None else hot_file_max_bytes,
+        )
+        self.denied_prefixes = denied_prefixes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+        if scope["method"] not in ("GET", "HEAD"):
+            await self._send_empty(send, 405, [(b"allow", b"GET, HEAD")])
+            return
+
+        relative = self._relative_path(scope)
+        entry = self.hot.get(relative) if relative else None
+        if entry is None and relative:
+            entry = await asyncio.to_thread(self._lookup, relative)
+            if entry is not None and entry.body is not None:
+                # Содержимое по этому URL не меняется, поэтому закэшированное тело не перепроверяем
+                self.hot.put(relative, entry)
+        if entry is None:
+            await self._send_empty(send, 404, [], body=b"Not Found")
+            return
+
+        headers = Headers(scope=scope)
+        common = [
+            (b"cache-control", self.cache_control.encode()),
+            (b"etag", entry.etag.encode()),
+            (b"last-modified", entry.last_modified.encode()),
+            (b"accept-ranges", b"bytes"),
+        ]
+        if self._not_modified(headers, entry):
+            await self._send_empty(send, 304, common)
+            return
+
+        start, end, status = 0, entry.size - 1, 200
+        range_header = headers.get("range")
+        if range_header and self._range_applies(headers, entry):
+            if "," in range_header:
+                pass  # несколько диапазонов — отдаём файл целиком, это допустимо по RFC 9110
+            else:
+                parsed = _parse_range(range_header, entry.size)
+                if parsed is None:
+                    await self._send_empty(send, 416, common + [(b"content-range", f"bytes */{entry.size}".encode())])
+                    return
+                start, end = parsed
+                status = 206
+                common.append((b"content-range", f"bytes {start}-{end}/{entry.size}".encode()))
+
+        length = end - start + 1
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": common + [
+                (b"content-type", entry.content_type.encode()),
+                (b"content-length", str(length).encode()),
+            ],
+        })
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+        if entry.body is not None:
+            await send({"type": "http.response.body", "body": entry.body[start:end + 1]})
+            return
+        await self._stream(send, entry.path, start, length)
+
+    def _relative_path(self, scope: Scope) -> Optional[str]:
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        relative = path.lstrip("/")
+        if not relative or relative.split("/", 1)[0] in self.denied_prefixes:
+            return None
+        return relative
+
+    def _lookup(self, relative: str) -> Optional[_File]:
+        """stat + (для маленьких файлов) чтение в память; блокирующий — через to_thread."""
+        path = (self.root / relative).resolve()
+        if self.root not in path.parents:
+            return None
+        try:
+            st = path.stat()
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        if not os.path.isfile(path):
+            return None
+        entry = _File(
+            path=path,
+            size=st.st_size,
+            etag=f'"{st.st_mtime_ns:x}-{st.st_size:x}"',
+            last_modified=formatdate(st.st_mtime, usegmt=True),
+            mtime=st.st_mtime,
+            content_type=mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+        )
+        if self.hot.accepts(st.st_size):
+            entry.body = path.read_bytes()
+            entry.size = len(entry.body)
+        return entry
+
+    @staticmethod
+    def _not_modified(headers: Headers, entry: _File) -> bool:
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or entry.etag in tags
+        if_modified_since = headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(entry.mtime) <= since
+        return False
+
+    @staticmethod
+    def _range_applies(headers: Headers, entry: _File) -> bool:
+        if_range = headers.get("if-range")
+        return if_range is None or if_range in (entry.etag, entry.last_modified)
+
+    @staticmethod
+    async def _stream(send: Send, path: Path, start: int, length: int) -> None:
+        fh = await asyncio.to_thread(open, path, "rb")
+        try:
+            await asyncio.to_thread(fh.seek, start)
+            remaining = length
+            while remaining > 0:
+                chunk = await asyncio.to_thread(fh.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break  # файл укоротили — обрываем ответ
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            await asyncio.to_thread(fh.close)
+
+    @staticmethod
+    async def _send_empty(
+        send: Send, status: int, headers: List[Tuple[bytes, bytes]], body: bytes = b""
+    ) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": headers + [(b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,25 @@
+"""Курсоры для keyset-пагинации: непрозрачная строка из пары (timestamp, id)."""
+from __future__ import annotations
+
+import base64
+import uuid
+from datetime import datetime
+from typing import Tuple
+
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(ts: datetime, item_id: uuid.UUID) -> str:
+    raw = f"{ts.isoformat()}|{item_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, _, item_id = raw.partition("|")
+        return datetime.fromisoformat(ts), uuid.UUID(item_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
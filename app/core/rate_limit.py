@@ -0,0 +1,200 @@
+"""Rate limiting (token bucket) для дорогих маршрутов: bcrypt в /auth и исходящий HTTP в /image-proxy."""
+from __future__ import annotations
+
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Protocol, Tuple
+
+from jose import jwt, JWTError
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .config import settings
+from .security import ALGORITHM
+
+
+def parse_limit(value: str) -> Tuple[int, float]:
+    """'10/60' -> (10 запросов, 60 секунд)."""
+    count, _, period = value.partition("/")
+    capacity, seconds = int(count), float(period or 1)
+    if capacity <= 0 or seconds <= 0:
+        raise ValueError(f"Invalid rate limit: {value!r}")
+    return capacity, seconds
+
+
+class RateLimitBackend(Protocol):
+    async def acquire(self, key: str, capacity: int, period: float) -> float:
+        """Забирает токен из корзины. Возвращает 0, если можно, иначе — секунды до следующего токена."""
+        ...
+
+
+class _Bucket:
+    __slots__ = ("tokens", "stamp", "period")
+
+    def __init__(self, tokens: float, stamp: float, period: float) -> None:
+        self.tokens = tokens
+        self.stamp = stamp
+        self.period = period
+
+
+class InMemoryBackend:
+    """Корзины в памяти процесса. Точен только в пределах одного воркера.
+
+    Корзины лежат в порядке последнего обращения: при переполнении за O(1) вытесняется самая давняя,
+    полный проход по простаивающим — не чаще раза в sweep_seconds.
+    """
+
+    def __init__(self, sweep_seconds: float = 60.0, max_keys: int = 100_000) -> None:
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        self._sweep_seconds = sweep_seconds
+        self._max_keys = max_keys
+        self._next_sweep = time.monotonic() + sweep_seconds
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def acquire(self, key: str, capacity: int, period: float) -> float:
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self.sweep(now)
+
+        rate = capacity / period
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            while len(self._buckets) >= self._max_keys:
+                self._buckets.popitem(last=False)
+            bucket = self._buckets[key] = _Bucket(float(capacity), now, period)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(capacity, bucket.tokens + (now - bucket.stamp) * rate)
+            bucket.stamp = now
+            bucket.period = period
+
+        if bucket.tokens >= 1.0:
+            bucket.tokens -= 1.0
+            return 0.0
+        return (1.0 - bucket.tokens) / rate
+
+    def sweep(self, now: Optional[float] = None) -> None:
+        """Удаляет корзины, которые за время простоя успели наполниться полностью."""
+        now = time.monotonic() if now is None else now
+        idle = [k for k, b in self._buckets.items() if now - b.stamp >= b.period]
+        for key in idle:
+            del self._buckets[key]
+        self._next_sweep = now + self._sweep_seconds
+
+
+_REDIS_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local rate = capacity / period
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'stamp')
+local tokens = tonumber(state[1]) or capacity
+local stamp = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - stamp) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'stamp', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(period * 1000))
+return tostring(wait)
+"""
+
+
+class RedisBackend:
+    """Общие корзины для всех воркеров. Требует пакет `redis` (не входит в requirements.txt)."""
+
+    def __init__(self, url: str, fallback: Optional[RateLimitBackend] = None) -> None:
+        from redis import asyncio as aioredis  # опциональная зависимость
+
+        self._redis = aioredis.from_url(url)
+        self._script = self._redis.register_script(_REDIS_BUCKET_LUA)
+        self._fallback = fallback
+
+    async def acquire(self, key: str, capacity: int, period: float) -> float:
+        try:
+            wait = await self._script(keys=[f"ratelimit:{key}"], args=[capacity, period, time.time()])
+        except Exception:
+            # Redis недоступен — не роняем запросы, считаем локально
+            if self._fallback is None:
+                return 0.0
+            return await self._fallback.acquire(key, capacity, period)
+        return float(wait)
+
+
+def create_backend() -> RateLimitBackend:
+    local = InMemoryBackend(settings.RATE_LIMIT_SWEEP_SECONDS, settings.RATE_LIMIT_MAX_KEYS)
+    if settings.RATE_LIMIT_REDIS_URL:
+        return RedisBackend(settings.RATE_LIMIT_REDIS_URL, fallback=local)
+    return local
+
+
+class RateLimitMiddleware:
+    """ASGI middleware: отдельные корзины на IP и на пользователя (sub из JWT) для каждого маршрута."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limits: Optional[Dict[str, str]] = None,
+        backend: Optional[RateLimitBackend] = None,
+    ) -> None:
+        self.app = app
+        raw = settings.RATE_LIMITS if limits is None else limits
+        self.limits = {path.rstrip("/") or "/": parse_limit(value) for path, value in raw.items()}
+        self.backend = backend or create_backend()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"].rstrip("/") or "/"
+        limit = self.limits.get(path)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        capacity, period = limit
+        headers = dict(scope.get("headers") or [])
+        wait = await self.backend.acquire(f"ip:{path}:{self._client_ip(scope, headers)}", capacity, period)
+        if wait <= 0:
+            user_id = self._user_id(headers)
+            if user_id is not None:
+                wait = await self.backend.acquire(f"user:{path}:{user_id}", capacity, period)
+
+        if wait > 0:
+            response = JSONResponse(
+                {"detail": "Too many requests"},
+                status_code=429,
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _client_ip(scope: Scope, headers: Dict[bytes, bytes]) -> str:
+        if settings.RATE_LIMIT_TRUST_FORWARDED:
+            forwarded = headers.get(b"x-forwarded-for")
+            if forwarded:
+                return forwarded.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @staticmethod
+    def _user_id(headers: Dict[bytes, bytes]) -> Optional[str]:
+        auth = headers.get(b"authorization")
+        if not auth:
+            return None
+        scheme, _, token = auth.decode("latin-1").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
+        return payload.get("sub")
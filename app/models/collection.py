@@ -3,7 +3,7 @@ from __future__ import annotations
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, Table
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, Integer, Table, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -14,6 +14,29 @@ collection_recipes = Table(
     Base.metadata,
     Column("collection_id", UUID(as_uuid=True), ForeignKey("collections.id", ondelete="CASCADE"), primary_key=True),
     Column("recipe_id", UUID(as_uuid=True), ForeignKey("recipes.id", ondelete="CASCADE"), primary_key=True),
+    Column("added_at", DateTime, nullable=False, default=datetime.utcnow, server_default=text("now()")),
+    # Для /sync, выставляется триггером
+    Column("updated_at", DateTime, nullable=False, default=datetime.utcnow, server_default=text("now()")),
+    # Владелец коллекции для ленты /sync, выставляется триггером из collections
+    Column("owner_id", UUID(as_uuid=True), nullable=False),
+)
+
+# Содержимое коллекции листается от новых к старым
+Index(
+    "ix_collection_recipes_collection_added",
+    collection_recipes.c.collection_id,
+    collection_recipes.c.added_at.desc(),
+    collection_recipes.c.recipe_id.desc(),
+)
+# Обратный поиск: в каких коллекциях лежит рецепт
+Index("ix_collection_recipes_recipe_id", collection_recipes.c.recipe_id)
+# Keyset-курсор /sync по своим связям
+Index(
+    "ix_collection_recipes_owner_updated",
+    collection_recipes.c.owner_id,
+    collection_recipes.c.updated_at,
+    collection_recipes.c.collection_id,
+    collection_recipes.c.recipe_id,
 )
 
 
@@ -24,16 +47,23 @@ class Collection(Base):
     owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
     name = Column(String(100), nullable=False)
-    picture_url = Column(String, nullable=True)
+    picture_url = Column(String, nullable=True, index=True)
+
+    # Денормализованные поля, обновляются при добавлении/удалении рецептов
+    recipe_count = Column(Integer, nullable=False, default=0, server_default="0")
+    cover_image_url = Column(String, nullable=True)
 
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Время последнего изменения для /sync; в БД его выставляет триггер (timezone('utc', clock_timestamp()))
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=text("now()"))
+
+    __table_args__ = (Index("ix_collections_owner_updated_id", "owner_id", "updated_at", "id"),)
 
     owner = relationship("User", back_populates="collections")
     recipes = relationship(
         "Recipe",
         secondary=collection_recipes,
         back_populates="collections",
-        lazy="selectin",
     )
 
     def __repr__(self) -> str:
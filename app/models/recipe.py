@@ -4,7 +4,7 @@ import uuid
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 
-from sqlalchemy import Column, String, DateTime, Float, Integer, ForeignKey
+from sqlalchemy import Column, String, DateTime, Float, Integer, ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 
@@ -18,7 +18,7 @@ class Recipe(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
 
     name = Column(String(255), nullable=False)
-    image_url = Column(String, nullable=True)
+    image_url = Column(String, nullable=True, index=True)
 
     instructions = Column(JSONB, nullable=False, default=list)  # List[Instruction]
     servings = Column(JSONB, nullable=True)  # {amount, weight}
@@ -31,6 +31,16 @@ class Recipe(Base):
 
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Синхронизация с источником импорта (utils/reimport_recipes.py): ключ записи в дампе и хэш содержимого
+    source_key = Column(String(255), unique=True, nullable=True)
+    content_hash = Column(String(64), nullable=True)
+    # Пропал из источника — скрыт из выдачи, но ID, отзывы и коллекции сохраняются
+    deleted_at = Column(DateTime, nullable=True)
+    # Время последнего изменения для /sync; в БД его выставляет триггер (timezone('utc', clock_timestamp()))
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=text("now()"))
+
+    __table_args__ = (Index("ix_recipes_updated_id", "updated_at", "id"),)
+
     author = relationship("User", back_populates="recipes")
     collections = relationship("Collection", secondary="collection_recipes", back_populates="recipes")
     reviews = relationship("Review", back_populates="recipe", cascade="all, delete-orphan")
@@ -3,7 +3,7 @@ from __future__ import annotations
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, Float, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Float, DateTime, ForeignKey, Index, Integer, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -18,10 +18,16 @@ class Review(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     mark = Column(Float, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Время последнего изменения для /sync; в БД его выставляет триггер (timezone('utc', clock_timestamp()))
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=text("now()"))
 
     # Один пользователь — один отзыв на рецепт
     __table_args__ = (
         UniqueConstraint("recipe_id", "user_id", name="uq_review_recipe_user"),
+        # Лента отзывов рецепта от новых к старым
+        Index("ix_reviews_recipe_created", "recipe_id", created_at.desc(), id.desc()),
+        # Keyset-курсор /sync по своим отзывам
+        Index("ix_reviews_user_updated_id", "user_id", "updated_at", "id"),
     )
 
     recipe = relationship("Recipe", back_populates="reviews")
@@ -29,3 +35,16 @@ class Review(Base):
 
     def __repr__(self) -> str:
         return f"<Review {self.id} recipe={self.recipe_id} user={self.user_id} mark={self.mark}>"
+
+
+class RecipeRatingBucket(Base):
+    """Гистограмма оценок: сколько отзывов с данной оценкой (шаг 0.5). Обновляется при записи отзывов."""
+
+    __tablename__ = "recipe_rating_buckets"
+
+    recipe_id = Column(UUID(as_uuid=True), ForeignKey("recipes.id", ondelete="CASCADE"), primary_key=True)
+    mark = Column(Float, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<RecipeRatingBucket recipe={self.recipe_id} mark={self.mark} count={self.count}>"
@@ -0,0 +1,26 @@
+from sqlalchemy import BigInteger, Column, DateTime, Identity, Index, String, text
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.core.database import Base
+
+
+class SyncTombstone(Base):
+    """Удалённая строка для /sync. Пишется триггером AFTER DELETE, чистится через SYNC_TOMBSTONE_RETENTION_DAYS."""
+
+    __tablename__ = "sync_tombstones"
+
+    id = Column(BigInteger, Identity(), primary_key=True)
+    entity = Column(String(32), nullable=False)  # recipes, tags, collections, collection_recipes, reviews
+    entity_id = Column(String(80), nullable=False)  # id или "collection_id:recipe_id"
+    owner_id = Column(UUID(as_uuid=True), nullable=True)  # NULL — общий каталог, иначе видит только владелец
+    deleted_at = Column(DateTime, nullable=False, server_default=text("timezone('utc', clock_timestamp())"))
+
+    __table_args__ = (
+        # Чистка просроченных
+        Index("ix_sync_tombstones_deleted_id", "deleted_at", "id"),
+        # Лента /sync: общие (owner_id IS NULL) и свои — два прохода по одному индексу
+        Index("ix_sync_tombstones_owner_deleted_id", "owner_id", "deleted_at", "id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<SyncTombstone {self.entity} {self.entity_id}>"
@@ -1,7 +1,7 @@
 from datetime import datetime
 import uuid
 
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, DateTime, ForeignKey, Identity, Index, Integer, Table, text
 from sqlalchemy.dialects.postgresql import UUID
 
 from app.core.database import Base
@@ -11,8 +11,26 @@ class Tag(Base):
     __tablename__ = "tags"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Компактный ключ для recipe_tags
+    num_id = Column(Integer, Identity(), unique=True, nullable=False)
     name = Column(String(50), unique=True, nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Время последнего изменения для /sync; в БД его выставляет триггер (timezone('utc', clock_timestamp()))
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=text("now()"))
+
+    __table_args__ = (Index("ix_tags_updated_id", "updated_at", "id"),)
 
     def __repr__(self):
-        return f"<Tag {self.name}>" 
\ No newline at end of file
+        return f"<Tag {self.name}>"
+
+
+# Теги рецептов: синхронизируется с recipes.tags (JSONB) по lower(name), неизвестные теги не связываются
+recipe_tags = Table(
+    "recipe_tags",
+    Base.metadata,
+    Column("recipe_id", UUID(as_uuid=True), ForeignKey("recipes.id", ondelete="CASCADE"), primary_key=True),
+    Column("tag_id", Integer, ForeignKey("tags.num_id", ondelete="CASCADE"), primary_key=True),
+)
+
+# Обратное направление: рецепты по тегу (фильтр поиска, счётчики каталога)
+Index("ix_recipe_tags_tag_recipe", recipe_tags.c.tag_id, recipe_tags.c.recipe_id)
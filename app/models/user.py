@@ -16,7 +16,7 @@ class User(Base):
     username = Column(String(100), unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
 
-    avatar_url = Column(String, nullable=True)
+    avatar_url = Column(String, nullable=True, index=True)
     about_me = Column(String, nullable=True)
     is_profile_private = Column(Boolean, default=False)
     theme_settings = Column(String, default="light")
@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import List, Optional
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class CollectionBase(BaseModel):
@@ -17,6 +17,7 @@ class CollectionRead(CollectionBase):
     id: UUID
     picture_url: Optional[str] = None
     created_at: datetime
+    recipe_count: int = 0
     recipe_ids: List[UUID] = []
 
     model_config = {"from_attributes": True}
@@ -27,5 +28,31 @@ class CollectionBrief(CollectionBase):
     id: UUID
     picture_url: Optional[str] = None
     created_at: datetime
+    recipe_count: int = 0
 
-    model_config = {"from_attributes": True} 
\ No newline at end of file
+    model_config = {"from_attributes": True}
+
+
+# ---- Массовые операции с составом коллекции ----
+class CollectionRecipesBulk(BaseModel):
+    recipe_ids: List[UUID] = Field(..., min_length=1, max_length=500)
+
+
+class CollectionRecipesTransfer(CollectionRecipesBulk):
+    target_collection_id: UUID
+    move: bool = False  # true — перенести (удалить из исходной), false — скопировать
+
+
+class CollectionRecipesBulkResult(BaseModel):
+    affected: int
+
+
+class CollectionRecipesTransferResult(CollectionRecipesBulkResult):
+    """affected — removed при переносе, copied при копировании."""
+    copied: int
+    removed: int = 0
+
+
+class RecipeSavedState(BaseModel):
+    recipe_id: UUID
+    collection_ids: List[UUID] = []
@@ -68,6 +68,11 @@ class RecipeRead(RecipeBase):
     }
 
 
+class RecipeIdBatch(BaseModel):
+    """Список ID рецептов для пакетных запросов (например, состояние карточек в ленте)."""
+    recipe_ids: List[UUID] = Field(..., min_length=1, max_length=200)
+
+
 # ---- Search params ----
 
 
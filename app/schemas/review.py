@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, Field, field_validator
@@ -25,3 +25,13 @@ class ReviewRead(BaseModel):
     model_config = {
         "from_attributes": True,
     }
+
+
+class ReviewSummary(BaseModel):
+    """Гистограмма оценок и первая страница отзывов для экрана рецепта."""
+    recipe_id: UUID
+    rating: float
+    total: int
+    histogram: Dict[str, int]  # "0.5" .. "5.0" -> количество
+    reviews: List[ReviewRead]
+    next_cursor: Optional[str] = None
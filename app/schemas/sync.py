@@ -0,0 +1,41 @@
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from app.schemas.collection import CollectionBrief
+from app.schemas.recipe import RecipeRead
+from app.schemas.review import ReviewRead
+from app.schemas.tag import TagBrief
+
+
+class CollectionRecipeLink(BaseModel):
+    collection_id: UUID
+    recipe_id: UUID
+    added_at: Optional[datetime] = None
+
+
+class SyncDeleted(BaseModel):
+    recipes: List[UUID] = []
+    tags: List[UUID] = []
+    collections: List[UUID] = []
+    collection_recipes: List[CollectionRecipeLink] = []
+    reviews: List[UUID] = []
+
+
+class SyncResponse(BaseModel):
+    """Изменения с момента токена since. has_more — сразу запросить следующую страницу с token.
+
+    full_resync_required — токен недействителен или старше хранения надгробий: клиент удаляет
+    локальные данные, а ответ содержит первую страницу полной выгрузки.
+    """
+    token: str
+    has_more: bool = False
+    full_resync_required: bool = False
+    recipes: List[RecipeRead] = []
+    tags: List[TagBrief] = []
+    collections: List[CollectionBrief] = []
+    collection_recipes: List[CollectionRecipeLink] = []
+    reviews: List[ReviewRead] = []
+    deleted: SyncDeleted = SyncDeleted()
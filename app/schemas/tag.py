@@ -3,9 +3,13 @@ from uuid import UUID
 from pydantic import BaseModel
 
 
-class TagRead(BaseModel):
+class TagBrief(BaseModel):
     id: UUID
     name: str
     created_at: datetime
 
-    model_config = {"from_attributes": True} 
\ No newline at end of file
+    model_config = {"from_attributes": True}
+
+
+class TagRead(TagBrief):
+    recipe_count: int = 0 
\ No newline at end of file
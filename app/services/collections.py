@@ -0,0 +1,249 @@
+"""Состав коллекций: точечные INSERT/DELETE по collection_recipes и денормализованные recipe_count / cover_image_url."""
+from __future__ import annotations
+
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.models.collection import Collection, collection_recipes
+from app.models.recipe import Recipe
+
+Membership = Dict[uuid.UUID, Set[uuid.UUID]]  # recipe_id -> {collection_id}
+
+
+class MembershipCache:
+    """LRU-кэш состава всех коллекций пользователя.
+
+    Сбрасывается после коммита изменений состава; TTL ограничивает устаревание в других воркерах.
+    """
+
+    def __init__(self, max_users: int, ttl: float) -> None:
+        self._data: "OrderedDict[uuid.UUID, Tuple[float, Membership]]" = OrderedDict()
+        self._max_users = max_users
+        self._ttl = ttl
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_users > 0
+
+    def get(self, user_id: uuid.UUID) -> Optional[Membership]:
+        entry = self._data.get(user_id)
+        if entry is None:
+            return None
+        expires, membership = entry
+        if expires < time.monotonic():
+            del self._data[user_id]
+            return None
+        self._data.move_to_end(user_id)
+        return membership
+
+    def put(self, user_id: uuid.UUID, membership: Membership) -> None:
+        if not self.enabled:
+            return
+        self._data[user_id] = (time.monotonic() + self._ttl, membership)
+        self._data.move_to_end(user_id)
+        while len(self._data) > self._max_users:
+            self._data.popitem(last=False)
+
+    def invalidate(self, user_id: uuid.UUID) -> None:
+        self._data.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+membership_cache = MembershipCache(settings.SAVED_STATE_CACHE_USERS, settings.SAVED_STATE_CACHE_TTL_SECONDS)
+
+
+def _cover_subquery():
+    """Картинка последнего добавленного рецепта (идёт по индексу collection_id, added_at DESC)."""
+    return (
+        select(Recipe.image_url)
+        .join(collection_recipes, collection_recipes.c.recipe_id == Recipe.id)
+        .where(
+            collection_recipes.c.collection_id == Collection.id,
+            Recipe.image_url.isnot(None),
+            Recipe.deleted_at.is_(None),
+        )
+        .order_by(collection_recipes.c.added_at.desc(), collection_recipes.c.recipe_id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+async def refresh_collection_stats(session: AsyncSession, collection_ids: Iterable[uuid.UUID]) -> None:
+    """Полностью пересчитывает количество рецептов и обложку для указанных коллекций одним UPDATE."""
+    ids = list(set(collection_ids))
+    if not ids:
+        return
+    count_sq = (
+        select(func.count())
+        .select_from(collection_recipes)
+        .join(Recipe, Recipe.id == collection_recipes.c.recipe_id)
+        .where(collection_recipes.c.collection_id == Collection.id, Recipe.deleted_at.is_(None))
+        .scalar_subquery()
+    )
+    await session.execute(
+        update(Collection)
+        .where(Collection.id.in_(ids))
+        .values(recipe_count=count_sq, cover_image_url=_cover_subquery())
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def adjust_collection_stats(session: AsyncSession, collection_id: uuid.UUID, delta: int) -> None:
+    """Сдвигает счётчик на delta и обновляет обложку, не пересчитывая всю коллекцию."""
+    if not delta:
+        return
+    await session.execute(
+        update(Collection)
+        .where(Collection.id == collection_id)
+        .values(recipe_count=Collection.recipe_count + delta, cover_image_url=_cover_subquery())
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def add_recipes(
+    session: AsyncSession,
+    collection_id: uuid.UUID,
+    owner_id: uuid.UUID,
+    recipe_ids: Sequence[uuid.UUID],
+) -> int:
+    """INSERT ... ON CONFLICT DO NOTHING с проверкой владельца в том же запросе. Возвращает число новых связей."""
+    source = select(Collection.id, Recipe.id).where(
+        Collection.id == collection_id,
+        Collection.owner_id == owner_id,
+        Recipe.id.in_(recipe_ids),
+        Recipe.deleted_at.is_(None),
+    )
+    res = await session.execute(
+        pg_insert(collection_recipes)
+        .from_select(["collection_id", "recipe_id"], source)
+        .on_conflict_do_nothing()
+        .returning(collection_recipes.c.recipe_id)
+    )
+    added = len(res.all())
+    if added:
+        await adjust_collection_stats(session, collection_id, added)
+    return added
+
+
+async def _count_live(session: AsyncSession, recipe_ids: Sequence[uuid.UUID]) -> int:
+    """Сколько из recipe_ids не помечены deleted_at."""
+    if not recipe_ids:
+        return 0
+    res = await session.execute(
+        select(func.count()).select_from(Recipe).where(Recipe.id.in_(recipe_ids), Recipe.deleted_at.is_(None))
+    )
+    return res.scalar() or 0
+
+
+async def remove_recipes(
+    session: AsyncSession,
+    collection_id: uuid.UUID,
+    owner_id: uuid.UUID,
+    recipe_ids: Sequence[uuid.UUID],
+) -> int:
+    """DELETE ... USING collections с проверкой владельца. Возвращает число удалённых связей."""
+    res = await session.execute(
+        delete(collection_recipes).where(
+            collection_recipes.c.collection_id == Collection.id,
+            Collection.id == collection_id,
+            Collection.owner_id == owner_id,
+            collection_recipes.c.recipe_id.in_(recipe_ids),
+        ).returning(collection_recipes.c.recipe_id)
+    )
+    removed_ids = list(res.scalars().all())
+    # recipe_count считает только не удалённые синхронизацией рецепты — как refresh_collection_stats
+    live = await _count_live(session, removed_ids)
+    if live:
+        await adjust_collection_stats(session, collection_id, -live)
+    return len(removed_ids)
+
+
+async def copy_recipes(
+    session: AsyncSession,
+    source_id: uuid.UUID,
+    target_id: uuid.UUID,
+    owner_id: uuid.UUID,
+    recipe_ids: Sequence[uuid.UUID],
+) -> int:
+    """Копирует связи из одной коллекции пользователя в другую одним INSERT ... SELECT."""
+    source_col = aliased(Collection)
+    target_col = aliased(Collection)
+    source = (
+        select(target_col.id, collection_recipes.c.recipe_id)
+        .select_from(collection_recipes)
+        .join(source_col, source_col.id == collection_recipes.c.collection_id)
+        .join(target_col, target_col.id == target_id)
+        .where(
+            source_col.id == source_id,
+            source_col.owner_id == owner_id,
+            target_col.owner_id == owner_id,
+            collection_recipes.c.recipe_id.in_(recipe_ids),
+        )
+    )
+    res = await session.execute(
+        pg_insert(collection_recipes)
+        .from_select(["collection_id", "recipe_id"], source)
+        .on_conflict_do_nothing()
+        .returning(collection_recipes.c.recipe_id)
+    )
+    copied_ids = list(res.scalars().all())
+    live = await _count_live(session, copied_ids)
+    if live:
+        await adjust_collection_stats(session, target_id, live)
+    return len(copied_ids)
+
+
+async def collections_with_recipe(session: AsyncSession, recipe_id: uuid.UUID) -> List[uuid.UUID]:
+    res = await session.execute(
+        select(collection_recipes.c.collection_id)
+        .join(Recipe, Recipe.id == collection_recipes.c.recipe_id)
+        .where(collection_recipes.c.recipe_id == recipe_id, Recipe.deleted_at.is_(None))
+    )
+    return list(res.scalars().all())
+
+
+async def saved_state(
+    session: AsyncSession,
+    owner_id: uuid.UUID,
+    recipe_ids: Sequence[uuid.UUID],
+) -> Membership:
+    """Для каждого рецепта — коллекции пользователя, в которых он лежит."""
+    if membership_cache.enabled:
+        membership = membership_cache.get(owner_id)
+        if membership is None:
+            # Грузим состав всех коллекций пользователя один раз, дальше отвечаем из памяти
+            membership = await _load_membership(session, owner_id, None)
+            membership_cache.put(owner_id, membership)
+    else:
+        membership = await _load_membership(session, owner_id, recipe_ids)
+    return {rid: membership.get(rid, set()) for rid in recipe_ids}
+
+
+async def _load_membership(
+    session: AsyncSession,
+    owner_id: uuid.UUID,
+    recipe_ids: Optional[Sequence[uuid.UUID]],
+) -> Membership:
+    stmt = (
+        select(collection_recipes.c.recipe_id, collection_recipes.c.collection_id)
+        .join(Collection, Collection.id == collection_recipes.c.collection_id)
+        .join(Recipe, Recipe.id == collection_recipes.c.recipe_id)
+        .where(Collection.owner_id == owner_id, Recipe.deleted_at.is_(None))
+    )
+    if recipe_ids is not None:
+        # recipe_id = ANY(:ids) по ix_collection_recipes_recipe_id
+        stmt = stmt.where(collection_recipes.c.recipe_id.in_(recipe_ids))
+    membership: Membership = {}
+    for recipe_id, collection_id in (await session.execute(stmt)).all():
+        membership.setdefault(recipe_id, set()).add(collection_id)
+    return membership
@@ -0,0 +1,228 @@
+"""Расписание рецепта дня на весь год (daily_recipe, day_of_year 1..366) и кэш текущего рецепта дня.
+
+Кандидаты выбираются одним запросом взвешенной выборкой без возвращения (ключ -ln(u)/вес,
+вес растёт с рейтингом и числом приготовлений). Рецепт не повторяется ближе чем через
+DAILY_REPEAT_WINDOW_DAYS дней; для месяцев из DAILY_SEASONAL_TAGS предпочитаются рецепты с этими тегами.
+Пустые слоты (рецепт удалён — FK каскадом удаляет строку) дозаполняются каждую полночь UTC.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session
+from app.models.daily_recipe import DailyRecipe
+from app.models.recipe import Recipe
+from app.schemas.recipe import RecipeRead
+
+logger = logging.getLogger(__name__)
+
+DAYS_IN_YEAR = 366
+
+# Взвешенная выборка без возвращения: берём k строк с наименьшим -ln(u)/w (1 - random() не бывает нулём)
+_CANDIDATES_SQL = text("""
+    SELECT id, tags FROM recipes
+    WHERE deleted_at IS NULL
+    ORDER BY -ln(1.0 - random()) / ((coalesce(rating, 0) + 1) * ln(coalesce(cooked, 0) + 2))
+    LIMIT :limit
+""")
+
+Candidate = Tuple[uuid.UUID, Set[str]]
+
+
+def today_slot() -> int:
+    return datetime.utcnow().timetuple().tm_yday
+
+
+def _month_of(day: int, today: date) -> int:
+    """Месяц, на который придётся слот: расписание идёт от сегодня, слоты раньше today — уже следующего года."""
+    year = today.year if day >= today.timetuple().tm_yday else today.year + 1
+    first = date(year, 1, 1)
+    # Слот 366 в невисокосном году не наступит — считаем его 31 декабря
+    return (first + timedelta(days=min(day - 1, (date(year, 12, 31) - first).days))).month
+
+
+def _distance(a: int, b: int) -> int:
+    """Расстояние между слотами по кругу года."""
+    diff = abs(a - b)
+    return min(diff, DAYS_IN_YEAR - diff)
+
+
+def plan_slots(
+    days: Sequence[int],
+    fixed: Dict[int, uuid.UUID],
+    candidates: Sequence[Candidate],
+    repeat_window: int,
+    seasonal_tags: Dict[int, List[str]],
+    today: Optional[date] = None,
+) -> Dict[int, uuid.UUID]:
+    """Назначает рецепты слотам days, не трогая fixed. candidates — в порядке взвешенной выборки.
+
+    today (по умолчанию — текущая дата UTC) определяет год каждого слота для сезонных тегов.
+    """
+    today = today or datetime.utcnow().date()
+    used: Dict[uuid.UUID, List[int]] = {}
+    for day, recipe_id in fixed.items():
+        used.setdefault(recipe_id, []).append(day)
+    seasonal = {month: {tag.lower() for tag in tags} for month, tags in seasonal_tags.items()}
+
+    def allowed(recipe_id: uuid.UUID, day: int, window: int) -> bool:
+        return all(_distance(day, other) >= window for other in used.get(recipe_id, ()))
+
+    plan: Dict[int, uuid.UUID] = {}
+    for day in days:
+        wanted = seasonal.get(_month_of(day, today))
+        choice: Optional[uuid.UUID] = None
+        # Окно сужаем, только если рецептов слишком мало, чтобы его выдержать
+        window = repeat_window
+        while choice is None and window >= 0:
+            # Приоритет: сезонный новый, сезонный повтор вне окна, любой новый, любой повтор вне окна
+            best: Dict[int, uuid.UUID] = {}
+            for recipe_id, tags in candidates:
+                if not allowed(recipe_id, day, window):
+                    continue
+                rank = (0 if not wanted or tags & wanted else 2) + (1 if recipe_id in used else 0)
+                best.setdefault(rank, recipe_id)
+                if rank == 0:
+                    break
+            if best:
+                choice = best[min(best)]
+            window = window // 2 if window > 1 else window - 1
+        if choice is None:
+            break
+        plan[day] = choice
+        used.setdefault(choice, []).append(day)
+    return plan
+
+
+async def _load_candidates(session: AsyncSession, limit: int) -> List[Candidate]:
+    rows = (await session.execute(_CANDIDATES_SQL, {"limit": limit})).all()
+    return [(recipe_id, {str(tag).lower() for tag in (tags or [])}) for recipe_id, tags in rows]
+
+
+async def fill_daily_slots(session: AsyncSession, rebuild: bool = False) -> int:
+    """Заполняет пустые слоты (rebuild — все, кроме сегодняшнего). Возвращает число записанных слотов."""
+    fixed = dict((await session.execute(select(DailyRecipe.day_of_year, DailyRecipe.recipe_id))).all())
+    today = today_slot()
+    if rebuild:
+        fixed = {today: fixed[today]} if today in fixed else {}
+    # Начинаем с сегодняшнего дня, чтобы ближайшие дни получили лучших кандидатов
+    order = [(today - 1 + offset) % DAYS_IN_YEAR + 1 for offset in range(DAYS_IN_YEAR)]
+    days = [day for day in order if day not in fixed]
+    if not days:
+        return 0
+
+    candidates = await _load_candidates(session, max(settings.DAILY_CANDIDATE_POOL, len(days)))
+    plan = plan_slots(days, fixed, candidates, settings.DAILY_REPEAT_WINDOW_DAYS, settings.DAILY_SEASONAL_TAGS)
+    if not plan:
+        return 0
+
+    stmt = pg_insert(DailyRecipe).values(
+        [{"day_of_year": day, "recipe_id": recipe_id, "created_at": datetime.utcnow()} for day, recipe_id in plan.items()]
+    )
+    if rebuild:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DailyRecipe.day_of_year],
+            set_={"recipe_id": stmt.excluded.recipe_id, "created_at": stmt.excluded.created_at},
+        )
+    else:
+        # Параллельный воркер мог уже заполнить слот — его выбор не перетираем
+        stmt = stmt.on_conflict_do_nothing(index_elements=[DailyRecipe.day_of_year])
+    await session.execute(stmt)
+    await session.commit()
+    return len(plan)
+
+
+class DailyRecipeCache:
+    """Рецепт дня в памяти процесса; TTL ограничивает устаревание после правок в других воркерах."""
+
+    def __init__(self, ttl: float) -> None:
+        self._ttl = ttl
+        self._entry: Optional[Tuple[int, float, RecipeRead]] = None
+
+    def get(self, day: int) -> Optional[RecipeRead]:
+        if self._entry is None:
+            return None
+        cached_day, expires, recipe = self._entry
+        if cached_day != day or expires < time.monotonic():
+            self._entry = None
+            return None
+        return recipe
+
+    def put(self, day: int, recipe: RecipeRead) -> None:
+        self._entry = (day, time.monotonic() + self._ttl, recipe)
+
+    def invalidate(self, recipe_ids: Iterable[uuid.UUID]) -> None:
+        if self._entry is not None and self._entry[2].id in set(recipe_ids):
+            self._entry = None
+
+    def clear(self) -> None:
+        self._entry = None
+
+
+daily_cache = DailyRecipeCache(settings.DAILY_CACHE_TTL_SECONDS)
+
+
+async def load_daily_recipe(session: AsyncSession, day: int) -> Optional[RecipeRead]:
+    """Рецепт дня одним запросом (PK daily_recipe + PK recipes) с записью в кэш."""
+    res = await session.execute(
+        select(Recipe).join(DailyRecipe, DailyRecipe.recipe_id == Recipe.id).where(DailyRecipe.day_of_year == day, Recipe.deleted_at.is_(None))
+    )
+    recipe = res.scalar()
+    if recipe is None:
+        return None
+    data = RecipeRead.model_validate(recipe)
+    daily_cache.put(day, data)
+    return data
+
+
+class DailyScheduler:
+    """Дозаполняет расписание при старте и в каждую полночь UTC, затем прогревает кэш рецепта дня."""
+
+    def __init__(self, enabled: bool) -> None:
+        self._enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None and self._enabled:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self) -> int:
+        async with async_session() as session:
+            filled = await fill_daily_slots(session)
+            daily_cache.clear()
+            await load_daily_recipe(session, today_slot())
+        return filled
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                filled = await self.run_once()
+                if filled:
+                    logger.info("Daily recipe schedule: filled %d slots", filled)
+            except Exception:
+                logger.exception("Daily recipe scheduling failed")
+            now = datetime.utcnow()
+            midnight = datetime(now.year, now.month, now.day) + timedelta(days=1)
+            await asyncio.sleep((midnight - now).total_seconds() + 1)
+
+
+daily_scheduler = DailyScheduler(settings.DAILY_SCHEDULER_ENABLED)
@@ -0,0 +1,375 @@
+"""Дисковый кэш для /image-proxy.
+
+Файлы адресуются sha256(url), лежат в IMAGE_CACHE_DIR/<ab>/<hash> рядом с <hash>.json
+(content-type и валидаторы апстрима). Вытеснение — LRU по суммарному размеру; индекс у каждого
+воркера свой, поэтому IMAGE_CACHE_MAX_BYTES — бюджет одного воркера, а файл может исчезнуть
+(вытеснил другой воркер) — отдаём только через open(), который считает это промахом.
+Устаревшие записи отдаются сразу и перепроверяются в фоне (stale-while-revalidate),
+ошибки апстрима кэшируются на IMAGE_CACHE_NEGATIVE_TTL_SECONDS.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "FeedAndEat/1.0"
+
+# Разрешённые хосты — только те, откуда у нас реально берутся картинки
+ALLOWED_HOSTS = {
+    "img.spoonacular.com",
+    "spoonacular.com",
+    "images.spoonacular.com",
+}
+
+http_client = httpx.AsyncClient(
+    timeout=settings.IMAGE_PROXY_TIMEOUT_SECONDS,
+    follow_redirects=True,
+    limits=httpx.Limits(
+        max_connections=settings.IMAGE_PROXY_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.IMAGE_PROXY_MAX_KEEPALIVE,
+        keepalive_expiry=settings.IMAGE_PROXY_KEEPALIVE_EXPIRY_SECONDS,
+    ),
+)
+
+_host_slots: Dict[str, asyncio.Semaphore] = {}
+
+
+def host_slot(url: str) -> asyncio.Semaphore:
+    """Ограничение одновременных запросов к одному апстрим-хосту."""
+    host = urlparse(url).hostname or ""
+    slot = _host_slots.get(host)
+    if slot is None:
+        slot = _host_slots[host] = asyncio.Semaphore(settings.IMAGE_PROXY_PER_HOST_LIMIT)
+    return slot
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def cache_key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    url: str
+    size: int
+    content_type: str
+    fetched_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class DiskLRUCache:
+    """Файловое хранилище с LRU-индексом в памяти и бюджетом в байтах."""
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._index: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def path_for(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def _meta_path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def load(self) -> None:
+        """Восстанавливает индекс с диска (блокирующий — вызывать через to_thread)."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        for leftover in self.root.glob("*/.*.tmp"):
+            leftover.unlink(missing_ok=True)
+        found = []
+        for meta_path in self.root.glob("*/*.json"):
+            try:
+                entry = CacheEntry(**json.loads(meta_path.read_text()))
+                body = self.path_for(entry.key)
+                found.append((body.stat().st_mtime, entry))
+            except (OSError, ValueError, TypeError):
+                meta_path.unlink(missing_ok=True)
+        self._index.clear()
+        self.total_bytes = 0
+        for _, entry in sorted(found, key=lambda item: item[0]):
+            self._index[entry.key] = entry
+            self.total_bytes += entry.size
+        self.remove_files(self._evict())
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._index.get(key)
+        if entry is not None:
+            self._index.move_to_end(key)
+        return entry
+
+    def _open_body(self, key: str) -> Optional[Tuple[BinaryIO, int]]:
+        try:
+            fh = open(self.path_for(key), "rb")
+        except FileNotFoundError:
+            return None
+        return fh, os.fstat(fh.fileno()).st_size
+
+    async def open(self, entry: CacheEntry) -> Optional[Tuple[BinaryIO, int]]:
+        """Открытый файл записи и его размер; None, если файл уже удалён — тогда запись забываем.
+
+        Открытый дескриптор читается и после unlink, так что последующее вытеснение ответу не мешает.
+        """
+        opened = await asyncio.to_thread(self._open_body, entry.key)
+        if opened is None:
+            self.forget(entry)
+        return opened
+
+    def forget(self, entry: CacheEntry) -> None:
+        """Убирает запись из индекса, если её не успели заменить более свежей."""
+        if self._index.get(entry.key) is entry:
+            del self._index[entry.key]
+            self.total_bytes -= entry.size
+
+    def new_temp_path(self, key: str) -> Path:
+        directory = self.root / key[:2]
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory / f".{key}.{uuid.uuid4().hex}.tmp"
+
+    def publish(self, entry: CacheEntry, temp_path: Optional[Path]) -> None:
+        """Атомарно кладёт тело (если передано) и метаданные на диск (блокирующий — через to_thread)."""
+        if temp_path is not None:
+            os.replace(temp_path, self.path_for(entry.key))
+        meta_tmp = self.new_temp_path(entry.key)
+        meta_tmp.write_text(json.dumps(asdict(entry)))
+        os.replace(meta_tmp, self._meta_path(entry.key))
+
+    def register(self, entry: CacheEntry) -> List[str]:
+        """Добавляет запись в индекс; возвращает ключи, вытесненные по бюджету."""
+        previous = self._index.pop(entry.key, None)
+        if previous is not None:
+            self.total_bytes -= previous.size
+        self._index[entry.key] = entry
+        self.total_bytes += entry.size
+        return self._evict()
+
+    def remove_files(self, keys: List[str]) -> None:
+        for key in keys:
+            if key in self._index:
+                continue  # успели скачать заново
+            self.path_for(key).unlink(missing_ok=True)
+            self._meta_path(key).unlink(missing_ok=True)
+
+    async def add(self, entry: CacheEntry, temp_path: Optional[Path]) -> None:
+        """Публикует запись: файлы — в пуле потоков, индекс — только из event loop."""
+        await asyncio.to_thread(self.publish, entry, temp_path)
+        evicted = self.register(entry)
+        if evicted:
+            await asyncio.to_thread(self.remove_files, evicted)
+
+    def _evict(self) -> List[str]:
+        evicted = []
+        while self.total_bytes > self.max_bytes and self._index:
+            key, entry = self._index.popitem(last=False)
+            self.total_bytes -= entry.size
+            self.evictions += 1
+            evicted.append(key)
+        return evicted
+
+
+class ImageProxyCache:
+    def __init__(self, store: DiskLRUCache, ttl: float, negative_ttl: float, max_body_bytes: int) -> None:
+        self.store = store
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_body_bytes = max_body_bytes
+        self._negative: Dict[str, Tuple[float, int, str]] = {}
+        self._revalidating: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        # Конкурентные промахи по одному URL делят одно скачивание
+        self._flights = SingleFlight()
+        self.counters: Dict[str, int] = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "negative_hits": 0,
+            "revalidations": 0,
+            "not_modified": 0,
+            "upstream_errors": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.store.max_bytes > 0
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.store.load)
+
+    async def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await http_client.aclose()
+
+    def metrics(self) -> Dict[str, float]:
+        c = self.counters
+        served = c["hits"] + c["stale_hits"] + c["misses"]
+        return {
+            **c,
+            "hit_rate": round((c["hits"] + c["stale_hits"]) / served, 4) if served else 0.0,
+            "entries": len(self.store),
+            "bytes": self.store.total_bytes,
+            "max_bytes": self.store.max_bytes,
+            "evictions": self.store.evictions,
+            "coalesced": self._flights.coalesced,
+            "in_flight": len(self._flights),
+        }
+
+    async def get(self, url: str) -> CacheEntry:
+        """Запись из кэша (при необходимости скачивает). Бросает UpstreamError."""
+        key = cache_key(url)
+        entry = self.store.get(key)
+        if entry is not None:
+            if time.time() - entry.fetched_at <= self.ttl:
+                self.counters["hits"] += 1
+            else:
+                self.counters["stale_hits"] += 1
+                self._schedule_revalidation(url, entry)
+            return entry
+
+        negative = self._negative.get(key)
+        if negative is not None:
+            expires, status_code, detail = negative
+            if expires > time.monotonic():
+                self.counters["negative_hits"] += 1
+                raise UpstreamError(status_code, detail)
+            del self._negative[key]
+
+        self.counters["misses"] += 1
+        return await self._flights.do(key, lambda: self._download(url, key, None))
+
+    async def _download(self, url: str, key: str, previous: Optional[CacheEntry]) -> CacheEntry:
+        headers = {"User-Agent": USER_AGENT}
+        if previous is not None:
+            if previous.etag:
+                headers["If-None-Match"] = previous.etag
+            if previous.last_modified:
+                headers["If-Modified-Since"] = previous.last_modified
+
+        async with host_slot(url):
+            return await self._fetch(url, key, previous, headers)
+
+    async def _fetch(
+        self, url: str, key: str, previous: Optional[CacheEntry], headers: Dict[str, str]
+    ) -> CacheEntry:
+        request = http_client.build_request("GET", url, headers=headers)
+        try:
+            resp = await http_client.send(request, stream=True)
+        except httpx.RequestError as exc:
+            raise self._fail(key, 502, f"Upstream request failed: {exc}")
+
+        temp_path: Optional[Path] = None
+        try:
+            if resp.status_code == 304 and previous is not None:
+                self.counters["not_modified"] += 1
+                entry = CacheEntry(**{**asdict(previous), "fetched_at": time.time()})
+                await self.store.add(entry, None)
+                return entry
+            if resp.status_code != 200:
+                raise self._fail(key, resp.status_code, "Upstream returned non-200")
+
+            declared = resp.headers.get("content-length")
+            if declared is not None and declared.isdigit() and int(declared) > self.max_body_bytes:
+                raise self._fail(key, 502, "Upstream image too large")
+
+            # mkdir, open и close — тоже блокирующие, в пул потоков вместе с записью
+            temp_path = await asyncio.to_thread(self.store.new_temp_path, key)
+            fh = await asyncio.to_thread(open, temp_path, "wb")
+            size = 0
+            try:
+                async for chunk in resp.aiter_bytes():
+                    size += len(chunk)
+                    if size > self.max_body_bytes:
+                        raise self._fail(key, 502, "Upstream image too large")
+                    await asyncio.to_thread(fh.write, chunk)
+            finally:
+                await asyncio.to_thread(fh.close)
+
+            entry = CacheEntry(
+                key=key,
+                url=url,
+                size=size,
+                content_type=resp.headers.get("content-type", "image/jpeg"),
+                fetched_at=time.time(),
+                etag=resp.headers.get("etag"),
+                last_modified=resp.headers.get("last-modified"),
+            )
+            await self.store.add(entry, temp_path)
+            temp_path = None
+            return entry
+        finally:
+            await resp.aclose()
+            if temp_path is not None:
+                await asyncio.to_thread(temp_path.unlink, missing_ok=True)
+
+    def _fail(self, key: str, status_code: int, detail: str) -> UpstreamError:
+        self.counters["upstream_errors"] += 1
+        if self.negative_ttl > 0:
+            if len(self._negative) >= 10_000:
+                now = time.monotonic()
+                self._negative = {k: v for k, v in self._negative.items() if v[0] > now}
+            self._negative[key] = (time.monotonic() + self.negative_ttl, status_code, detail)
+        return UpstreamError(status_code, detail)
+
+    def _schedule_revalidation(self, url: str, entry: CacheEntry) -> None:
+        if entry.key in self._revalidating:
+            return
+        self._revalidating.add(entry.key)
+        task = asyncio.create_task(self._revalidate(url, entry))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _revalidate(self, url: str, entry: CacheEntry) -> None:
+        self.counters["revalidations"] += 1
+        try:
+            await self._download(url, entry.key, entry)
+        except UpstreamError as exc:
+            # Продолжаем отдавать устаревшую копию
+            self._negative.pop(entry.key, None)
+            logger.info("Revalidation of %s failed: %s", url, exc.detail)
+        except Exception:
+            logger.exception("Revalidation of %s failed", url)
+        finally:
+            self._revalidating.discard(entry.key)
+
+
+def _cache_dir() -> Path:
+    if settings.IMAGE_CACHE_DIR:
+        return Path(settings.IMAGE_CACHE_DIR)
+    return Path(settings.MEDIA_DIR) / "cache" / "proxy"
+
+
+image_cache = ImageProxyCache(
+    DiskLRUCache(_cache_dir(), settings.IMAGE_CACHE_MAX_BYTES),
+    ttl=settings.IMAGE_CACHE_TTL_SECONDS,
+    negative_ttl=settings.IMAGE_CACHE_NEGATIVE_TTL_SECONDS,
+    max_body_bytes=settings.IMAGE_PROXY_MAX_BYTES,
+)
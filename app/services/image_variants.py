@@ -0,0 +1,170 @@
+"""Уменьшенные копии картинок (ресайз + WebP) для локальных медиа и /image-proxy.
+
+Размеры округляются вверх до ближайшего из IMAGE_VARIANT_SIZES, чтобы число вариантов
+на картинку было ограничено. Кодирование идёт в пуле процессов, готовые варианты лежат
+в отдельном DiskLRUCache и кодируются один раз.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.services.image_cache import CacheEntry, DiskLRUCache
+
+FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg", "png": "image/png"}
+
+
+class ImageTooLarge(ValueError):
+    """Картинка больше Image.MAX_IMAGE_PIXELS (защита Pillow от decompression bomb)."""
+
+
+def variant_source_id(entry: CacheEntry) -> str:
+    """source_id для варианта проксируемой картинки: ключ оригинала + его валидатор.
+
+    После ревалидации с новым телом меняется etag/Last-Modified (или время загрузки, если валидаторов нет),
+    и старые варианты перестают находиться — их вытеснит LRU.
+    """
+    validator = entry.etag or entry.last_modified or f"{entry.size}@{entry.fetched_at}"
+    return f"{entry.key}|{validator}"
+
+
+def render_variant(src: str, dst: str, width: Optional[int], height: Optional[int], fmt: str, quality: int) -> int:
+    """Выполняется в дочернем процессе: читает src, вписывает в width x height без увеличения, пишет dst.
+
+    Возвращает размер dst — stat тоже здесь, а не в event loop.
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(src) as original:
+            image = ImageOps.exif_transpose(original)
+            image.thumbnail((width or image.width, height or image.height), Image.LANCZOS)
+            if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            options = {"quality": quality} if fmt in ("webp", "jpeg") else {"optimize": True}
+            image.save(dst, format=fmt.upper(), **options)
+    except Image.DecompressionBombError as exc:
+        # Исключение Pillow переводим в своё: родителю не нужен PIL, чтобы его распознать
+        raise ImageTooLarge(str(exc)) from None
+    return os.path.getsize(dst)
+
+
+def snap_size(value: Optional[int]) -> Optional[int]:
+    """Округляет вверх до разрешённого размера (больше максимального — максимальный)."""
+    if value is None:
+        return None
+    allowed = sorted(settings.IMAGE_VARIANT_SIZES)
+    for size in allowed:
+        if value <= size:
+            return size
+    return allowed[-1]
+
+
+def resolve_media_path(url_path: str) -> Optional[Path]:
+    """/media/recipes/x.jpg -> файл внутри MEDIA_DIR (кэши и выход за пределы каталога запрещены).
+
+    resolve() и is_file() ходят в файловую систему — из event loop вызывать через to_thread.
+    """
+    prefix = settings.MEDIA_URL.rstrip("/") + "/"
+    if not url_path.startswith(prefix):
+        return None
+    relative = url_path[len(prefix):]
+    if relative.startswith("cache/"):
+        return None
+    root = Path(settings.MEDIA_DIR).resolve()
+    path = (root / relative).resolve()
+    if root not in path.parents or not path.is_file():
+        return None
+    return path
+
+
+class VariantCache:
+    def __init__(self, store: DiskLRUCache, workers: int, quality: int) -> None:
+        self.store = store
+        self.quality = quality
+        self._workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._flights = SingleFlight()
+        self.counters: Dict[str, int] = {"hits": 0, "misses": 0, "encode_errors": 0}
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.store.load)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            **self.counters,
+            "coalesced": self._flights.coalesced,
+            "entries": len(self.store),
+            "bytes": self.store.total_bytes,
+        }
+
+    async def get(
+        self,
+        source_id: str,
+        source_path: Path,
+        width: Optional[int],
+        height: Optional[int],
+        fmt: str,
+    ) -> CacheEntry:
+        """Вариант source_path; source_id — стабильный идентификатор источника (URL или путь в /media)."""
+        key = hashlib.sha256(f"{source_id}|{width or ''}x{height or ''}|{fmt}".encode()).hexdigest()
+        entry = self.store.get(key)
+        if entry is not None:
+            self.counters["hits"] += 1
+            return entry
+        self.counters["misses"] += 1
+        return await self._flights.do(key, lambda: self._encode(key, source_id, source_path, width, height, fmt))
+
+    async def _encode(
+        self,
+        key: str,
+        source_id: str,
+        source_path: Path,
+        width: Optional[int],
+        height: Optional[int],
+        fmt: str,
+    ) -> CacheEntry:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self._workers)
+        temp_path = await asyncio.to_thread(self.store.new_temp_path, key)
+        loop = asyncio.get_running_loop()
+        try:
+            size = await loop.run_in_executor(
+                self._pool, render_variant, str(source_path), str(temp_path), width, height, fmt, self.quality
+            )
+        except Exception as exc:
+            self.counters["encode_errors"] += 1
+            await asyncio.to_thread(temp_path.unlink, missing_ok=True)
+            if isinstance(exc, BrokenProcessPool):
+                # Дочерний процесс умер (OOM, сигнал) — следующий запрос поднимет новый пул
+                self._pool = None
+            raise
+        entry = CacheEntry(
+            key=key,
+            url=source_id,
+            size=size,
+            content_type=FORMATS[fmt],
+            fetched_at=time.time(),
+        )
+        await self.store.add(entry, temp_path)
+        return entry
+
+
+variant_cache = VariantCache(
+    DiskLRUCache(Path(settings.MEDIA_DIR) / "cache" / "variants", settings.IMAGE_VARIANT_MAX_BYTES),
+    workers=settings.IMAGE_RESIZE_WORKERS,
+    quality=settings.IMAGE_VARIANT_QUALITY,
+)
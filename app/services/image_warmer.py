@@ -0,0 +1,129 @@
+"""Прогрев кэша /image-proxy до того, как за картинками придут клиенты.
+
+Берём картинки рецепта дня (сегодня и завтра) и первых IMAGE_WARM_LIST_LIMIT рецептов из /recipes/top
+и /recipes/latest, скачиваем оригиналы в image_cache и готовим варианты IMAGE_WARM_VARIANT_WIDTHS (WebP —
+как /image-proxy?w=... по умолчанию). Уже закэшированное не трогаем, параллельность и объём за проход ограничены.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import urlparse
+
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session
+from app.models.daily_recipe import DailyRecipe
+from app.models.recipe import Recipe
+from app.services.image_cache import ALLOWED_HOSTS, UpstreamError, cache_key, image_cache
+from app.services.image_variants import snap_size, variant_cache, variant_source_id
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_targets(session: AsyncSession, limit: int) -> List[str]:
+    """URL картинок в порядке важности: рецепт дня, top, latest (без повторов и чужих хостов)."""
+    today = datetime.utcnow()
+    days = [today.timetuple().tm_yday, (today + timedelta(days=1)).timetuple().tm_yday]
+    daily = await session.execute(
+        select(Recipe.image_url)
+        .join(DailyRecipe, DailyRecipe.recipe_id == Recipe.id)
+        .where(DailyRecipe.day_of_year.in_(days), Recipe.deleted_at.is_(None))
+    )
+    visible = select(Recipe.image_url).where(Recipe.deleted_at.is_(None))
+    top = await session.execute(visible.order_by(desc(Recipe.rating)).limit(limit))
+    latest = await session.execute(visible.order_by(desc(Recipe.created_at)).limit(limit))
+
+    urls: Dict[str, None] = {}
+    for result in (daily, top, latest):
+        for url in result.scalars():
+            if url and urlparse(url).hostname in ALLOWED_HOSTS:
+                urls.setdefault(url, None)
+    return list(urls)
+
+
+class ImageCacheWarmer:
+    def __init__(self, interval: float, concurrency: int, max_bytes: int, widths: Sequence[int]) -> None:
+        self._interval = interval
+        self._concurrency = concurrency
+        self._max_bytes = max_bytes
+        self._widths = sorted({snap_size(w) for w in widths})
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Dict[str, int] = {}
+
+    def start(self) -> None:
+        if self._task is None and self._interval > 0 and image_cache.enabled:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def warm_once(self) -> Dict[str, int]:
+        async with async_session() as session:
+            urls = await warm_targets(session, settings.IMAGE_WARM_LIST_LIMIT)
+        stats = await self.warm(urls)
+        self.last_run = stats
+        return stats
+
+    async def warm(self, urls: Sequence[str]) -> Dict[str, int]:
+        """Прогревает urls по порядку; когда набранный объём (оригиналы + варианты) превысил бюджет, остальные пропускаются."""
+        stats = {"targets": len(urls), "cached": 0, "fetched": 0, "variants": 0, "failed": 0, "skipped": 0, "bytes": 0}
+        slots = asyncio.Semaphore(self._concurrency)
+
+        async def warm_one(url: str) -> None:
+            async with slots:
+                if stats["bytes"] >= self._max_bytes:
+                    stats["skipped"] += 1
+                    return
+                # Уже лежащее в кэше не считаем в метриках /image-proxy (только обновляем позицию в LRU)
+                entry = image_cache.store.get(cache_key(url))
+                if entry is not None:
+                    stats["cached"] += 1
+                else:
+                    try:
+                        entry = await image_cache.get(url)
+                    except UpstreamError:
+                        stats["failed"] += 1
+                        return
+                    stats["fetched"] += 1
+                stats["bytes"] += entry.size
+                source = image_cache.store.path_for(entry.key)
+                for width in self._widths:
+                    try:
+                        variant = await variant_cache.get(variant_source_id(entry), source, width, None, "webp")
+                    except (OSError, ValueError, BrokenProcessPool):
+                        stats["failed"] += 1
+                        break
+                    stats["variants"] += 1
+                    stats["bytes"] += variant.size
+
+        await asyncio.gather(*(warm_one(url) for url in urls))
+        return stats
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                stats = await self.warm_once()
+                logger.info("Image cache warm-up: %s", stats)
+            except Exception:
+                logger.exception("Image cache warm-up failed")
+            await asyncio.sleep(self._interval)
+
+
+image_warmer = ImageCacheWarmer(
+    settings.IMAGE_WARM_INTERVAL_SECONDS,
+    concurrency=settings.IMAGE_WARM_CONCURRENCY,
+    max_bytes=settings.IMAGE_WARM_MAX_BYTES,
+    widths=settings.IMAGE_WARM_VARIANT_WIDTHS,
+)
@@ -0,0 +1,156 @@
+"""Удаление загруженных файлов, на которые больше нет ссылок в БД.
+
+Каталоги загрузок обходятся пачками по MEDIA_GC_BATCH_SIZE файлов; для каждой пачки одним запросом
+проверяется, какие URL ещё упоминаются в users.avatar_url, recipes.image_url и collections.picture_url.
+Файл удаляется, только если он не менялся дольше MEDIA_GC_GRACE_SECONDS: загрузка успевает
+закоммитить ссылку, а дедупликация в uploads.py обновляет mtime существующего файла.
+cache/ не трогаем — у кэшей свой LRU.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session
+from app.models.collection import Collection
+from app.models.recipe import Recipe
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_SUBDIRS = ("avatars", "recipes", "collections")
+
+FileInfo = Tuple[Path, float, int]  # путь, mtime, размер
+
+
+def _walk(directory: Path) -> Iterator[FileInfo]:
+    """Рекурсивный обход через os.scandir (блокирующий — порциями через to_thread)."""
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = list(os.scandir(current))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(Path(entry.path))
+            elif entry.is_file(follow_symlinks=False):
+                st = entry.stat(follow_symlinks=False)
+                yield Path(entry.path), st.st_mtime, st.st_size
+
+
+def _next_batch(files: Iterator[FileInfo], size: int) -> List[FileInfo]:
+    batch = []
+    for item in files:
+        batch.append(item)
+        if len(batch) >= size:
+            break
+    return batch
+
+
+def _url_for(path: Path, root: Path) -> str:
+    return f"{settings.MEDIA_URL}/{path.relative_to(root).as_posix()}"
+
+
+async def referenced_urls(session: AsyncSession, urls: Sequence[str]) -> Set[str]:
+    """Какие из urls упоминаются в БД (по индексам на столбцах с картинками).
+
+    collections.cover_image_url не проверяем: это копия recipes.image_url, пересчитываемая при удалении рецепта.
+    """
+    stmt = union_all(
+        select(User.avatar_url).where(User.avatar_url.in_(urls)),
+        select(Recipe.image_url).where(Recipe.image_url.in_(urls)),
+        select(Collection.picture_url).where(Collection.picture_url.in_(urls)),
+    )
+    return set((await session.execute(stmt)).scalars().all())
+
+
+def _unlink_if_stale(path: Path, cutoff: float) -> Optional[int]:
+    """Удаляет файл, если его не трогали после cutoff; возвращает освобождённые байты или None."""
+    try:
+        st = path.stat()
+        if st.st_mtime >= cutoff:
+            return None  # файл переиспользовали, пока шла проверка
+        path.unlink()
+    except FileNotFoundError:
+        return None
+    return st.st_size
+
+
+async def collect_garbage(
+    grace_seconds: Optional[float] = None,
+    batch_size: Optional[int] = None,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """Один проход GC по всем каталогам загрузок. Возвращает статистику."""
+    grace = settings.MEDIA_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    size = batch_size or settings.MEDIA_GC_BATCH_SIZE
+    root = Path(settings.MEDIA_DIR)
+    cutoff = time.time() - grace
+    stats = {"scanned": 0, "orphans": 0, "deleted": 0, "bytes_freed": 0}
+
+    for subdir in UPLOAD_SUBDIRS:
+        files = _walk(root / subdir)
+        while True:
+            batch = await asyncio.to_thread(_next_batch, files, size)
+            if not batch:
+                break
+            stats["scanned"] += len(batch)
+            # Свежие файлы (в т.ч. недописанные .upload-*.tmp) пропускаем сразу
+            candidates = {_url_for(path, root): path for path, mtime, _ in batch if mtime < cutoff}
+            if not candidates:
+                continue
+            async with async_session() as session:
+                alive = await referenced_urls(session, list(candidates))
+            orphans = [path for url, path in candidates.items() if url not in alive]
+            stats["orphans"] += len(orphans)
+            if dry_run or not orphans:
+                continue
+            for path in orphans:
+                freed = await asyncio.to_thread(_unlink_if_stale, path, cutoff)
+                if freed is not None:
+                    stats["deleted"] += 1
+                    stats["bytes_freed"] += freed
+    return stats
+
+
+class MediaGarbageCollector:
+    """Периодический запуск collect_garbage в фоне приложения."""
+
+    def __init__(self, interval: float) -> None:
+        self._interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None and self._interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                stats = await collect_garbage()
+                logger.info("Media GC: %s", stats)
+            except Exception:
+                logger.exception("Media GC failed")
+
+
+media_gc = MediaGarbageCollector(settings.MEDIA_GC_INTERVAL_SECONDS)
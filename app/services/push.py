@@ -0,0 +1,258 @@
+"""Рассылка push-уведомлений по всем device_tokens.
+
+Токены читаются keyset-сканом по id пачками PUSH_SCAN_BATCH, группируются по platform и режутся
+на куски по max_batch провайдера. Куски отправляют PUSH_CONCURRENCY воркеров; временные ошибки
+повторяются с экспоненциальной задержкой и jitter, невалидные токены удаляются пачками.
+Провайдер подключается через PUSH_PROVIDER: "fake" или путь "package.module:Class".
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import random
+import time
+import uuid
+import zlib
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Protocol, Sequence, Tuple
+
+from sqlalchemy import delete, select
+
+from app.core.config import settings
+from app.core.database import async_session
+from app.models.device_token import DeviceToken
+
+logger = logging.getLogger(__name__)
+
+TokenRow = Tuple[uuid.UUID, str, str]  # id, token, platform
+
+
+@dataclass
+class PushMessage:
+    title: str
+    body: str
+    data: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class SendResult:
+    """Итог отправки куска: невалидные токены удаляем, временно неудачные — повторяем."""
+    invalid: List[str] = field(default_factory=list)
+    retry: List[str] = field(default_factory=list)
+
+
+class PushProviderError(Exception):
+    """Временная ошибка провайдера для всего куска (сеть, 5xx, квота) — кусок повторяется целиком."""
+
+
+class PushProvider(Protocol):
+    max_batch: int
+
+    async def send(self, platform: str, tokens: Sequence[str], message: PushMessage) -> SendResult:
+        ...
+
+
+class TokenSource(Protocol):
+    def scan(self, batch_size: int) -> AsyncIterator[List[TokenRow]]:
+        ...
+
+    async def delete(self, tokens: Sequence[str]) -> None:
+        ...
+
+
+class FakePushProvider:
+    """Локальный провайдер без сети: задержка на запрос и детерминированные по токену отказы."""
+
+    def __init__(
+        self,
+        max_batch: int = 500,
+        latency: float = 0.0,
+        invalid_rate: float = 0.0,
+        transient_rate: float = 0.0,
+    ) -> None:
+        self.max_batch = max_batch
+        self.latency = latency
+        self.invalid_rate = invalid_rate
+        self.transient_rate = transient_rate
+        self.requests = 0
+        self.delivered = 0
+        self._attempts: Dict[str, int] = {}
+
+    async def send(self, platform: str, tokens: Sequence[str], message: PushMessage) -> SendResult:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        result = SendResult()
+        for token in tokens:
+            bucket = (zlib.crc32(token.encode()) % 10_000) / 10_000
+            if bucket < self.invalid_rate:
+                result.invalid.append(token)
+            elif bucket < self.invalid_rate + self.transient_rate and token not in self._attempts:
+                # Первая попытка падает, повтор проходит
+                self._attempts[token] = 1
+                result.retry.append(token)
+            else:
+                self.delivered += 1
+        return result
+
+
+class DbTokenSource:
+    """device_tokens: keyset-скан по первичному ключу, каждая пачка — отдельная короткая сессия."""
+
+    async def scan(self, batch_size: int) -> AsyncIterator[List[TokenRow]]:
+        last_id: Optional[uuid.UUID] = None
+        while True:
+            stmt = select(DeviceToken.id, DeviceToken.token, DeviceToken.platform).order_by(DeviceToken.id)
+            if last_id is not None:
+                stmt = stmt.where(DeviceToken.id > last_id)
+            async with async_session() as session:
+                rows = [tuple(row) for row in (await session.execute(stmt.limit(batch_size))).all()]
+            if not rows:
+                return
+            yield rows
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][0]
+
+    async def delete(self, tokens: Sequence[str]) -> None:
+        async with async_session() as session:
+            await session.execute(delete(DeviceToken).where(DeviceToken.token.in_(tokens)))
+            await session.commit()
+
+
+class InMemoryTokenSource:
+    """Токены в списке (бенчмарки, тесты провайдеров)."""
+
+    def __init__(self, rows: List[TokenRow]) -> None:
+        self.rows = rows
+        self.deleted: List[str] = []
+
+    async def scan(self, batch_size: int) -> AsyncIterator[List[TokenRow]]:
+        for start in range(0, len(self.rows), batch_size):
+            yield self.rows[start:start + batch_size]
+            await asyncio.sleep(0)
+
+    async def delete(self, tokens: Sequence[str]) -> None:
+        self.deleted.extend(tokens)
+
+
+class PushFanout:
+    def __init__(
+        self,
+        provider: PushProvider,
+        source: TokenSource,
+        concurrency: Optional[int] = None,
+        scan_batch: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        delete_batch: int = 1000,
+    ) -> None:
+        self.provider = provider
+        self.source = source
+        self.concurrency = concurrency or settings.PUSH_CONCURRENCY
+        self.scan_batch = scan_batch or settings.PUSH_SCAN_BATCH
+        self.max_retries = settings.PUSH_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = settings.PUSH_BACKOFF_BASE_SECONDS if backoff_base is None else backoff_base
+        self.backoff_max = settings.PUSH_BACKOFF_MAX_SECONDS if backoff_max is None else backoff_max
+        self.delete_batch = delete_batch
+
+    async def send(self, message: PushMessage) -> Dict[str, float]:
+        """Рассылает message на все токены источника. Возвращает статистику прогона."""
+        stats = {"scanned": 0, "sent": 0, "invalid": 0, "failed": 0, "retries": 0, "requests": 0}
+        # Ограниченная очередь: сканер не убегает вперёд отправки
+        queue: "asyncio.Queue[Optional[Tuple[str, List[str]]]]" = asyncio.Queue(maxsize=self.concurrency * 2)
+        invalid: List[str] = []
+        delete_lock = asyncio.Lock()
+        started = time.perf_counter()
+
+        async def flush_invalid(force: bool = False) -> None:
+            async with delete_lock:
+                while invalid and (force or len(invalid) >= self.delete_batch):
+                    chunk = invalid[:self.delete_batch]
+                    del invalid[:self.delete_batch]
+                    await self.source.delete(chunk)
+
+        async def worker() -> None:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                platform, tokens = item
+                try:
+                    await self._deliver(platform, tokens, message, stats, invalid)
+                    if len(invalid) >= self.delete_batch:
+                        await flush_invalid()
+                except Exception:
+                    # Умерший воркер не разбирает очередь: когда умрут все, сканер навсегда повиснет на put
+                    logger.exception("Push worker failed on %d %s tokens", len(tokens), platform)
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            async for rows in self.source.scan(self.scan_batch):
+                stats["scanned"] += len(rows)
+                by_platform: Dict[str, List[str]] = {}
+                for _, token, platform in rows:
+                    by_platform.setdefault(platform, []).append(token)
+                for platform, tokens in by_platform.items():
+                    for start in range(0, len(tokens), self.provider.max_batch):
+                        await queue.put((platform, tokens[start:start + self.provider.max_batch]))
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+        await flush_invalid(force=True)
+
+        elapsed = time.perf_counter() - started
+        stats["elapsed_seconds"] = round(elapsed, 3)
+        stats["tokens_per_second"] = round(stats["scanned"] / elapsed) if elapsed else 0
+        return stats
+
+    async def _deliver(
+        self,
+        platform: str,
+        tokens: List[str],
+        message: PushMessage,
+        stats: Dict[str, float],
+        invalid: List[str],
+    ) -> None:
+        pending = tokens
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                stats["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt))
+            stats["requests"] += 1
+            try:
+                result = await self.provider.send(platform, pending, message)
+            except PushProviderError as exc:
+                logger.info("Push to %d %s tokens failed (attempt %d): %s", len(pending), platform, attempt + 1, exc)
+                continue
+            except Exception:
+                # Ошибка в коде провайдера: кусок теряем, но воркер продолжает разбирать очередь
+                logger.exception("Push provider crashed on %d %s tokens", len(pending), platform)
+                break
+            invalid.extend(result.invalid)
+            stats["invalid"] += len(result.invalid)
+            stats["sent"] += len(pending) - len(result.invalid) - len(result.retry)
+            pending = result.retry
+            if not pending:
+                return
+        stats["failed"] += len(pending)
+
+    def _backoff(self, attempt: int) -> float:
+        """Экспоненциальная задержка с jitter, чтобы повторы воркеров не били в провайдера одновременно."""
+        ceiling = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        return random.uniform(ceiling / 2, ceiling)
+
+
+def create_provider(name: Optional[str] = None) -> PushProvider:
+    name = name or settings.PUSH_PROVIDER
+    if name == "fake":
+        return FakePushProvider()
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"PUSH_PROVIDER must be 'fake' or 'module:Class', got {name!r}")
+    return getattr(importlib.import_module(module_name), class_name)()
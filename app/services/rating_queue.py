@@ -0,0 +1,118 @@
+"""Фоновый пересчёт рейтингов рецептов с дедупликацией.
+
+Эндпоинты отзывов только ставят recipe_id в очередь; воркер пересчитывает все накопившиеся
+рецепты одним UPDATE не чаще одного раза за окно RATING_RECALC_WINDOW_SECONDS.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+
+from app.core.config import settings
+from app.core.database import async_session
+
+logger = logging.getLogger(__name__)
+
+# Рейтинг = средняя оценка по гистограмме recipe_rating_buckets; рецепты без отзывов получают 0
+_RECALC_SQL = text("""
+    UPDATE recipes SET rating = s.rating
+    FROM (
+        SELECT ids.id,
+               coalesce(round((sum(b.mark * b.count) / nullif(sum(b.count), 0))::numeric, 2), 0) AS rating
+        FROM unnest(:recipe_ids) AS ids(id)
+        LEFT JOIN recipe_rating_buckets b ON b.recipe_id = ids.id
+        GROUP BY ids.id
+    ) AS s
+    WHERE recipes.id = s.id
+""").bindparams(bindparam("recipe_ids", type_=ARRAY(PG_UUID(as_uuid=True))))
+
+
+async def recalc_ratings(recipe_ids: Iterable[uuid.UUID]) -> None:
+    """Синхронно пересчитывает рейтинг для набора рецептов одним запросом."""
+    ids = list(recipe_ids)
+    if not ids:
+        return
+    async with async_session() as session:
+        await session.execute(_RECALC_SQL, {"recipe_ids": ids})
+        await session.commit()
+
+
+class RatingRecalcQueue:
+    def __init__(self, window: float, batch_size: int = 1000) -> None:
+        self._window = window
+        self._batch_size = batch_size
+        self._pending: Set[uuid.UUID] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def schedule(self, recipe_id: uuid.UUID) -> None:
+        """Ставит рецепт в очередь; повторные постановки до пересчёта схлопываются."""
+        self._pending.add(recipe_id)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._stopping = asyncio.Event()
+            if self._pending:
+                self._wakeup.set()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает воркер и дописывает всё, что осталось в очереди."""
+        if self._task is not None:
+            # Без cancel(): отмена посреди flush() потеряла бы уже взятую из очереди пачку
+            self._stopping.set()
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._wakeup = None
+            self._stopping = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        while self._pending:
+            ids = self._take_batch()
+            try:
+                await recalc_ratings(ids)
+            except asyncio.CancelledError:
+                # Отменили снаружи (например, при остановке цикла) — пачка остаётся в очереди
+                self._pending.update(ids)
+                raise
+            except Exception:
+                logger.exception("Rating recalculation failed for %d recipes", len(ids))
+                # Вернём в очередь и разбудим воркер: повтор — после паузы в окно, без ожидания новых отзывов
+                self._pending.update(ids)
+                if self._wakeup is not None:
+                    self._wakeup.set()
+                return
+
+    def _take_batch(self) -> List[uuid.UUID]:
+        batch = []
+        while self._pending and len(batch) < self._batch_size:
+            batch.append(self._pending.pop())
+        return batch
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None and self._stopping is not None
+        while not self._stopping.is_set():
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self._stopping.is_set():
+                break
+            await self.flush()
+            # Всё, что придёт за окно, будет пересчитано одним следующим проходом; stop() прерывает паузу
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self._window)
+            except asyncio.TimeoutError:
+                pass
+
+
+rating_queue = RatingRecalcQueue(settings.RATING_RECALC_WINDOW_SECONDS)
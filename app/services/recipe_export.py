@@ -0,0 +1,45 @@
+"""Потоковая выгрузка рецептов в NDJSON (GET /recipes/export и utils/export_recipes.py).
+
+Один запрос без ORDER BY и OFFSET читается серверным курсором (stream + yield_per),
+строки сериализуются через RecipeRead и отдаются кусками по RECIPE_EXPORT_CHUNK_ROWS —
+память не зависит от размера каталога.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import async_session
+from app.models.recipe import Recipe
+from app.schemas.recipe import RecipeRead
+from app.services.recipe_tags import tag_filter
+
+EXPORT_COLUMNS = [Recipe.__table__.c[name] for name in (
+    "id", "user_id", "name", "image_url", "instructions", "servings",
+    "ingredients", "tags", "nutrients", "rating", "cooked", "created_at",
+)]
+
+
+async def iter_recipes_ndjson(
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    tags: Optional[List[str]] = None,
+    chunk_rows: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """Куски NDJSON по chunk_rows рецептов; сессия своя и живёт, пока читается выгрузка."""
+    chunk_rows = chunk_rows or settings.RECIPE_EXPORT_CHUNK_ROWS
+    async with async_session() as session:
+        stmt = select(*EXPORT_COLUMNS).where(Recipe.deleted_at.is_(None))
+        if created_after is not None:
+            stmt = stmt.where(Recipe.created_at >= created_after)
+        if created_before is not None:
+            stmt = stmt.where(Recipe.created_at < created_before)
+        if tags:
+            stmt = stmt.where(await tag_filter(session, tags))
+
+        result = await session.stream(stmt.execution_options(yield_per=chunk_rows))
+        async for rows in result.mappings().partitions():
+            yield b"".join(RecipeRead.model_validate(dict(row)).model_dump_json().encode() + b"\n" for row in rows)
@@ -0,0 +1,88 @@
+"""Связи рецепт—тег в recipe_tags по целочисленным tags.num_id."""
+from __future__ import annotations
+
+import uuid
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import bindparam, delete, exists, func, literal, or_, select, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.recipe import Recipe
+from app.models.tag import Tag, recipe_tags
+
+
+def _relink_sql(filter_ids: bool):
+    """INSERT связей по recipes.tags; join по lower(name) идёт по ix_tags_name_lower.
+
+    filter_ids — только рецепты из :ids, иначе все.
+    """
+    only_ids = "r.id = ANY(:ids) AND " if filter_ids else ""
+    stmt = text(f"""
+        INSERT INTO recipe_tags (recipe_id, tag_id)
+        SELECT DISTINCT r.id, t.num_id
+        FROM recipes r
+        CROSS JOIN LATERAL jsonb_array_elements_text(r.tags) AS x(name)
+        JOIN tags t ON lower(t.name) = lower(x.name)
+        WHERE {only_ids}jsonb_typeof(r.tags) = 'array'
+        ON CONFLICT DO NOTHING
+    """)
+    if filter_ids:
+        stmt = stmt.bindparams(bindparam("ids", type_=ARRAY(PG_UUID(as_uuid=True))))
+    return stmt
+
+
+RELINK_ALL_SQL = _relink_sql(filter_ids=False)
+RELINK_SOME_SQL = _relink_sql(filter_ids=True)
+
+
+def _normalize(names: Optional[Iterable[str]]) -> List[str]:
+    return sorted({name.strip().lower() for name in names or () if name and name.strip()})
+
+
+async def sync_recipe_tags(session: AsyncSession, recipe_id: uuid.UUID, names: Optional[Iterable[str]]) -> None:
+    """Приводит связи рецепта к списку names (без коммита)."""
+    lowered = _normalize(names)
+    await session.execute(delete(recipe_tags).where(recipe_tags.c.recipe_id == recipe_id))
+    if not lowered:
+        return
+    source = select(literal(recipe_id, PG_UUID(as_uuid=True)), Tag.num_id).where(func.lower(Tag.name).in_(lowered))
+    await session.execute(
+        pg_insert(recipe_tags).from_select(["recipe_id", "tag_id"], source).on_conflict_do_nothing()
+    )
+
+
+async def relink_all(session: AsyncSession) -> None:
+    """Досоздаёт связи для всех рецептов (после импорта рецептов или тегов)."""
+    await session.execute(RELINK_ALL_SQL)
+
+
+async def relink_recipes(session: AsyncSession, recipe_ids: Sequence[uuid.UUID]) -> None:
+    """Пересобирает связи для набора рецептов двумя запросами (без коммита)."""
+    if not recipe_ids:
+        return
+    ids = list(recipe_ids)
+    await session.execute(delete(recipe_tags).where(recipe_tags.c.recipe_id.in_(ids)))
+    await session.execute(RELINK_SOME_SQL, {"ids": ids})
+
+
+async def resolve_tag_ids(session: AsyncSession, names: Sequence[str]) -> Dict[str, int]:
+    """lower(name) -> num_id для известных тегов."""
+    lowered = _normalize(names)
+    if not lowered:
+        return {}
+    res = await session.execute(
+        select(func.lower(Tag.name), Tag.num_id).where(func.lower(Tag.name).in_(lowered))
+    )
+    return dict(res.all())
+
+
+async def tag_filter(session: AsyncSession, names: Sequence[str]):
+    """Условие "у рецепта есть любой из тегов": известные — через recipe_tags, остальные — по JSONB."""
+    tag_ids = await resolve_tag_ids(session, names)
+    filters = [Recipe.tags.contains([name]) for name in names if name.strip().lower() not in tag_ids]
+    if tag_ids:
+        filters.append(
+            exists().where(recipe_tags.c.recipe_id == Recipe.id, recipe_tags.c.tag_id.in_(list(tag_ids.values())))
+        )
+    return or_(*filters)
@@ -0,0 +1,34 @@
+"""Гистограмма оценок рецепта (recipe_rating_buckets), поддерживаемая при записи отзывов."""
+from __future__ import annotations
+
+import uuid
+from typing import Dict
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.review import RecipeRatingBucket
+
+# Все допустимые оценки: 0.5, 1.0, ..., 5.0
+MARKS = [i / 2 for i in range(1, 11)]
+
+
+async def bump_rating_bucket(session: AsyncSession, recipe_id: uuid.UUID, mark: float, delta: int) -> None:
+    stmt = pg_insert(RecipeRatingBucket).values(recipe_id=recipe_id, mark=mark, count=max(delta, 0))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[RecipeRatingBucket.recipe_id, RecipeRatingBucket.mark],
+        set_={"count": RecipeRatingBucket.count + delta},
+    )
+    await session.execute(stmt)
+
+
+async def rating_histogram(session: AsyncSession, recipe_id: uuid.UUID) -> Dict[float, int]:
+    """Количество отзывов на каждую оценку (по PK, не больше 10 строк)."""
+    res = await session.execute(
+        select(RecipeRatingBucket.mark, RecipeRatingBucket.count).where(RecipeRatingBucket.recipe_id == recipe_id)
+    )
+    histogram = {mark: 0 for mark in MARKS}
+    for mark, count in res.all():
+        histogram[mark] = count
+    return histogram
@@ -0,0 +1,308 @@
+"""Дельта-синхронизация для офлайн-клиентов (GET /sync).
+
+Каждая сущность читается keyset-курсором по (updated_at, ключ) — индексы ix_*_updated_*, для своих
+сущностей с владельцем первой колонкой; удаления — по sync_tombstones (owner_id, deleted_at, id). updated_at и надгробия пишут триггеры БД.
+Отдаём только строки старше верхней границы: now() - SYNC_SETTLE_SECONDS, но не позже начала самой
+старой пишущей транзакции этой базы — её строки получат updated_at не раньше этого момента и иначе
+при коммите оказались бы позади курсора. Если такую транзакцию не видно в pg_stat_activity
+(роли нужен pg_read_all_stats), /sync отвечает 503, а не отдаёт данные без границы.
+Просроченные надгробия удаляет TombstonePurger (или python -m utils.purge_tombstones).
+Токен — base64url от JSON с курсором каждой сущности; [ts] без ключа значит "всё с updated_at >= ts".
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select, text, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.core.database import async_session
+from app.models.collection import Collection, collection_recipes
+from app.models.recipe import Recipe
+from app.models.review import Review
+from app.models.sync_tombstone import SyncTombstone
+from app.models.tag import Tag
+from app.schemas.collection import CollectionBrief
+from app.schemas.recipe import RecipeRead
+from app.schemas.review import ReviewRead
+from app.schemas.sync import CollectionRecipeLink, SyncDeleted, SyncResponse
+from app.schemas.tag import TagBrief
+
+logger = logging.getLogger(__name__)
+
+TOKEN_VERSION = 1
+FEEDS = ("recipes", "tags", "collections", "collection_recipes", "reviews", "tombstones")
+# Типы ключа курсора после updated_at/deleted_at
+KEY_TYPES = {
+    "recipes": (uuid.UUID,),
+    "tags": (uuid.UUID,),
+    "collections": (uuid.UUID,),
+    "collection_recipes": (uuid.UUID, uuid.UUID),
+    "reviews": (uuid.UUID,),
+    "tombstones": (int,),
+}
+
+Cursor = Optional[List[Any]]
+
+
+# Верхняя граница по транзакциям, которые уже что-то записали (у них есть xid), — из снимка pg_current_snapshot().
+# Транзакция без xid ещё ничего не писала: её будущие строки получат updated_at позже нашего now().
+# Для xid из этой базы берём xact_start (это не позже любого её updated_at), другие базы пропускаем.
+# xid без видимой сессии (у роли нет pg_read_all_stats, чужая роль) и всё ещё открытый — unknown:
+# границу не посчитать, отдавать по ней нельзя.
+UPPER_BOUND_SQL = text("""
+    WITH running AS (
+        SELECT x AS xid8, a.datname, a.backend_type, a.xact_start
+        FROM pg_snapshot_xip(pg_current_snapshot()) AS x
+        -- xid8 с эпохой -> 32-битный xid сессии
+        LEFT JOIN pg_stat_activity a ON a.backend_xid::text::bigint = x::text::bigint % 4294967296
+    )
+    SELECT timezone('utc', now()) AS now,
+           least(
+               timezone('utc', now()) - make_interval(secs => :settle),
+               (SELECT timezone('utc', min(xact_start)) FROM running
+                WHERE datname = current_database() AND backend_type = 'client backend')
+           ) AS upper,
+           (SELECT count(*) FROM running
+            WHERE xact_start IS NULL AND pg_xact_status(xid8) = 'in progress') AS unknown
+""")
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+class SyncBoundUnavailable(RuntimeError):
+    """Есть открытая пишущая транзакция, время начала которой не видно — безопасной границы нет."""
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value.isoformat()
+
+
+def _decode_cursor(feed: str, cursor: Any) -> Cursor:
+    """[ts] или [ts, *ключ] -> наивный UTC datetime и ключ в типах колонок; иначе InvalidSyncToken."""
+    if cursor is None:
+        return None
+    if not isinstance(cursor, list) or not cursor or not isinstance(cursor[0], str):
+        raise InvalidSyncToken("Invalid sync cursor")
+    ts, *key = cursor
+    ts = datetime.fromisoformat(ts)
+    if ts.tzinfo is not None:
+        # Колонки — timestamp without time zone в UTC; aware-значение asyncpg в них не примет
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    if not key:
+        return [ts]
+    types = KEY_TYPES[feed]
+    if len(key) != len(types):
+        raise InvalidSyncToken("Invalid sync cursor")
+    values = []
+    for kind, value in zip(types, key):
+        if kind is int:
+            # bool — подкласс int, но ключом быть не может
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise InvalidSyncToken("Invalid sync cursor")
+            values.append(value)
+        else:
+            if not isinstance(value, str):
+                raise InvalidSyncToken("Invalid sync cursor")
+            values.append(uuid.UUID(value))
+    return [ts, *values]
+
+
+def encode_token(cursors: Dict[str, Cursor]) -> str:
+    raw = json.dumps(
+        {"v": TOKEN_VERSION, "c": cursors}, separators=(",", ":"), default=_json_default
+    ).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_token(token: str) -> Dict[str, Cursor]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if payload.get("v") != TOKEN_VERSION or set(payload["c"]) != set(FEEDS):
+            raise InvalidSyncToken("Unsupported sync token")
+        return {feed: _decode_cursor(feed, cursor) for feed, cursor in payload["c"].items()}
+    except (ValueError, TypeError, KeyError, AttributeError, IndexError) as exc:
+        raise InvalidSyncToken("Invalid sync token") from exc
+
+
+def _keyset(stmt, ts_col, key_cols, cursor: Cursor, upper: datetime, limit: int):
+    stmt = stmt.where(ts_col < upper)
+    if cursor is not None:
+        ts, *key = cursor
+        if key:
+            stmt = stmt.where(tuple_(ts_col, *key_cols) > tuple_(ts, *key))
+        else:
+            stmt = stmt.where(ts_col >= ts)
+    return stmt.order_by(ts_col, *key_cols).limit(limit + 1)
+
+
+def _tombstones(user_id: uuid.UUID, cursor: Cursor, upper: datetime, limit: int):
+    """Общие и свои надгробия: OR по owner_id ломает порядок индекса, поэтому два keyset-прохода и слияние."""
+    parts = [
+        _keyset(select(SyncTombstone).where(owner), SyncTombstone.deleted_at, [SyncTombstone.id], cursor, upper, limit)
+        for owner in (SyncTombstone.owner_id.is_(None), SyncTombstone.owner_id == user_id)
+    ]
+    tombstone = aliased(SyncTombstone, union_all(*parts).subquery())
+    return select(tombstone).order_by(tombstone.deleted_at, tombstone.id).limit(limit + 1)
+
+
+def _advance(rows: List[Any], limit: int, upper: datetime, last_key) -> Tuple[List[Any], Cursor, bool]:
+    """Обрезает лишнюю строку; курсор — на последнюю отданную либо на upper, если всё прочитано."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, last_key(rows[-1]), True
+    return rows, [upper], False
+
+
+async def collect_changes(session: AsyncSession, user_id: uuid.UUID, since: Optional[str]) -> SyncResponse:
+    limit = settings.SYNC_PAGE_SIZE
+    now, upper, unknown = (await session.execute(UPPER_BOUND_SQL, {"settle": settings.SYNC_SETTLE_SECONDS})).one()
+    if unknown:
+        raise SyncBoundUnavailable(f"{unknown} running transactions are not visible in pg_stat_activity")
+
+    full_resync = False
+    cursors: Optional[Dict[str, Cursor]] = None
+    if since:
+        try:
+            cursors = decode_token(since)
+        except InvalidSyncToken:
+            full_resync = True
+        else:
+            # Надгробия старше срока хранения уже могли удалить — дельта была бы неполной
+            horizon = now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+            if cursors["tombstones"] is None or cursors["tombstones"][0] < horizon:
+                full_resync, cursors = True, None
+    if cursors is None:
+        # Полная выгрузка: все строки с начала, удаления — только те, что случатся после неё
+        cursors = {feed: None for feed in FEEDS}
+        cursors["tombstones"] = [upper]
+
+    response = SyncResponse(token="", full_resync_required=full_resync)
+    deleted = SyncDeleted()
+    next_cursors: Dict[str, Cursor] = {}
+    has_more = False
+
+    # Рецепты: общий каталог; мягко удалённые (deleted_at) уходят в deleted
+    stmt = _keyset(select(Recipe), Recipe.updated_at, [Recipe.id], cursors["recipes"], upper, limit)
+    rows, next_cursors["recipes"], more = _advance(
+        (await session.execute(stmt)).scalars().all(), limit, upper, lambda r: [r.updated_at, str(r.id)]
+    )
+    has_more |= more
+    for recipe in rows:
+        if recipe.deleted_at is None:
+            response.recipes.append(RecipeRead.model_validate(recipe))
+        else:
+            deleted.recipes.append(recipe.id)
+
+    stmt = _keyset(select(Tag), Tag.updated_at, [Tag.id], cursors["tags"], upper, limit)
+    rows, next_cursors["tags"], more = _advance(
+        (await session.execute(stmt)).scalars().all(), limit, upper, lambda t: [t.updated_at, str(t.id)]
+    )
+    has_more |= more
+    response.tags = [TagBrief.model_validate(tag) for tag in rows]
+
+    stmt = _keyset(
+        select(Collection).where(Collection.owner_id == user_id),
+        Collection.updated_at, [Collection.id], cursors["collections"], upper, limit,
+    )
+    rows, next_cursors["collections"], more = _advance(
+        (await session.execute(stmt)).scalars().all(), limit, upper, lambda c: [c.updated_at, str(c.id)]
+    )
+    has_more |= more
+    response.collections = [CollectionBrief.model_validate(collection) for collection in rows]
+
+    cr = collection_recipes.c
+    stmt = _keyset(
+        select(cr.collection_id, cr.recipe_id, cr.added_at, cr.updated_at).where(cr.owner_id == user_id),
+        cr.updated_at, [cr.collection_id, cr.recipe_id], cursors["collection_recipes"], upper, limit,
+    )
+    rows, next_cursors["collection_recipes"], more = _advance(
+        (await session.execute(stmt)).all(), limit, upper,
+        lambda row: [row.updated_at, str(row.collection_id), str(row.recipe_id)],
+    )
+    has_more |= more
+    response.collection_recipes = [
+        CollectionRecipeLink(collection_id=row.collection_id, recipe_id=row.recipe_id, added_at=row.added_at)
+        for row in rows
+    ]
+
+    stmt = _keyset(
+        select(Review).where(Review.user_id == user_id),
+        Review.updated_at, [Review.id], cursors["reviews"], upper, limit,
+    )
+    rows, next_cursors["reviews"], more = _advance(
+        (await session.execute(stmt)).scalars().all(), limit, upper, lambda r: [r.updated_at, str(r.id)]
+    )
+    has_more |= more
+    response.reviews = [ReviewRead.model_validate(review) for review in rows]
+
+    stmt = _tombstones(user_id, cursors["tombstones"], upper, limit)
+    rows, next_cursors["tombstones"], more = _advance(
+        (await session.execute(stmt)).scalars().all(), limit, upper, lambda t: [t.deleted_at, t.id]
+    )
+    has_more |= more
+    for tombstone in rows:
+        if tombstone.entity == "collection_recipes":
+            collection_id, _, recipe_id = tombstone.entity_id.partition(":")
+            deleted.collection_recipes.append(CollectionRecipeLink(collection_id=collection_id, recipe_id=recipe_id))
+        elif tombstone.entity in FEEDS:
+            getattr(deleted, tombstone.entity).append(uuid.UUID(tombstone.entity_id))
+
+    response.deleted = deleted
+    response.has_more = has_more
+    response.token = encode_token(next_cursors)
+    return response
+
+
+async def purge_tombstones(session: AsyncSession) -> int:
+    """Удаляет надгробия старше SYNC_TOMBSTONE_RETENTION_DAYS; токены старше этого получат full_resync_required."""
+    horizon = datetime.utcnow() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    res = await session.execute(delete(SyncTombstone).where(SyncTombstone.deleted_at < horizon))
+    await session.commit()
+    return res.rowcount or 0
+
+
+class TombstonePurger:
+    """Периодический запуск purge_tombstones в фоне приложения."""
+
+    def __init__(self, interval: float) -> None:
+        self._interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None and self._interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with async_session() as session:
+                    purged = await purge_tombstones(session)
+                if purged:
+                    logger.info("Sync tombstones: purged %d", purged)
+            except Exception:
+                logger.exception("Sync tombstone purge failed")
+            await asyncio.sleep(self._interval)
+
+
+tombstone_purger = TombstonePurger(settings.SYNC_TOMBSTONE_PURGE_INTERVAL_SECONDS)
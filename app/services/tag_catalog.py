@@ -0,0 +1,90 @@
+"""Каталог тегов для /tags: снимок в памяти с числом рецептов на тег.
+
+Счётчики считаются одним агрегатом по recipe_tags (хватает индекса ix_recipe_tags_tag_recipe).
+Снимок помечается устаревшим при записи рецептов (не чаще раза в TAG_CATALOG_MIN_REFRESH_SECONDS)
+и в любом случае перестраивается раз в TAG_CATALOG_TTL_SECONDS.
+Готовые JSON-ответы кэшируются вместе со снимком; ETag зависит только от содержимого, поэтому совпадает между воркерами.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.schemas.tag import TagRead
+
+SORTS = ("name", "popularity")
+
+_CATALOG_SQL = text("""
+    SELECT t.id, t.name, t.created_at, coalesce(c.recipe_count, 0) AS recipe_count
+    FROM tags t
+    LEFT JOIN (
+        SELECT tag_id, count(*) AS recipe_count FROM recipe_tags GROUP BY tag_id
+    ) c ON c.tag_id = t.num_id
+    ORDER BY t.name
+""")
+
+
+class TagCatalogSnapshot:
+    def __init__(self, tags: List[TagRead]) -> None:
+        self.tags = tags
+        self.built_at = time.monotonic()
+        payload = json.dumps([tag.model_dump(mode="json") for tag in tags], ensure_ascii=False)
+        self.version = hashlib.sha1(payload.encode()).hexdigest()[:16]
+        self._rendered: Dict[Tuple[int, str], bytes] = {}
+
+    def etag(self, min_count: int, sort: str) -> str:
+        return f'"{self.version}-{min_count}-{sort}"'
+
+    def render(self, min_count: int, sort: str) -> bytes:
+        key = (min_count, sort)
+        body = self._rendered.get(key)
+        if body is None:
+            tags = [tag for tag in self.tags if tag.recipe_count >= min_count]
+            if sort == "popularity":
+                tags = sorted(tags, key=lambda tag: (-tag.recipe_count, tag.name))
+            body = json.dumps([tag.model_dump(mode="json") for tag in tags], ensure_ascii=False).encode()
+            if len(self._rendered) < 64:
+                self._rendered[key] = body
+        return body
+
+
+class TagCatalog:
+    def __init__(self, ttl: float, min_refresh: float) -> None:
+        self._ttl = ttl
+        self._min_refresh = min_refresh
+        self._snapshot: Optional[TagCatalogSnapshot] = None
+        self._dirty = False
+        self._lock = asyncio.Lock()
+
+    def mark_dirty(self) -> None:
+        self._dirty = True
+
+    def _fresh(self) -> bool:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return False
+        age = time.monotonic() - snapshot.built_at
+        if age >= self._ttl:
+            return False
+        return not (self._dirty and age >= self._min_refresh)
+
+    async def get(self, session: AsyncSession) -> TagCatalogSnapshot:
+        if self._fresh():
+            return self._snapshot
+        async with self._lock:
+            # Пока ждали блокировку, снимок мог перестроить другой запрос
+            if not self._fresh():
+                self._dirty = False
+                rows = (await session.execute(_CATALOG_SQL)).mappings().all()
+                self._snapshot = TagCatalogSnapshot([TagRead.model_validate(dict(row)) for row in rows])
+        return self._snapshot
+
+
+tag_catalog = TagCatalog(settings.TAG_CATALOG_TTL_SECONDS, settings.TAG_CATALOG_MIN_REFRESH_SECONDS)
@@ -0,0 +1,82 @@
+"""Общий конвейер загрузки картинок в MEDIA_DIR.
+
+Файл читается кусками и пишется во временный файл в пуле потоков, лимит размера
+проверяется по мере чтения, тип определяется по сигнатуре (content_type клиента не используется).
+В конце — атомарный rename в целевой каталог.
+
+Имя файла — sha256 содержимого: <subdir>/<ab>/<hash>.<ext>. Одинаковые загрузки хранятся один раз,
+файлы никогда не перезаписываются; неиспользуемые удаляет app/services/media_gc.py.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+
+from app.core.config import settings
+
+CHUNK_SIZE = 64 * 1024
+
+
+def sniff_image_ext(head: bytes) -> Optional[str]:
+    """Расширение по magic bytes: PNG, JPEG, WebP."""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+async def save_image_upload(file: UploadFile, subdir: str, max_bytes: Optional[int] = None) -> str:
+    """Сохраняет загруженную картинку в MEDIA_DIR/<subdir>, возвращает её URL."""
+    limit = settings.UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    target_dir = Path(settings.MEDIA_DIR) / subdir
+    await asyncio.to_thread(target_dir.mkdir, parents=True, exist_ok=True)
+    temp_path = target_dir / f".upload-{uuid.uuid4().hex}.tmp"
+
+    fh = await asyncio.to_thread(open, temp_path, "wb")
+    try:
+        size = 0
+        ext: Optional[str] = None
+        digest = hashlib.sha256()
+        while True:
+            chunk = await file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            if ext is None:
+                ext = sniff_image_ext(chunk)
+                if ext is None:
+                    raise HTTPException(status_code=400, detail="Unsupported file type")
+            size += len(chunk)
+            if size > limit:
+                raise HTTPException(status_code=400, detail="File too large")
+            digest.update(chunk)
+            await asyncio.to_thread(fh.write, chunk)
+        if ext is None:
+            raise HTTPException(status_code=400, detail="Empty file")
+        await asyncio.to_thread(fh.close)
+
+        name = digest.hexdigest()
+        relative = f"{subdir}/{name[:2]}/{name}{ext}"
+        await asyncio.to_thread(_publish, temp_path, Path(settings.MEDIA_DIR) / relative)
+        return f"{settings.MEDIA_URL}/{relative}"
+    finally:
+        if not fh.closed:
+            await asyncio.to_thread(fh.close)
+        await asyncio.to_thread(temp_path.unlink, missing_ok=True)
+
+
+def _publish(temp_path: Path, target: Path) -> None:
+    target.parent.mkdir(exist_ok=True)
+    if target.exists():
+        # Такой файл уже есть: свежий mtime защищает его от GC до коммита новой ссылки
+        os.utime(target)
+        return
+    os.replace(temp_path, target)
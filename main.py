@@ -3,14 +3,28 @@ from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
 from app.api import auth
 from app.core.database import engine, Base
 from app.core.config import settings
+from app.core.media import MediaFiles
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.rate_limit import RateLimitMiddleware
+from app.services.daily_scheduler import daily_scheduler
+from app.services.image_cache import image_cache
+from app.services.image_variants import variant_cache
+from app.services.image_warmer import image_warmer
+from app.services.media_gc import media_gc
+from app.services.rating_queue import rating_queue
+from app.services.sync import tombstone_purger
 
 app = FastAPI(title="FeedAndEat API")
 
+# Ограничение частоты запросов для /auth и /image-proxy (лимиты в Settings.RATE_LIMITS).
+# Добавляется до CORS, чтобы CORS был внешним и ответы 429 тоже получали CORS-заголовки
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 # CORS — разрешаем мобильному клиенту делать запросы
 origins = ["*"]  # при необходимости заменить на конкретный список
 app.add_middleware(
@@ -19,6 +33,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "Retry-After"],
 )
 
 # Подключаем все модули
@@ -37,11 +52,13 @@ from app.api import reviews as reviews_router
 app.include_router(reviews_router.router, prefix="/recipes", tags=["reviews"])
 from app.api import image_proxy as image_proxy_router
 app.include_router(image_proxy_router.router, tags=["image-proxy"])
+from app.api import sync as sync_router
+app.include_router(sync_router.router, prefix="/sync", tags=["sync"])
 
-# Статика для загруженных медиа (аватары и др.)
+# Загруженные медиа (аватары и др.): immutable-кэширование, Range, горячие файлы в памяти
 media_path = Path(settings.MEDIA_DIR)
 media_path.mkdir(parents=True, exist_ok=True)
-app.mount(settings.MEDIA_URL, StaticFiles(directory=str(media_path)), name="media")
+app.mount(settings.MEDIA_URL, MediaFiles(directory=str(media_path)), name="media")
 
 # Media dirs only (создание таблиц теперь исключительно через Alembic)
 @app.on_event("startup")
@@ -49,6 +66,25 @@ async def on_startup():
     (media_path / "avatars").mkdir(parents=True, exist_ok=True)
     (media_path / "recipes").mkdir(parents=True, exist_ok=True)
     (media_path / "collections").mkdir(parents=True, exist_ok=True)
+    rating_queue.start()
+    await image_cache.start()
+    await variant_cache.start()
+    media_gc.start()
+    image_warmer.start()
+    daily_scheduler.start()
+    tombstone_purger.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Дописываем отложенные пересчёты рейтинга
+    await rating_queue.stop()
+    await media_gc.stop()
+    await image_warmer.stop()
+    await daily_scheduler.stop()
+    await tombstone_purger.stop()
+    await image_cache.close()
+    variant_cache.close()
 
 
 @app.get("/")
@@ -0,0 +1,9 @@
+# Все модели — чтобы мапперы с relationship("User") и т.п. собирались без импорта main
+import app.models.user  # noqa
+import app.models.recipe  # noqa
+import app.models.collection  # noqa
+import app.models.tag  # noqa
+import app.models.daily_recipe  # noqa
+import app.models.device_token  # noqa
+import app.models.review  # noqa
+import app.models.sync_tombstone  # noqa
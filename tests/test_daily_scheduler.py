@@ -0,0 +1,91 @@
+import uuid
+from datetime import date
+
+from app.services.daily_scheduler import DAYS_IN_YEAR, _distance, _month_of, plan_slots
+
+TODAY = date(2025, 1, 1)  # невисокосный: слот 60 — 1 марта
+
+
+def candidates(count, tags=()):
+    return [(uuid.uuid4(), set(tags)) for _ in range(count)]
+
+
+def repeats_within(plan, window):
+    days_by_recipe = {}
+    for day, recipe_id in plan.items():
+        days_by_recipe.setdefault(recipe_id, []).append(day)
+    return [
+        (a, b)
+        for days in days_by_recipe.values()
+        for i, a in enumerate(days)
+        for b in days[i + 1:]
+        if _distance(a, b) < window
+    ]
+
+
+def test_distance_wraps_around_year():
+    assert _distance(1, DAYS_IN_YEAR) == 1
+    assert _distance(10, 20) == 10
+
+
+def test_enough_candidates_fill_every_slot_without_repeats():
+    days = list(range(1, 31))
+    pool = candidates(40)
+    plan = plan_slots(days, {}, pool, repeat_window=30, seasonal_tags={}, today=TODAY)
+    assert sorted(plan) == days
+    assert len(set(plan.values())) == 30
+    # Порядок кандидатов — порядок взвешенной выборки: первый день получает первого
+    assert plan[1] == pool[0][0]
+
+
+def test_repeat_window_respected_when_pool_allows():
+    days = list(range(1, 101))
+    plan = plan_slots(days, {}, candidates(10), repeat_window=10, seasonal_tags={}, today=TODAY)
+    assert len(plan) == 100
+    assert repeats_within(plan, 10) == []
+
+
+def test_window_narrows_when_pool_too_small():
+    days = list(range(1, 11))
+    plan = plan_slots(days, {}, candidates(3), repeat_window=30, seasonal_tags={}, today=TODAY)
+    assert len(plan) == 10
+    assert repeats_within(plan, 3) == []
+
+
+def test_fixed_slots_count_towards_window():
+    fixed_id = uuid.uuid4()
+    pool = [(fixed_id, set())] + candidates(5)
+    plan = plan_slots([2, 3, 4], {1: fixed_id}, pool, repeat_window=5, seasonal_tags={}, today=TODAY)
+    assert 1 not in plan
+    assert fixed_id not in plan.values()
+
+
+def test_no_candidates_gives_empty_plan():
+    assert plan_slots([1, 2], {}, [], repeat_window=5, seasonal_tags={}, today=TODAY) == {}
+
+
+def test_seasonal_tag_preferred_in_its_month_only():
+    plain = candidates(5)
+    festive = candidates(2, tags={"новый год"})
+    pool = plain + festive
+    seasonal = {12: ["Новый год"]}
+    plan = plan_slots([360, 100], {}, pool, repeat_window=1, seasonal_tags=seasonal, today=TODAY)
+    assert plan[360] == festive[0][0]
+    assert plan[100] == plain[0][0]
+
+
+def test_seasonal_switches_on_real_month_boundary():
+    march_only = candidates(1, tags={"весна"})
+    pool = candidates(3) + march_only
+    seasonal = {3: ["весна"]}
+    # 2025 не високосный: слот 59 — 28 февраля, 60 — 1 марта
+    plan = plan_slots([59, 60], {}, pool, repeat_window=0, seasonal_tags=seasonal, today=TODAY)
+    assert plan[59] != march_only[0][0]
+    assert plan[60] == march_only[0][0]
+
+
+def test_month_of_uses_year_of_slot():
+    assert _month_of(60, date(2025, 1, 1)) == 3
+    # Слоты раньше сегодняшнего — уже следующего (2028, високосного) года: 60 — 29 февраля
+    assert _month_of(60, date(2027, 6, 1)) == 2
+    assert _month_of(366, date(2025, 1, 1)) == 12
@@ -0,0 +1,105 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.media import MediaFiles, _parse_range
+
+BODY = bytes(range(256)) * 40  # 10240 байт
+
+
+@pytest.fixture(params=["hot", "disk"])
+def client(request, tmp_path):
+    (tmp_path / "recipes").mkdir()
+    (tmp_path / "recipes" / "a.jpg").write_bytes(BODY)
+    (tmp_path / "cache").mkdir()
+    (tmp_path / "cache" / "b.jpg").write_bytes(b"x")
+    # hot — тело в памяти, disk — стрим с диска кусками
+    hot_bytes = 1 << 20 if request.param == "hot" else 0
+    app = FastAPI()
+    app.mount("/media", MediaFiles(str(tmp_path), max_age=60, hot_cache_bytes=hot_bytes, hot_file_max_bytes=hot_bytes))
+    return TestClient(app)
+
+
+def test_full_response_headers(client):
+    response = client.get("/media/recipes/a.jpg")
+    assert response.status_code == 200
+    assert response.content == BODY
+    assert response.headers["content-length"] == str(len(BODY))
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["cache-control"] == "public, max-age=60, immutable"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["etag"] and response.headers["last-modified"]
+
+
+def test_head_has_no_body(client):
+    response = client.head("/media/recipes/a.jpg")
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["content-length"] == str(len(BODY))
+
+
+def test_if_none_match_gives_304(client):
+    etag = client.get("/media/recipes/a.jpg").headers["etag"]
+    for value in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get("/media/recipes/a.jpg", headers={"If-None-Match": value})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+    assert client.get("/media/recipes/a.jpg", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_if_modified_since(client):
+    last_modified = client.get("/media/recipes/a.jpg").headers["last-modified"]
+    assert client.get("/media/recipes/a.jpg", headers={"If-Modified-Since": last_modified}).status_code == 304
+    old = "Mon, 01 Jan 2001 00:00:00 GMT"
+    assert client.get("/media/recipes/a.jpg", headers={"If-Modified-Since": old}).status_code == 200
+    assert client.get("/media/recipes/a.jpg", headers={"If-Modified-Since": "garbage"}).status_code == 200
+
+
+@pytest.mark.parametrize(
+    "header, start, end",
+    [("bytes=0-99", 0, 99), ("bytes=100-", 100, 10239), ("bytes=-100", 10140, 10239), ("bytes=10000-99999", 10000, 10239)],
+)
+def test_range_gives_206(client, header, start, end):
+    response = client.get("/media/recipes/a.jpg", headers={"Range": header})
+    assert response.status_code == 206
+    assert response.content == BODY[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(BODY)}"
+    assert response.headers["content-length"] == str(end - start + 1)
+
+
+@pytest.mark.parametrize("header", ["bytes=20000-", "bytes=-0", "bytes=50-10", "items=0-1"])
+def test_unsatisfiable_range_gives_416(client, header):
+    response = client.get("/media/recipes/a.jpg", headers={"Range": header})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(BODY)}"
+
+
+def test_multiple_ranges_fall_back_to_full_body(client):
+    response = client.get("/media/recipes/a.jpg", headers={"Range": "bytes=0-1,5-6"})
+    assert response.status_code == 200
+    assert response.content == BODY
+
+
+def test_if_range_mismatch_ignores_range(client):
+    response = client.get("/media/recipes/a.jpg", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    response = client.get("/media/recipes/a.jpg", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert response.status_code == 206
+
+
+@pytest.mark.parametrize("path", ["/media/recipes/missing.jpg", "/media/cache/b.jpg", "/media/recipes", "/media/"])
+def test_not_found(client, path):
+    assert client.get(path).status_code == 404
+
+
+def test_write_methods_rejected(client):
+    response = client.post("/media/recipes/a.jpg")
+    assert response.status_code == 405
+    assert response.headers["allow"] == "GET, HEAD"
+
+
+def test_parse_range_clamps_suffix_longer_than_file():
+    assert _parse_range("bytes=-500", 100) == (0, 99)
+    assert _parse_range("bytes=-", 100) is None
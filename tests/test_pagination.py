@@ -0,0 +1,44 @@
+import base64
+import uuid
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.pagination import decode_cursor, encode_cursor
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def test_cursor_roundtrip_keeps_microseconds():
+    ts = datetime(2026, 10, 19, 12, 30, 45, 123456)
+    item_id = uuid.uuid4()
+    cursor = encode_cursor(ts, item_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (ts, item_id)
+
+
+def test_cursor_without_microseconds():
+    ts = datetime(2026, 1, 1)
+    item_id = uuid.uuid4()
+    assert decode_cursor(encode_cursor(ts, item_id)) == (ts, item_id)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "",
+        "not base64 !!",
+        _b64(b"garbage"),
+        _b64(b"2026-01-01T00:00:00"),  # без id
+        _b64(b"2026-01-01T00:00:00|not-a-uuid"),
+        _b64(f"yesterday|{uuid.uuid4()}".encode()),
+        _b64(b"\xff\xfe\xfd"),  # не UTF-8
+    ],
+)
+def test_tampered_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
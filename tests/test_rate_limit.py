@@ -0,0 +1,108 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import rate_limit
+from app.core.rate_limit import InMemoryBackend, RateLimitMiddleware, parse_limit
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+def acquire(backend, key, capacity, period):
+    # InMemoryBackend.acquire не ждёт ничего — выполняем корутину без event loop
+    coro = backend.acquire(key, capacity, period)
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise AssertionError("acquire suspended")
+
+
+def test_parse_limit():
+    assert parse_limit("10/60") == (10, 60.0)
+    assert parse_limit("5") == (5, 1.0)
+    for bad in ("0/60", "5/0", "x/60"):
+        with pytest.raises(ValueError):
+            parse_limit(bad)
+
+
+def test_bucket_allows_capacity_then_reports_wait(clock):
+    backend = InMemoryBackend()
+    assert [acquire(backend, "k", 3, 60) for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Токен копится 60 / 3 = 20 секунд
+    assert acquire(backend, "k", 3, 60) == pytest.approx(20.0)
+
+
+def test_bucket_refills_with_time_up_to_capacity(clock):
+    backend = InMemoryBackend()
+    for _ in range(2):
+        acquire(backend, "k", 2, 10)
+    clock.now += 5  # ровно один токен
+    assert acquire(backend, "k", 2, 10) == 0.0
+    assert acquire(backend, "k", 2, 10) == pytest.approx(5.0)
+    clock.now += 1000  # простой не даёт больше capacity
+    assert [acquire(backend, "k", 2, 10) for _ in range(3)][2] > 0
+
+
+def test_keys_are_independent(clock):
+    backend = InMemoryBackend()
+    acquire(backend, "a", 1, 60)
+    assert acquire(backend, "a", 1, 60) > 0
+    assert acquire(backend, "b", 1, 60) == 0.0
+
+
+def test_overflow_evicts_least_recently_used(clock):
+    backend = InMemoryBackend(max_keys=3)
+    for key in ("a", "b", "c"):
+        acquire(backend, key, 1, 60)
+    clock.now += 1
+    acquire(backend, "a", 1, 60)
+    acquire(backend, "d", 1, 60)
+    assert len(backend) == 3
+    # "b" — самый давний, его корзина сброшена и снова полна
+    assert acquire(backend, "b", 1, 60) == 0.0
+    assert acquire(backend, "a", 1, 60) > 0
+
+
+def test_sweep_drops_only_refilled_buckets(clock):
+    backend = InMemoryBackend(sweep_seconds=60)
+    acquire(backend, "short", 1, 10)
+    acquire(backend, "long", 1, 600)
+    clock.now += 61
+    acquire(backend, "other", 1, 10)  # запускает плановую чистку
+    assert len(backend) == 2
+    assert acquire(backend, "long", 1, 600) > 0
+
+
+def test_middleware_returns_429_with_retry_after():
+    app = FastAPI()
+
+    @app.get("/limited")
+    async def limited():
+        return {"ok": True}
+
+    @app.get("/free")
+    async def free():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, limits={"/limited/": "2/60"}, backend=InMemoryBackend())
+    client = TestClient(app)
+    assert [client.get("/limited").status_code for _ in range(2)] == [200, 200]
+    response = client.get("/limited")
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Too many requests"}
+    assert int(response.headers["retry-after"]) == 30
+    assert all(client.get("/free").status_code == 200 for _ in range(5))
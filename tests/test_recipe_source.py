@@ -0,0 +1,114 @@
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+
+from utils.recipe_source import RECIPE_COLUMNS, _parse_amount, iter_records, normalize_record, prepare_batch, source_key
+
+RECORDS = [
+    {"id": 1, "name": "Борщ", "instructions": [{"paragraph": "Варить", "timers": []}]},
+    {"id": 2, "name": "Строка с ] и } внутри, и \"кавычками\""},
+    {"id": 3, "name": "Щи", "tags": ["суп", "горячее"], "nested": {"a": [1, 2, {"b": None}]}},
+]
+
+
+def write(tmp_path, text):
+    path = tmp_path / "dump.json"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_json_array(tmp_path, chunk_size):
+    # Маленький chunk_size заставляет дочитывать запись, разрезанную между кусками
+    path = write(tmp_path, json.dumps(RECORDS, ensure_ascii=False, indent=2))
+    assert list(iter_records(path, chunk_size=chunk_size)) == RECORDS
+
+
+@pytest.mark.parametrize("chunk_size", [1, 64])
+def test_json_array_with_leading_whitespace(tmp_path, chunk_size):
+    path = write(tmp_path, "\n\n  " + json.dumps(RECORDS, ensure_ascii=False))
+    assert list(iter_records(path, chunk_size=chunk_size)) == RECORDS
+
+
+def test_empty_array(tmp_path):
+    assert list(iter_records(write(tmp_path, " [ ] "))) == []
+
+
+def test_ndjson_skips_blank_lines(tmp_path):
+    text = "\n".join(json.dumps(rec, ensure_ascii=False) for rec in RECORDS)
+    path = write(tmp_path, "\n" + text.replace("\n", "\n\n") + "\n\n")
+    assert list(iter_records(path, chunk_size=16)) == RECORDS
+
+
+def test_truncated_array_raises(tmp_path):
+    text = json.dumps(RECORDS, ensure_ascii=False)[:-30]
+    with pytest.raises(ValueError):
+        list(iter_records(write(tmp_path, text), chunk_size=8))
+
+
+def test_unterminated_array_raises(tmp_path):
+    text = json.dumps(RECORDS, ensure_ascii=False)[:-1]
+    with pytest.raises(ValueError):
+        list(iter_records(write(tmp_path, text)))
+
+
+def test_broken_ndjson_line_raises_after_good_records(tmp_path):
+    path = write(tmp_path, json.dumps(RECORDS[0]) + "\n{broken\n")
+    records = iter_records(path)
+    assert next(records) == RECORDS[0]
+    with pytest.raises(ValueError):
+        next(records)
+
+
+def test_source_key_prefers_dump_id():
+    assert source_key({"id": 5, "name": "x"}) == "id:5"
+    assert source_key({"source_id": "abc"}) == "id:abc"
+    by_name = source_key({"name": "x", "image": "y"})
+    assert by_name.startswith("name:")
+    assert by_name == source_key({"name": "x", "image_url": "y"})
+    assert by_name != source_key({"name": "x", "image": "z"})
+
+
+def test_empty_or_blank_file_has_no_records(tmp_path):
+    assert list(iter_records(write(tmp_path, ""))) == []
+    assert list(iter_records(write(tmp_path, "\n  \n"), chunk_size=1)) == []
+
+
+@pytest.mark.parametrize(
+    "raw, parsed",
+    [("1,5", 1.5), ("1/2", 0.5), ("1 1/2", 1.5), (" 2 ", 2.0), (3, 3), (None, None),
+     ("по вкусу", "по вкусу"), ("1/0", "1/0"), ("1e400", "1e400")],
+)
+def test_parse_amount(raw, parsed):
+    assert _parse_amount(raw) == parsed
+
+
+def test_normalize_record_gives_stable_timer_ids():
+    def record():
+        return {"name": "x", "instructions": [{"paragraph": "p", "timers": [{"type": "t", "lowerLimit": 1}]}]}
+
+    first, second = normalize_record(record()), normalize_record(record())
+    timer = first["instructions"][0]["timers"][0]
+    assert timer["id"] == second["instructions"][0]["timers"][0]["id"]
+    assert timer["lower_limit"] == 1
+
+
+def test_prepare_batch_rejects_bad_records_and_keeps_the_rest():
+    good = {"name": "Суп", "instructions": [], "ingredients": [{"name": " соль ", "amount": "1/2", "unit": None}]}
+    records = [
+        (0, good),
+        (1, ["not", "an", "object"]),
+        (2, {"instructions": []}),  # без name
+        (3, {"name": "Огромный", "instructions": [], "ingredients": [{"name": "a", "amount": "1e400", "unit": "g"}]}),
+    ]
+    rows, rejects = prepare_batch(records, uuid.uuid4(), datetime(2026, 1, 1))
+    assert len(rows) + len(rejects) == len(records)
+    assert {reject["index"] for reject in rejects} >= {1, 2}
+    assert all(len(row) == len(RECIPE_COLUMNS) for row in rows)
+    soup = dict(zip(RECIPE_COLUMNS, rows[0]))
+    assert soup["name"] == "Суп"
+    assert json.loads(soup["ingredients"])[0]["name"] == "соль"
+    rejected = {reject["index"]: reject for reject in rejects}
+    assert rejected[1]["error"].startswith("TypeError")
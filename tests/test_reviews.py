@@ -0,0 +1,147 @@
+import asyncio
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from app.api import reviews as api
+from app.models.review import Review
+from app.schemas.review import ReviewCreate
+from app.services.reviews import MARKS, bump_rating_bucket, rating_histogram
+
+
+class Result:
+    def __init__(self, value=None, rows=()):
+        self.value = value
+        self.rows = list(rows)
+
+    def scalar(self):
+        return self.value
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    """Отвечает на execute() по очереди заранее заданными результатами и запоминает запросы."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+        self.deleted = []
+
+    async def execute(self, stmt, params=None):
+        self.statements.append(stmt)
+        return self.results.pop(0) if self.results else Result()
+
+    def add(self, obj):
+        pass
+
+    async def delete(self, obj):
+        self.deleted.append(obj)
+
+    async def commit(self):
+        pass
+
+    async def refresh(self, obj):
+        pass
+
+
+@pytest.fixture
+def buckets(monkeypatch):
+    """Гистограмма в памяти вместо recipe_rating_buckets."""
+    histogram = Counter()
+
+    async def bump(session, recipe_id, mark, delta):
+        histogram[mark] += delta
+
+    monkeypatch.setattr(api, "bump_rating_bucket", bump)
+    monkeypatch.setattr(api.rating_queue, "schedule", lambda recipe_id: None)
+    return histogram
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_create_update_delete_keep_histogram_consistent(buckets):
+    recipe_id = uuid.uuid4()
+    user = SimpleNamespace(id=uuid.uuid4())
+
+    review = run(api.add_review(recipe_id, ReviewCreate(mark=4.2), user, FakeSession(Result(object()), Result(None))))
+    assert review.mark == 4.0
+    assert buckets == {4.0: 1}
+
+    session = FakeSession(Result(review))
+    run(api.update_my_review(recipe_id, ReviewCreate(mark=2.5), user, session))
+    assert buckets == {4.0: 0, 2.5: 1}
+    # Старую оценку читаем под FOR UPDATE, иначе параллельные PUT уменьшат корзину дважды
+    assert session.statements[0]._for_update_arg is not None
+
+    run(api.update_my_review(recipe_id, ReviewCreate(mark=2.5), user, FakeSession(Result(review))))
+    assert buckets == {4.0: 0, 2.5: 1}
+
+    session = FakeSession(Result(review))
+    run(api.delete_my_review(recipe_id, user, session))
+    assert session.deleted == [review]
+    assert session.statements[0]._for_update_arg is not None
+    assert +buckets == Counter()
+
+
+def test_second_review_and_missing_review_do_not_touch_histogram(buckets):
+    recipe_id = uuid.uuid4()
+    user = SimpleNamespace(id=uuid.uuid4())
+    existing = Review(recipe_id=recipe_id, user_id=user.id, mark=3.0)
+
+    with pytest.raises(HTTPException) as exc:
+        run(api.add_review(recipe_id, ReviewCreate(mark=5), user, FakeSession(Result(object()), Result(existing))))
+    assert exc.value.status_code == 409
+    with pytest.raises(HTTPException) as exc:
+        run(api.add_review(recipe_id, ReviewCreate(mark=5), user, FakeSession(Result(None))))
+    assert exc.value.status_code == 404
+    # Повторный DELETE после чужого коммита строку уже не найдёт
+    with pytest.raises(HTTPException) as exc:
+        run(api.delete_my_review(recipe_id, user, FakeSession(Result(None))))
+    assert exc.value.status_code == 404
+    with pytest.raises(HTTPException):
+        run(api.update_my_review(recipe_id, ReviewCreate(mark=1), user, FakeSession(Result(None))))
+    assert +buckets == Counter()
+
+
+def test_bump_is_an_upsert_by_delta():
+    session = FakeSession()
+    run(bump_rating_bucket(session, uuid.uuid4(), 4.5, -1))
+    stmt = session.statements[0]
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (recipe_id, mark) DO UPDATE" in sql
+    assert "recipe_rating_buckets.count +" in sql
+    # Вставка новой корзины с отрицательной дельтой не даёт отрицательный count
+    assert stmt.compile(dialect=postgresql.dialect()).params["count"] == 0
+
+
+def test_histogram_fills_missing_marks_with_zero():
+    session = FakeSession(Result(rows=[(4.5, 3), (1.0, 1)]))
+    histogram = run(rating_histogram(session, uuid.uuid4()))
+    assert list(histogram) == MARKS
+    assert histogram[4.5] == 3 and histogram[1.0] == 1
+    assert sum(histogram.values()) == 4
+
+
+def test_summary_rating_from_histogram(monkeypatch):
+    recipe_id = uuid.uuid4()
+
+    async def histogram(session, rid):
+        return {mark: 0 for mark in MARKS} | {5.0: 2, 4.0: 1}
+
+    async def page(session, rid, limit, cursor):
+        return [], None
+
+    monkeypatch.setattr(api, "rating_histogram", histogram)
+    monkeypatch.setattr(api, "_reviews_page", page)
+    summary = run(api.get_reviews_summary(recipe_id, 20, FakeSession()))
+    assert summary.total == 3
+    assert summary.rating == 4.67
+    assert summary.histogram["5.0"] == 2 and summary.histogram["0.5"] == 0
@@ -0,0 +1,73 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services.sync import FEEDS, InvalidSyncToken, _tombstones, decode_token, encode_token
+
+TS = datetime(2026, 10, 19, 12, 0, 0, 123456)
+
+
+def raw_token(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def cursors(**overrides):
+    return {**{feed: None for feed in FEEDS}, **overrides}
+
+
+def test_token_roundtrip_converts_keys():
+    a, b = uuid.uuid4(), uuid.uuid4()
+    original = cursors(
+        recipes=[TS, str(a)],
+        tags=[TS],
+        collection_recipes=[TS, a, b],
+        tombstones=[TS, 42],
+    )
+    decoded = decode_token(encode_token(original))
+    assert decoded == cursors(recipes=[TS, a], tags=[TS], collection_recipes=[TS, a, b], tombstones=[TS, 42])
+    assert "=" not in encode_token(original)
+
+
+def test_aware_timestamp_becomes_naive_utc():
+    token = raw_token({"v": 1, "c": cursors(tags=["2026-10-19T15:00:00+03:00"])})
+    assert decode_token(token)["tags"] == [datetime(2026, 10, 19, 12, 0)]
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        "",
+        "%%%",
+        base64.urlsafe_b64encode(b"not json").decode(),
+        raw_token([1, 2]),
+        raw_token({"v": 2, "c": cursors()}),
+        raw_token({"v": 1}),
+        raw_token({"v": 1, "c": {"recipes": None}}),
+        raw_token({"v": 1, "c": {**cursors(), "extra": None}}),
+        raw_token({"v": 1, "c": cursors(tags="2026-01-01")}),
+        raw_token({"v": 1, "c": cursors(tags=[])}),
+        raw_token({"v": 1, "c": cursors(tags=[123])}),
+        raw_token({"v": 1, "c": cursors(tags=["yesterday"])}),
+        raw_token({"v": 1, "c": cursors(recipes=["2026-01-01", "not-a-uuid"])}),
+        raw_token({"v": 1, "c": cursors(recipes=["2026-01-01", 5])}),
+        raw_token({"v": 1, "c": cursors(recipes=["2026-01-01", str(uuid.uuid4()), str(uuid.uuid4())])}),
+        raw_token({"v": 1, "c": cursors(collection_recipes=["2026-01-01", str(uuid.uuid4())])}),
+        raw_token({"v": 1, "c": cursors(tombstones=["2026-01-01", "7"])}),
+        raw_token({"v": 1, "c": cursors(tombstones=["2026-01-01", True])}),
+    ],
+)
+def test_invalid_token_rejected(token):
+    with pytest.raises(InvalidSyncToken):
+        decode_token(token)
+
+
+def test_tombstones_read_shared_and_own_separately():
+    user_id = uuid.uuid4()
+    sql = str(_tombstones(user_id, [TS, 7], TS, 100).compile(dialect=postgresql.dialect()))
+    assert "UNION ALL" in sql
+    assert "owner_id IS NULL" in sql
+    assert " OR " not in sql
@@ -0,0 +1,82 @@
+"""Сравнение раздачи /media: StaticFiles против app.core.media.MediaFiles.
+
+Запросы идут в ASGI-приложение напрямую (httpx.ASGITransport), без сети — меряется только сервер.
+python -m utils.bench_media [--files 200] [--size 65536] [--requests 5000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import httpx
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.staticfiles import StaticFiles
+
+from app.core.media import MediaFiles
+
+
+def make_files(directory, count, size):
+    names = []
+    for i in range(count):
+        name = f"recipes/{i % 256:02x}/{i:08d}.jpg"
+        os.makedirs(os.path.join(directory, os.path.dirname(name)), exist_ok=True)
+        with open(os.path.join(directory, name), "wb") as fh:
+            fh.write(os.urandom(size))
+        names.append(name)
+    return names
+
+
+async def run(app, names, total, concurrency, headers_for):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Прогрев: по одному запросу на файл (для MediaFiles — заполнение горячего кэша)
+        validators = {}
+        for name in names:
+            resp = await client.get(f"/media/{name}")
+            validators[name] = resp.headers.get("etag")
+
+        queue = [random.choice(names) for _ in range(total)]
+        statuses = {}
+
+        async def worker():
+            while queue:
+                name = queue.pop()
+                resp = await client.get(f"/media/{name}", headers=headers_for(validators[name]))
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return total / elapsed, statuses
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--size", type=int, default=64 * 1024)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        names = make_files(directory, args.files, args.size)
+        apps = {
+            "StaticFiles": Starlette(routes=[Mount("/media", StaticFiles(directory=directory))]),
+            "MediaFiles": Starlette(routes=[Mount("/media", MediaFiles(directory=directory))]),
+        }
+        scenarios = {
+            "full GET": lambda etag: {},
+            "If-None-Match": lambda etag: {"if-none-match": etag} if etag else {},
+            "Range 0-1023": lambda etag: {"range": "bytes=0-1023"},
+        }
+        print(f"{args.files} files x {args.size} B, {args.requests} requests, concurrency {args.concurrency}")
+        for scenario, headers_for in scenarios.items():
+            for label, app in apps.items():
+                rps, statuses = await run(app, names, args.requests, args.concurrency, headers_for)
+                print(f"{scenario:<14} {label:<12} {rps:10.0f} req/s  {statuses}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,35 @@
+"""Пропускная способность PushFanout на FakePushProvider (без БД и сети).
+
+python -m utils.bench_push [--tokens 1000000] [--latency 0.005] [--concurrency 64]
+"""
+import argparse
+import asyncio
+import uuid
+
+from app.services.push import FakePushProvider, InMemoryTokenSource, PushFanout, PushMessage
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=1_000_000)
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds per provider request")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--invalid-rate", type=float, default=0.01)
+    parser.add_argument("--transient-rate", type=float, default=0.005)
+    args = parser.parse_args()
+
+    platforms = ("android", "ios")
+    rows = [(uuid.uuid4(), f"token-{i:08d}", platforms[i % 3 == 0]) for i in range(args.tokens)]
+    rows.sort(key=lambda row: row[0])
+    source = InMemoryTokenSource(rows)
+    provider = FakePushProvider(
+        latency=args.latency, invalid_rate=args.invalid_rate, transient_rate=args.transient_rate
+    )
+    fanout = PushFanout(provider, source, concurrency=args.concurrency, backoff_base=0.01, backoff_max=0.1)
+
+    stats = await fanout.send(PushMessage(title="Benchmark", body="Recipe of the day"))
+    print(stats)
+    print(f"{stats['tokens_per_second']:,} tokens/sec, deleted {len(source.deleted):,} invalid tokens")
+
+if __name__ == "__main__":
+    asyncio.run(main())
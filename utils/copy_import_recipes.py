@@ -0,0 +1,121 @@
+"""Быстрый импорт рецептов через COPY: python -m utils.copy_import_recipes [path] [--batch-size N]
+
+Файл читается потоково (utils.recipe_source), каждая запись проверяется через RecipeCreate.
+Пачки грузятся asyncpg copy_records_to_table во временную таблицу и переносятся в recipes
+одним INSERT ... SELECT вместе со связями recipe_tags. Память не зависит от размера файла.
+Записи с уже известным source_key пропускаются, так что повторный запуск не создаёт дублей.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from typing import List, Tuple
+
+import asyncpg
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import async_session
+from app.models.user import User
+from utils.recipe_source import RECIPE_COLUMNS, iter_records, normalize_record, to_recipe_create, to_row
+
+SYSTEM_EMAIL = "admin@google.com"
+SYSTEM_USERNAME = "admin"
+
+STAGING_DDL = """
+    CREATE TEMP TABLE recipe_staging (
+        id uuid, user_id uuid, name text, image_url text,
+        instructions jsonb, servings jsonb, ingredients jsonb, tags jsonb, nutrients jsonb,
+        rating double precision, cooked integer, created_at timestamp,
+        source_key text, content_hash text
+    ) ON COMMIT DELETE ROWS
+"""
+
+COLUMNS_SQL = ", ".join(RECIPE_COLUMNS)
+
+# Перенос и связи тегов одним запросом: связи только у реально вставленных строк
+MOVE_SQL = f"""
+    WITH moved AS (
+        INSERT INTO recipes ({COLUMNS_SQL}) SELECT {COLUMNS_SQL} FROM recipe_staging
+        ON CONFLICT (source_key) DO NOTHING
+        RETURNING id
+    ), linked AS (
+        INSERT INTO recipe_tags (recipe_id, tag_id)
+        SELECT DISTINCT s.id, t.num_id
+        FROM recipe_staging s
+        JOIN moved m ON m.id = s.id
+        CROSS JOIN LATERAL jsonb_array_elements_text(s.tags) AS x(name)
+        JOIN tags t ON lower(t.name) = lower(x.name)
+        WHERE jsonb_typeof(s.tags) = 'array'
+        ON CONFLICT DO NOTHING
+    )
+    SELECT count(*) FROM moved
+"""
+
+
+def asyncpg_dsn() -> str:
+    return settings.database_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+async def get_or_create_system_user() -> uuid.UUID:
+    async with async_session() as session:
+        res = await session.execute(select(User.id).where(User.email == SYSTEM_EMAIL))
+        user_id = res.scalar()
+        if user_id:
+            return user_id
+        user = User(email=SYSTEM_EMAIL, username=SYSTEM_USERNAME, hashed_password="$2b$12$dummy_hash")
+        session.add(user)
+        await session.commit()
+        return user.id
+
+
+async def flush(conn: asyncpg.Connection, rows: List[Tuple]) -> int:
+    """Одна пачка — одна транзакция: COPY в staging, перенос в recipes, связи тегов. Возвращает число вставленных."""
+    async with conn.transaction():
+        await conn.copy_records_to_table("recipe_staging", records=rows, columns=RECIPE_COLUMNS)
+        return await conn.fetchval(MOVE_SQL)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", nargs="?", default="utils/recipes_russian.json", help="JSON array or NDJSON")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    user_id = await get_or_create_system_user()
+    conn = await asyncpg.connect(asyncpg_dsn())
+    try:
+        await conn.execute(STAGING_DDL)
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        batch: List[Tuple] = []
+        loaded = imported = rejected = 0
+        for index, rec in enumerate(iter_records(args.path)):
+            try:
+                # Та же нормализация, что у синхронизации, — иначе content_hash разойдётся
+                normalize_record(rec)
+                batch.append(to_row(rec, to_recipe_create(rec), user_id, now))
+            except Exception as exc:
+                rejected += 1
+                if rejected <= 10:
+                    print(f"Skipping record #{index}: {(str(exc).splitlines() or [type(exc).__name__])[0]}")
+                continue
+            if len(batch) >= args.batch_size:
+                imported += await flush(conn, batch)
+                loaded += len(batch)
+                batch = []
+                elapsed = time.perf_counter() - started
+                print(f"Imported {imported} of {loaded} ({loaded / elapsed:,.0f} rows/sec)")
+        if batch:
+            imported += await flush(conn, batch)
+            loaded += len(batch)
+    finally:
+        await conn.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Done: {imported} recipes in {elapsed:.1f}s ({loaded / elapsed if elapsed else 0:,.0f} rows/sec), "
+          f"already imported {loaded - imported}, rejected {rejected}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
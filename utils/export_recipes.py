@@ -0,0 +1,37 @@
+"""Выгрузка рецептов в NDJSON: python -m utils.export_recipes [out.ndjson|-] [--created-after ISO] [--created-before ISO] [--tag T ...]
+
+Тот же генератор, что у GET /recipes/export (app.services.recipe_export), но напрямую из БД.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime
+
+from app.services.recipe_export import iter_recipes_ndjson
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("out", nargs="?", default="-", help="output file, '-' for stdout")
+    parser.add_argument("--created-after", type=datetime.fromisoformat)
+    parser.add_argument("--created-before", type=datetime.fromisoformat)
+    parser.add_argument("--tag", action="append", dest="tags", help="repeat for several tags (OR)")
+    parser.add_argument("--chunk-rows", type=int)
+    args = parser.parse_args()
+
+    out = sys.stdout.buffer if args.out == "-" else open(args.out, "wb")
+    started = time.perf_counter()
+    exported = 0
+    try:
+        async for chunk in iter_recipes_ndjson(args.created_after, args.created_before, args.tags, args.chunk_rows):
+            out.write(chunk)
+            exported += chunk.count(b"\n")
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    elapsed = time.perf_counter() - started
+    print(f"Exported {exported} recipes in {elapsed:.1f}s ({exported / elapsed if elapsed else 0:,.0f} rows/sec)", file=sys.stderr)
+
+if __name__ == "__main__":
+    asyncio.run(main())
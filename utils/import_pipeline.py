@@ -0,0 +1,234 @@
+"""Параллельный импорт рецептов: python -m utils.import_pipeline [path] [--workers N] [--rejects rejects.ndjson]
+
+Три стадии, между ними ограниченные очереди (чтение не убегает вперёд записи, память не растёт):
+  read      — поток читает дамп (utils.recipe_source.iter_records) и режет на пачки;
+  normalize — пул процессов нормализует таймеры и ингредиенты и проверяет записи через RecipeCreate;
+  write     — один асинхронный писатель грузит строки через COPY (utils.copy_import_recipes.flush).
+Битые записи не прерывают импорт, а пишутся в NDJSON-файл отказов. В конце — пропускная способность каждой стадии.
+--dry-run прогоняет чтение и нормализацию без БД (оценка CPU-части).
+"""
+import argparse
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import asyncpg
+
+from utils.copy_import_recipes import STAGING_DDL, asyncpg_dsn, flush, get_or_create_system_user
+from utils.recipe_source import iter_records, prepare_batch
+
+Batch = List[Tuple[int, Dict[str, Any]]]
+Prepared = Tuple[List[Tuple], List[Dict[str, Any]], float]
+
+
+class StageStats:
+    """Счётчики стадии: busy — время работы без ожидания очередей (для normalize — суммарно по процессам)."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+
+    def report(self, wall: float) -> str:
+        per_busy = self.items / self.busy if self.busy else 0
+        per_wall = self.items / wall if wall else 0
+        return f"{self.name:<10} {self.items:>12,} items  busy {self.busy:8.1f}s  {per_busy:>12,.0f}/s busy  {per_wall:>12,.0f}/s wall"
+
+
+def _put(target: queue.Queue, item: Optional[Batch], stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            target.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(source: queue.Queue, stop: threading.Event) -> Optional[Batch]:
+    while not stop.is_set():
+        try:
+            return source.get(timeout=0.5)
+        except queue.Empty:
+            continue
+    return None
+
+
+def read_stage(path: str, batch_size: int, out: queue.Queue, stats: StageStats, stop: threading.Event, errors: List[BaseException]) -> None:
+    """Поток чтения; по завершении всегда кладёт None, при ошибке ещё и выставляет stop."""
+    try:
+        batch: Batch = []
+        started = time.perf_counter()
+        for index, rec in enumerate(iter_records(path)):
+            batch.append((index, rec))
+            if len(batch) >= batch_size:
+                stats.busy += time.perf_counter() - started
+                stats.items += len(batch)
+                if not _put(out, batch, stop):
+                    return
+                batch = []
+                started = time.perf_counter()
+        stats.busy += time.perf_counter() - started
+        stats.items += len(batch)
+        if batch:
+            _put(out, batch, stop)
+    except BaseException as exc:
+        errors.append(exc)
+        # Дамп прочитан не до конца — писатель не должен дописывать хвост как будто всё в порядке
+        stop.set()
+    finally:
+        _put(out, None, stop)
+
+
+def timed_prepare(batch: Batch, user_id: uuid.UUID, now: datetime) -> Prepared:
+    """prepare_batch с замером CPU-времени процесса пула."""
+    started = time.perf_counter()
+    rows, rejects = prepare_batch(batch, user_id, now)
+    return rows, rejects, time.perf_counter() - started
+
+
+async def normalize_stage(
+    pool: ProcessPoolExecutor,
+    workers: int,
+    source: queue.Queue,
+    out: "asyncio.Queue[Optional[Prepared]]",
+    user_id: uuid.UUID,
+    now: datetime,
+    stop: threading.Event,
+) -> None:
+    loop = asyncio.get_running_loop()
+    pending: set = set()
+
+    async def drain(return_when: str) -> None:
+        nonlocal pending
+        done, pending = await asyncio.wait(pending, return_when=return_when)
+        for future in done:
+            await out.put(future.result())
+
+    while True:
+        batch = await loop.run_in_executor(None, _get, source, stop)
+        if batch is None:
+            break
+        # Не больше двух пачек на процесс в работе — остальное ждёт в очереди чтения
+        if len(pending) >= workers * 2:
+            await drain(asyncio.FIRST_COMPLETED)
+        pending.add(loop.run_in_executor(pool, timed_prepare, batch, user_id, now))
+    if pending:
+        await drain(asyncio.ALL_COMPLETED)
+    await out.put(None)
+
+
+async def write_stage(
+    conn: Optional[asyncpg.Connection],
+    source: "asyncio.Queue[Optional[Prepared]]",
+    write_batch: int,
+    rejects_path: str,
+    normalize: StageStats,
+    write: StageStats,
+    rejected: StageStats,
+    skipped: StageStats,
+    stop: threading.Event,
+) -> None:
+    buffer: List[Tuple] = []
+    started = time.perf_counter()
+
+    async def write_buffer() -> None:
+        nonlocal buffer
+        began = time.perf_counter()
+        inserted = len(buffer) if conn is None else await flush(conn, buffer)
+        write.busy += time.perf_counter() - began
+        write.items += len(buffer)
+        # Строки с уже известным source_key flush пропускает
+        skipped.items += len(buffer) - inserted
+        buffer = []
+        elapsed = time.perf_counter() - started
+        print(f"Imported {write.items - skipped.items:,} ({write.items / elapsed:,.0f} rows/sec), "
+              f"already imported {skipped.items:,}, rejected {rejected.items:,}")
+
+    with open(rejects_path, "w", encoding="utf-8") as rejects_fh:
+        while True:
+            item = await source.get()
+            if item is None:
+                break
+            rows, rejects, cpu_seconds = item
+            normalize.items += len(rows) + len(rejects)
+            normalize.busy += cpu_seconds
+            began = time.perf_counter()
+            for reject in rejects:
+                rejects_fh.write(json.dumps(reject, ensure_ascii=False, default=str) + "\n")
+            rejected.items += len(rejects)
+            rejected.busy += time.perf_counter() - began
+            if stop.is_set():
+                # Импорт прерван: дочитываем очередь, чтобы нормализация не повисла на put, но не пишем
+                buffer = []
+                continue
+            buffer.extend(rows)
+            if len(buffer) >= write_batch:
+                await write_buffer()
+        if buffer and not stop.is_set():
+            await write_buffer()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", nargs="?", default="utils/recipes_russian.json", help="JSON array or NDJSON")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=2_000, help="records per process-pool task")
+    parser.add_argument("--write-batch", type=int, default=10_000, help="rows per COPY transaction")
+    parser.add_argument("--rejects", default="rejects.ndjson", help="NDJSON file for invalid records")
+    parser.add_argument("--dry-run", action="store_true", help="read and validate only, no database")
+    args = parser.parse_args()
+
+    read, normalize, write, rejected = StageStats("read"), StageStats("normalize"), StageStats("write"), StageStats("rejects")
+    skipped = StageStats("skipped")
+    user_id = uuid.uuid4() if args.dry_run else await get_or_create_system_user()
+    conn = None if args.dry_run else await asyncpg.connect(asyncpg_dsn())
+    stop = threading.Event()
+    read_errors: List[BaseException] = []
+    batches: queue.Queue = queue.Queue(maxsize=args.workers * 2)
+    prepared: "asyncio.Queue[Optional[Prepared]]" = asyncio.Queue(maxsize=args.workers * 2)
+    reader = threading.Thread(
+        target=read_stage, args=(args.path, args.batch_size, batches, read, stop, read_errors), daemon=True
+    )
+
+    started = time.perf_counter()
+    try:
+        if conn is not None:
+            await conn.execute(STAGING_DDL)
+        reader.start()
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            tasks = [
+                asyncio.create_task(normalize_stage(pool, args.workers, batches, prepared, user_id, datetime.utcnow(), stop)),
+                asyncio.create_task(write_stage(conn, prepared, args.write_batch, args.rejects, normalize, write, rejected, skipped, stop)),
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                # Упавшая стадия останавливает остальные, иначе они навсегда повиснут на очередях
+                stop.set()
+                for task in tasks:
+                    task.cancel()
+                raise
+    finally:
+        stop.set()
+        if conn is not None:
+            await conn.close()
+    reader.join()
+    if read_errors:
+        raise read_errors[0]
+
+    wall = time.perf_counter() - started
+    print(f"Done: {write.items - skipped.items:,} recipes in {wall:.1f}s ({write.items / wall if wall else 0:,.0f} rows/sec), "
+          f"already imported {skipped.items:,}, {rejected.items:,} rejected -> {args.rejects}")
+    for stats in (read, normalize, write, rejected):
+        print(stats.report(wall))
+
+if __name__ == "__main__":
+    asyncio.run(main())
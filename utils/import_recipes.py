@@ -7,6 +7,7 @@ from app.core.config import settings       # берёт данные из .env
 from app.models.recipe import Recipe
 from app.models.user import User
 import app.models.collection
+from app.services.recipe_tags import relink_all
 from app.core.database import Base
 
 # --- подключаемся к Postgres ---------------------------------
@@ -59,6 +60,9 @@ async def main():
                 await session.commit()
                 print(f"Inserted {counter}")
 
+        await session.commit()
+        # связи recipe_tags для новых рецептов
+        await relink_all(session)
         await session.commit()
         print(f"Done! Inserted total {counter} recipes")
 
@@ -3,6 +3,7 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sess
 from sqlalchemy import select
 from app.core.config import settings
 from app.models.tag import Tag
+from app.services.recipe_tags import relink_all
 
 # подключение
 engine = create_async_engine(settings.database_url, echo=False, future=True)
@@ -19,6 +20,9 @@ async def main():
             session.add(Tag(name=name))
             added += 1
         await session.commit()
+        # Новые теги могли уже встречаться в recipes.tags
+        await relink_all(session)
+        await session.commit()
     print(f"Added {added} tags")
 
 if __name__ == "__main__":
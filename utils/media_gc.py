@@ -0,0 +1,23 @@
+"""Ручной запуск GC медиа: python -m utils.media_gc [--dry-run] [--grace-hours N]"""
+import argparse
+import asyncio
+
+from app.services.media_gc import collect_garbage
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Delete uploaded media files that are no longer referenced")
+    parser.add_argument("--dry-run", action="store_true", help="only count orphans")
+    parser.add_argument("--grace-hours", type=float, default=None, help="skip files modified more recently")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    grace = args.grace_hours * 3600 if args.grace_hours is not None else None
+    stats = await collect_garbage(grace_seconds=grace, batch_size=args.batch_size, dry_run=args.dry_run)
+    print(
+        f"Scanned {stats['scanned']} files, orphans {stats['orphans']}, "
+        f"deleted {stats['deleted']} ({stats['bytes_freed'] / 1024 / 1024:.1f} MB)"
+    )
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,14 @@
+"""Ручная чистка надгробий /sync: python -m utils.purge_tombstones"""
+import asyncio
+
+from app.core.database import async_session
+from app.services.sync import purge_tombstones
+
+
+async def main():
+    async with async_session() as session:
+        purged = await purge_tombstones(session)
+    print(f"Purged {purged} sync tombstones")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,32 @@
+"""Рассылка рецепта дня на все устройства: python -m utils.push_daily"""
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app.core.database import async_session
+from app.models.daily_recipe import DailyRecipe
+from app.models.recipe import Recipe
+from app.services.push import DbTokenSource, PushFanout, PushMessage, create_provider
+
+
+async def main():
+    day = datetime.utcnow().timetuple().tm_yday
+    async with async_session() as session:
+        res = await session.execute(
+            select(Recipe.id, Recipe.name)
+            .join(DailyRecipe, DailyRecipe.recipe_id == Recipe.id)
+            .where(DailyRecipe.day_of_year == day, Recipe.deleted_at.is_(None))
+        )
+        row = res.first()
+    if row is None:
+        print(f"No daily recipe for day {day}")
+        return
+
+    recipe_id, name = row
+    message = PushMessage(title="Рецепт дня", body=name, data={"recipe_id": str(recipe_id)})
+    stats = await PushFanout(create_provider(), DbTokenSource()).send(message)
+    print(stats)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,197 @@
+"""Потоковое чтение дампов рецептов (JSON-массив или NDJSON) и приведение записей к RecipeCreate.
+
+Файл читается кусками, в памяти — только текущий кусок и одна запись.
+"""
+import hashlib
+import json
+import uuid
+from datetime import datetime
+from fractions import Fraction
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.schemas.recipe import RecipeCreate
+
+CHUNK_SIZE = 1 << 20
+
+# Колонки recipes в порядке, в котором их отдаёт to_row()
+RECIPE_COLUMNS = (
+    "id", "user_id", "name", "image_url", "instructions", "servings",
+    "ingredients", "tags", "nutrients", "rating", "cooked", "created_at",
+    "source_key", "content_hash",
+)
+
+_decoder = json.JSONDecoder()
+
+# Пространство имён для детерминированных ID таймеров (uuid5 от ключа рецепта и позиции таймера)
+TIMER_NAMESPACE = uuid.UUID("6f1c2b52-8d1e-4f0a-9b7e-3c5d2a1e9f40")
+
+
+def iter_records(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Записи из JSON-массива `[{...}, ...]` или NDJSON (по объекту в строке)."""
+    with open(path, "r", encoding="utf-8") as fh:
+        # Формат — по первому непробельному символу, даже если до него больше одного куска пробелов
+        stripped = ""
+        while not stripped:
+            head = fh.read(chunk_size)
+            if not head:
+                return
+            stripped = head.lstrip()
+        if stripped.startswith("["):
+            yield from _iter_array(fh, stripped[1:], chunk_size)
+            return
+        fh.seek(0)
+        for line in fh:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _iter_array(fh, buffer: str, chunk_size: int) -> Iterator[Dict[str, Any]]:
+    pos = 0
+    while True:
+        # Пропускаем пробелы и запятые между элементами
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer):
+                break
+            more = fh.read(chunk_size)
+            if not more:
+                raise ValueError("Unexpected end of JSON array")
+            buffer, pos = more, 0
+        if buffer[pos] == "]":
+            return
+        try:
+            record, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Запись не поместилась в буфер — дочитываем
+            more = fh.read(chunk_size)
+            if not more:
+                raise
+            buffer, pos = buffer[pos:] + more, 0
+            continue
+        yield record
+        pos = end
+        if pos > chunk_size:
+            buffer, pos = buffer[pos:], 0
+
+
+def to_recipe_create(rec: Dict[str, Any]) -> RecipeCreate:
+    """Поля дампа -> RecipeCreate (ValidationError для битых записей)."""
+    return RecipeCreate.model_validate({
+        "name": rec.get("name"),
+        "image_url": rec.get("image") or rec.get("image_url"),
+        "instructions": rec.get("instructions") or [],
+        "servings": rec.get("servings"),
+        "ingredients": rec.get("ingredients") or [],
+        "tags": rec.get("tags") or [],
+        "nutrients": rec.get("nutrients"),
+    })
+
+
+def to_row(rec: Dict[str, Any], data: RecipeCreate, user_id: uuid.UUID, now: datetime) -> Tuple:
+    """Кортеж для COPY в порядке RECIPE_COLUMNS; jsonb передаём строками.
+
+    source_key и content_hash — те же, что считает синхронизация utils/reimport_recipes.py,
+    поэтому загруженные через COPY рецепты она узнаёт по ключу, а не по имени.
+    """
+    payload = data.model_dump()
+
+    def as_json(value: Any) -> Any:
+        return None if value is None else json.dumps(value, ensure_ascii=False)
+
+    return (
+        uuid.uuid4(),
+        user_id,
+        payload["name"],
+        payload["image_url"],
+        as_json(payload["instructions"]),
+        as_json(payload["servings"]),
+        as_json(payload["ingredients"] or []),
+        as_json(payload["tags"] or []),
+        as_json(payload["nutrients"]),
+        float(rec.get("rating") or 0),
+        int(rec.get("cooked") or 0),
+        now,
+        source_key(rec),
+        content_hash(data.model_dump(mode="json")),
+    )
+
+
+def source_key(rec: Dict[str, Any]) -> str:
+    """Естественный ключ записи: id из дампа, иначе хэш имени и картинки."""
+    for field in ("id", "source_id"):
+        if rec.get(field) not in (None, ""):
+            return f"id:{rec[field]}"
+    basis = f"{rec.get('name') or ''}|{rec.get('image') or rec.get('image_url') or ''}"
+    return "name:" + hashlib.sha1(basis.encode("utf-8")).hexdigest()
+
+
+def assign_timer_ids(rec: Dict[str, Any], key: str) -> None:
+    """Таймерам без id — стабильный id, чтобы повторный импорт давал то же содержимое."""
+    for i, instruction in enumerate(rec.get("instructions") or []):
+        if not isinstance(instruction, dict):
+            continue
+        for j, timer in enumerate(instruction.get("timers") or []):
+            if isinstance(timer, dict) and "id" not in timer:
+                timer["id"] = str(uuid.uuid5(TIMER_NAMESPACE, f"{key}:{i}:{j}"))
+
+
+def content_hash(payload: Dict[str, Any]) -> str:
+    """sha256 канонического JSON (ключи отсортированы) — меняется только вместе с содержимым."""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _parse_amount(value: Any) -> Any:
+    """"1,5" -> 1.5, "1/2" -> 0.5, "1 1/2" -> 1.5; нераспознанное оставляем валидатору."""
+    if not isinstance(value, str):
+        return value
+    text = value.strip().replace(",", ".")
+    try:
+        return float(sum(Fraction(part) for part in text.split()))
+    except (ValueError, ArithmeticError):
+        # "1e400" — OverflowError, "1/0" — ZeroDivisionError
+        return value
+
+
+def normalize_record(rec: Dict[str, Any], key: Optional[str] = None) -> Dict[str, Any]:
+    """Синхронная нормализация записи на месте: ID и алиасы таймеров, поля ингредиентов."""
+    assign_timer_ids(rec, key or source_key(rec))
+    for instruction in rec.get("instructions") or []:
+        if not isinstance(instruction, dict):
+            continue
+        for timer in instruction.get("timers") or []:
+            if not isinstance(timer, dict):
+                continue
+            if "lowerLimit" in timer and "lower_limit" not in timer:
+                timer["lower_limit"] = timer["lowerLimit"]
+            if "upperLimit" in timer and "upper_limit" not in timer:
+                timer["upper_limit"] = timer["upperLimit"]
+    for ingredient in rec.get("ingredients") or []:
+        if not isinstance(ingredient, dict):
+            continue
+        if isinstance(ingredient.get("name"), str):
+            ingredient["name"] = ingredient["name"].strip()
+        ingredient["amount"] = _parse_amount(ingredient.get("amount"))
+        unit = ingredient.get("unit")
+        ingredient["unit"] = unit.strip() if isinstance(unit, str) else ("" if unit is None else unit)
+    return rec
+
+
+def prepare_batch(
+    records: List[Tuple[int, Dict[str, Any]]], user_id: uuid.UUID, now: datetime
+) -> Tuple[List[Tuple], List[Dict[str, Any]]]:
+    """Нормализация и проверка пачки (выполняется в процессе пула). Возвращает строки для COPY и отказы."""
+    rows: List[Tuple] = []
+    rejects: List[Dict[str, Any]] = []
+    for index, rec in records:
+        try:
+            if not isinstance(rec, dict):
+                raise TypeError("record is not an object")
+            normalize_record(rec)
+            rows.append(to_row(rec, to_recipe_create(rec), user_id, now))
+        except Exception as exc:
+            # Любая ошибка на записи — в отказы: одна кривая запись не должна валить пачку и весь импорт
+            rejects.append({"index": index, "error": f"{type(exc).__name__}: {exc}", "record": rec})
+    return rows, rejects
@@ -1,18 +1,33 @@
+"""Переимпорт рецептов из utils/recipes_russian.json.
+
+По умолчанию — инкрементальная синхронизация: у каждой записи дампа есть естественный ключ
+(source_key) и хэш содержимого (content_hash). Пачками сравниваем с БД и пишем только новые
+и изменившиеся рецепты; пропавшие из дампа помечаются deleted_at. Ключи прочитанных записей
+копятся во временной таблице sync_seen, а не в памяти процесса. ID рецептов, отзывы,
+коллекции и слоты рецепта дня переживают переимпорт.
+--full — старый режим: DELETE FROM recipes и импорт с нуля.
+"""
+import argparse
 import asyncio
 import json
 import uuid
 from datetime import datetime
+from typing import Any, Dict, List, Set
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy import select, text
+from sqlalchemy import delete, insert, select, text, update
 from app.core.config import settings
 
 # Импортируем все модели
 from app.models.user import User
 from app.models.recipe import Recipe
-from app.models.collection import Collection
+from app.models.collection import Collection, collection_recipes
 from app.models.daily_recipe import DailyRecipe
 from app.models.device_token import DeviceToken
 from app.models.tag import Tag
+from app.models.tag import recipe_tags
+from app.services.collections import refresh_collection_stats
+from app.services.recipe_tags import relink_all, relink_recipes
+from utils.recipe_source import content_hash, iter_records, normalize_record, source_key, to_recipe_create
 
 # Подключение к БД
 engine = create_async_engine(settings.database_url, echo=False, future=True)
@@ -22,6 +37,9 @@ AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=As
 SYSTEM_EMAIL = "admin@google.com"
 SYSTEM_USERNAME = "admin"
 
+SOURCE_PATH = "utils/recipes_russian.json"
+SYNC_BATCH_SIZE = 1000
+
 
 async def fix_timer_data_in_json(instructions):
     """Правильно обрабатывает таймеры - ТОЛЬКО добавляет ID, НЕ МЕНЯЯ оригинальные данные"""
@@ -71,7 +89,7 @@ async def reimport_recipes():
         system_user_id = await get_or_create_system_user(session)
         
         print("📖 Загружаем данные из JSON...")
-        data = json.load(open("utils/recipes_russian.json", "r", encoding="utf-8"))
+        data = json.load(open(SOURCE_PATH, "r", encoding="utf-8"))
         
         print(f"🔄 Импортируем {len(data)} рецептов с правильной обработкой таймеров...")
         
@@ -102,6 +120,8 @@ async def reimport_recipes():
                 await session.commit()
                 print(f"✅ Импортировано {counter} рецептов...")
 
+        await session.commit()
+        await relink_all(session)
         await session.commit()
         print(f"🎉 Завершено! Импортировано {counter} рецептов с правильными таймерами!")
         
@@ -114,5 +134,172 @@ async def reimport_recipes():
             print(f"  {row[0]}: {row[1][:200]}...")
 
 
+# Ключи записей дампа за этот прогон; живёт в соединении синхронизации
+SEEN_DDL = "CREATE TEMP TABLE sync_seen (source_key varchar(255) PRIMARY KEY)"
+
+
+def prepare_record(rec: Dict[str, Any]) -> Dict[str, Any]:
+    """Запись дампа -> значения колонок recipes с source_key и content_hash (ValidationError для битых)."""
+    key = source_key(rec)
+    # Стабильные ID таймеров: иначе каждый прогон менял бы instructions и хэш
+    normalize_record(rec, key)
+    payload = to_recipe_create(rec).model_dump(mode="json")
+    # rating и cooked живут в приложении, в хэш и в UPDATE не входят
+    return {**payload, "source_key": key, "content_hash": content_hash(payload)}
+
+
+async def sync_batch(session: AsyncSession, batch: List[Dict[str, Any]], system_user_id: uuid.UUID, ratings: Dict[str, Dict[str, Any]], stats: Dict[str, int]) -> None:
+    """Одна пачка — одна транзакция: вставки, изменения и воскрешения рецептов плюс их связи с тегами."""
+    # Ключи, уже встреченные в прошлых пачках, — дубликаты в дампе
+    fresh = set((await session.execute(
+        text("INSERT INTO sync_seen SELECT unnest(CAST(:keys AS varchar[])) ON CONFLICT DO NOTHING RETURNING source_key"),
+        {"keys": [row["source_key"] for row in batch]},
+    )).scalars().all())
+    stats["duplicates"] += len(batch) - len(fresh)
+    batch = [row for row in batch if row["source_key"] in fresh]
+    keys = [row["source_key"] for row in batch]
+    existing = {
+        key: (recipe_id, digest, deleted_at)
+        for key, recipe_id, digest, deleted_at in (await session.execute(
+            select(Recipe.source_key, Recipe.id, Recipe.content_hash, Recipe.deleted_at).where(Recipe.source_key.in_(keys))
+        )).all()
+    }
+
+    # Рецепты из старого полного импорта ещё без source_key — принимаем их по имени, сохраняя ID
+    missing = {row["name"]: row for row in batch if row["source_key"] not in existing}
+    if missing:
+        legacy = await session.execute(
+            select(Recipe.name, Recipe.id).where(
+                Recipe.source_key.is_(None), Recipe.user_id == system_user_id, Recipe.name.in_(list(missing))
+            )
+        )
+        for name, recipe_id in legacy.all():
+            row = missing.pop(name, None)
+            if row is not None:
+                existing[row["source_key"]] = (recipe_id, None, None)
+
+    now = datetime.utcnow()
+    inserts: List[Dict[str, Any]] = []
+    changed: List[uuid.UUID] = []
+    resurrected: List[uuid.UUID] = []
+    for row in batch:
+        found = existing.get(row["source_key"])
+        if found is None:
+            recipe_id = uuid.uuid4()
+            extra = ratings[row["source_key"]]
+            inserts.append({**row, "id": recipe_id, "user_id": system_user_id, "created_at": now, **extra})
+            changed.append(recipe_id)
+            continue
+        recipe_id, digest, deleted_at = found
+        if digest == row["content_hash"] and deleted_at is None:
+            stats["unchanged"] += 1
+            continue
+        await session.execute(
+            update(Recipe).where(Recipe.id == recipe_id).values(**row, deleted_at=None).execution_options(synchronize_session=False)
+        )
+        if deleted_at is not None:
+            resurrected.append(recipe_id)
+        elif digest != row["content_hash"]:
+            stats["updated"] += 1
+        changed.append(recipe_id)
+
+    if inserts:
+        await session.execute(insert(Recipe), inserts)
+        stats["inserted"] += len(inserts)
+    stats["resurrected"] += len(resurrected)
+    await relink_recipes(session, changed)
+    if resurrected:
+        await refresh_collection_stats(session, await _collections_of(session, resurrected))
+    await session.commit()
+
+
+async def _collections_of(session: AsyncSession, recipe_ids: List[uuid.UUID]) -> Set[uuid.UUID]:
+    res = await session.execute(
+        select(collection_recipes.c.collection_id).where(collection_recipes.c.recipe_id.in_(recipe_ids)).distinct()
+    )
+    return set(res.scalars().all())
+
+
+async def soft_delete_missing(session: AsyncSession) -> int:
+    """Помечает deleted_at рецепты источника, которых нет в sync_seen; снимает их связи и слоты рецепта дня."""
+    gone_sql = text("""
+        SELECT r.id FROM recipes r
+        WHERE r.source_key IS NOT NULL AND r.deleted_at IS NULL
+          AND NOT EXISTS (SELECT 1 FROM sync_seen s WHERE s.source_key = r.source_key)
+        LIMIT :limit
+    """)
+    now = datetime.utcnow()
+    total = 0
+    while True:
+        # Помеченные выпадают из выборки, так что каждый раз берём следующую пачку
+        ids = list((await session.execute(gone_sql, {"limit": SYNC_BATCH_SIZE})).scalars().all())
+        if not ids:
+            return total
+        total += len(ids)
+        await session.execute(
+            update(Recipe).where(Recipe.id.in_(ids)).values(deleted_at=now).execution_options(synchronize_session=False)
+        )
+        await session.execute(delete(recipe_tags).where(recipe_tags.c.recipe_id.in_(ids)))
+        # Пустой слот планировщик дозаполнит в полночь
+        await session.execute(delete(DailyRecipe).where(DailyRecipe.recipe_id.in_(ids)))
+        await refresh_collection_stats(session, await _collections_of(session, ids))
+        await session.commit()
+
+
+async def sync_recipes(path: str = SOURCE_PATH, batch_size: int = SYNC_BATCH_SIZE):
+    """Инкрементальная синхронизация recipes с дампом: пишем только разницу."""
+    stats = {"inserted": 0, "updated": 0, "resurrected": 0, "unchanged": 0, "deleted": 0, "rejected": 0, "duplicates": 0}
+    # Временная таблица живёт в соединении — держим одно на весь прогон (сессия между коммитами его не отдаёт)
+    async with engine.connect() as conn, AsyncSession(bind=conn, expire_on_commit=False) as session:
+        await session.execute(text(SEEN_DDL))
+        await session.commit()
+        system_user_id = await get_or_create_system_user(session)
+        accepted = 0
+        batch: List[Dict[str, Any]] = []
+        ratings: Dict[str, Dict[str, Any]] = {}
+        for index, rec in enumerate(iter_records(path)):
+            try:
+                row = prepare_record(rec)
+                extra = {"rating": float(rec.get("rating") or 0), "cooked": int(rec.get("cooked") or 0)}
+            except Exception as exc:
+                # Любая ошибка на записи (не объект, переполнение, битые поля) — в отказы, синхронизация идёт дальше
+                stats["rejected"] += 1
+                if stats["rejected"] <= 10:
+                    print(f"Skipping record #{index}: {type(exc).__name__}: {(str(exc).splitlines() or [''])[0]}")
+                continue
+            if row["source_key"] in ratings:
+                stats["duplicates"] += 1
+                continue
+            accepted += 1
+            batch.append(row)
+            ratings[row["source_key"]] = extra
+            if len(batch) >= batch_size:
+                await sync_batch(session, batch, system_user_id, ratings, stats)
+                batch, ratings = [], {}
+        if batch:
+            await sync_batch(session, batch, system_user_id, ratings, stats)
+
+        # Пустой или целиком битый дамп не должен скрыть все рецепты
+        if accepted:
+            stats["deleted"] = await soft_delete_missing(session)
+        else:
+            print("No valid records in source, skipping deletions")
+
+    print("Sync done: " + ", ".join(f"{name} {value}" for name, value in stats.items()))
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", nargs="?", default=SOURCE_PATH, help="JSON array or NDJSON")
+    parser.add_argument("--full", action="store_true", help="delete all recipes and import from scratch")
+    parser.add_argument("--batch-size", type=int, default=SYNC_BATCH_SIZE)
+    args = parser.parse_args()
+    if args.full:
+        await reimport_recipes()
+    else:
+        await sync_recipes(args.path, args.batch_size)
+
+
 if __name__ == "__main__":
-    asyncio.run(reimport_recipes())
\ No newline at end of file
+    asyncio.run(main())
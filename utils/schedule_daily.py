@@ -0,0 +1,22 @@
+"""Заполнение расписания рецепта дня: python -m utils.schedule_daily [--rebuild]
+
+Без флагов дозаполняет пустые слоты; --rebuild пересоставляет весь год, кроме сегодняшнего дня.
+"""
+import argparse
+import asyncio
+
+from app.core.database import async_session
+from app.services.daily_scheduler import fill_daily_slots
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true", help="replan all slots except today")
+    args = parser.parse_args()
+
+    async with async_session() as session:
+        filled = await fill_daily_slots(session, rebuild=args.rebuild)
+    print(f"Scheduled {filled} daily recipe slots")
+
+if __name__ == "__main__":
+    asyncio.run(main())